@@ -0,0 +1,101 @@
+"""
+Microbenchmarks for the per-work extraction hot path in
+``src/download_openalex_matching.py``.
+
+For every function the suite reports throughput (works/s, best of
+``--repeat`` runs over the whole corpus) and allocations (mean peak bytes
+traced by ``tracemalloc`` during a single call).  Results are printed as a
+table, or as JSON with ``--json`` so runs can be diffed.
+
+Run from the git root:
+
+    python benchmarks/bench_extraction.py --size large --n 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from synthetic_works import make_corpus, SIZES
+from download_openalex_matching import (
+    decode_abstract, top_topic_ids, sdg_pairs, country_code_string, extract_row
+)
+
+BENCHMARKS = {
+    "decode_abstract": lambda w: decode_abstract(w.get("abstract_inverted_index")),
+    "top_topic_ids": top_topic_ids,
+    "sdg_pairs": sdg_pairs,
+    "country_code_string": country_code_string,
+    "extract_row": extract_row,
+}
+
+
+def throughput(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for work in corpus:
+            fn(work)
+        best = min(best, time.perf_counter() - t0)
+    return len(corpus) / best
+
+
+def peak_alloc(fn, corpus, samples=200):
+    """Mean per-call peak of traced allocations, in bytes."""
+    sample = corpus[:samples]
+    total = 0
+    tracemalloc.start()
+    try:
+        for work in sample:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(work)
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return total / len(sample)
+
+
+def run(size, n, repeat, seed=0, only=None):
+    corpus = make_corpus(n, size, seed)
+    results = []
+    for name, fn in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        results.append({
+            "function": name,
+            "size": size,
+            "works": n,
+            "works_per_s": round(throughput(fn, corpus, repeat), 1),
+            "peak_bytes_per_call": round(peak_alloc(fn, corpus)),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OpenAlex extraction functions.")
+    parser.add_argument("--size", choices=sorted(SIZES) + ["all"], default="all")
+    parser.add_argument("--n", type=int, default=1000, help="Works per corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS))
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    sizes = sorted(SIZES) if args.size == "all" else [args.size]
+    results = [r for size in sizes for r in run(size, args.n, args.repeat, args.seed, args.only)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'function':<22}{'size':<8}{'works/s':>14}{'peak B/call':>14}")
+    for r in results:
+        print(f"{r['function']:<22}{r['size']:<8}{r['works_per_s']:>14,.0f}{r['peak_bytes_per_call']:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Synthetic OpenAlex works for offline benchmarking.
+
+The shape follows ``tests/conftest.py::sample_work_data`` (the subset of the
+``/works`` JSON that ``extract_row`` reads), scaled up to realistic sizes:
+long abstracts with repeated words in the inverted index, many authorships
+with several institutions each, and long topic / SDG lists.
+
+Generate a reusable corpus with:
+
+    python benchmarks/synthetic_works.py --n 10000 --size large > works.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+
+# (abstract words, authorships, institutions per author, topics, SDGs)
+SIZES = {
+    "small":  (120, 3, 1, 3, 1),
+    "medium": (300, 10, 2, 3, 3),
+    "large":  (900, 60, 3, 10, 6),
+}
+
+COUNTRIES = ["US", "UK", "CA", "DE", "FR", "CN", "IN", "BR", "AU", "ZA", "NO", "JP"]
+OA_STATUSES = ["gold", "green", "hybrid", "bronze", "diamond"]
+
+
+def _vocabulary(rng, n=5000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(2, 12))) for _ in range(n)]
+
+
+def inverted_index(words):
+    idx = {}
+    for pos, word in enumerate(words):
+        idx.setdefault(word, []).append(pos)
+    return idx
+
+
+def make_work(rng, vocab, n_words=300, n_authors=10, n_inst=2, n_topics=3, n_sdgs=3, wid=0):
+    """One synthetic work with the keys ``extract_row`` reads."""
+    # Zipf-ish reuse so common words get long position lists, as in real text
+    words = [vocab[min(int(rng.paretovariate(1.2)) - 1, len(vocab) - 1)] for _ in range(n_words)]
+    topic_ids = rng.sample(range(10000, 14600), n_topics)
+    return {
+        "id": f"https://openalex.org/W{4000000000 + wid}",
+        "display_name": " ".join(rng.sample(vocab, 8)) + " review",
+        "doi": f"https://doi.org/10.{rng.randint(1000, 9999)}/{rng.randint(10**6, 10**7)}",
+        "publication_year": rng.randint(2010, 2025),
+        "cited_by_count": rng.randint(0, 5000),
+        "host_venue": {"display_name": " ".join(rng.sample(vocab, 3))},
+        "best_oa_location": {
+            "is_oa": True,
+            "oa_status": rng.choice(OA_STATUSES),
+            "url": f"https://example.com/{wid}",
+            "url_for_pdf": f"https://example.com/{wid}.pdf" if rng.random() < 0.7 else None,
+        },
+        "primary_location": {"is_oa": True, "oa_status": rng.choice(OA_STATUSES)},
+        "primary_topic": {"id": f"https://openalex.org/T{topic_ids[0]}"},
+        "topics": [{"id": f"https://openalex.org/T{t}", "score": round(rng.random(), 4)}
+                   for t in topic_ids],
+        "sustainable_development_goals": [
+            {"id": f"https://metadata.un.org/sdg/{g}", "score": round(rng.random(), 2)}
+            for g in rng.sample(range(1, 18), n_sdgs)
+        ],
+        "authorships": [
+            {"institutions": [{"country_code": rng.choice(COUNTRIES)} for _ in range(n_inst)]}
+            for _ in range(n_authors)
+        ],
+        "language": "en",
+        "citation_normalized_percentile": {"value": round(rng.random(), 4)},
+        "abstract_inverted_index": inverted_index(words),
+    }
+
+
+def make_corpus(n=1000, size="medium", seed=0):
+    """``n`` works of a preset ``size`` (see ``SIZES``); same seed, same corpus."""
+    rng = random.Random(seed)
+    vocab = _vocabulary(rng)
+    n_words, n_authors, n_inst, n_topics, n_sdgs = SIZES[size]
+    return [make_work(rng, vocab, n_words, n_authors, n_inst, n_topics, n_sdgs, wid=i)
+            for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic OpenAlex works as JSONL.")
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--size", choices=sorted(SIZES), default="medium")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for work in make_corpus(args.n, args.size, args.seed):
+        sys.stdout.write(json.dumps(work) + "\n")
+
+
+if __name__ == "__main__":
+    main()
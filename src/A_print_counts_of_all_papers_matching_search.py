@@ -1,5 +1,7 @@
 import pprint
-import urllib.parse as up, requests, time
+import urllib.parse as up
+
+from download_openalex_matching import openalex_get
 topics1 = 'T10004|T10889|T11275|T11404|T11789|T11886|T12294|T12754|T12792|T13102|T13740|T10616|T10774|T10875|T11065|T11066|T11098|T11229|T11426|T11470|T11546|T11760|T11771|T11796|T12045|T12093|T12115|T12243|T12253|T12431|T12455|T12472|T12571|T12618|T12665|T12771|T12795|T12834|T12855|T13125|T13246|T13390|T13688|T13934|T14009|T14398|T10135|T11641|T12234|T12336|T12701|T12713|T13069|T10367|T11862|T12033|T12098|T13010|T13011|T13054|T13240|T13288|T13468'
 topics1p5 = 'T13478|T13508|T13630|T13678|T13838|T14018|T14269|T14405|T12630|T13009|T13591|T13668|T14050|T14256|T14367|T11925|T12583|T13165|T13857|T14010|T14124|T14127|T14242|T14272|T10385|T10439|T10487|T11228|T11494|T11528|T11836|T12001|T12132|T12329|T12361|T12596|T12606|T12733|T12832|T12934|T13396|T13679|T13781|T13899|T13950|T14137|T14160|T14310|T14378|T14399|T10450|T12319|T12710|T13391|T13892|T12365|T12003|T12310|T12436|T13378|T13628|T14499|T11505|T10012|T10702'
 topics2 = 'T13711|T10115|T10415|T10539|T10910|T11552|T11939|T12121|T12185|T12225|T12428|T12662|T13439|T13616|T14058|T13603|T10880|T14453|T11593|T11821|T10117|T14215|T14387|T10080|T11276|T13018|T14509|T13758|T12142|T12637|T10032|T10255|T10643|T10765|T11061|T11405|T11698|T12806|T14047|T10001|T10110|T10271|T10413|T12456|T13177|T14427|T10398|T11740|T12218|T13067|T13209|T13443|T10647|T10965|T11643|T12083|T12383|T13785|T10075|T10644|T11234|T11320|T11333|T11459|T11483|T11594|T13811|T13890|T11823|T13498|T14112|T11976|T13146|T14464|T10438|T10471'
@@ -30,11 +32,10 @@ for topic in [topics1,topics2, topics3, topics4,topics1p5,topics2p5,topics3p5,to
 
     print('url')
     print(url)
-    results = requests.get(url, timeout=10).json()
+    results = openalex_get(url).json()   # shared, throttle-aware OpenAlex limiter
     pprint.pprint(results)
     count = results["meta"]["count"]
     print(f"cites  →  {count:,} works")
-    time.sleep(0.3)
     allcount += count
 
 print()
@@ -1,11 +1,24 @@
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
 import pandas as pd
 from pathlib import Path
 
 import download_openalex_matching
+import metrics
+import snapshot_harvest
+from rate_limit import openalex_bucket, OPENALEX_REQUESTS_PER_MINUTE
+from work_store import WorkStore
 
 TOPIC_CSV = "../openalex_ess_topics.csv"
 DONE_FILE = "../completed_topics.txt"
 
+# topics finish out of order when --workers > 1; serialise the appends
+_done_lock = threading.Lock()
+
 def read_done():
     if not Path(DONE_FILE).is_file():
         return set()
@@ -13,25 +26,189 @@ def read_done():
         return set(int(line.strip()) for line in f if line.strip().isdigit())
 
 def append_done(topic_id):
-    with open(DONE_FILE, "a") as f:
-        f.write(f"{topic_id}\n")
+    with _done_lock:
+        with open(DONE_FILE, "a") as f:
+            f.write(f"{topic_id}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+def harvest_topic(tid, limiter=None, mark_done=True, **opts):
+    metrics.log(f"Downloading topic {tid} ...")
+    try:
+        n = download_openalex_matching.download_topic(tid, primary_only=True, limiter=limiter, **opts)
+        metrics.log(f"  Downloaded {n} records for topic {tid}")
+        metrics.METRICS.inc("topics_total", result="done")
+        metrics.event("topic", topic=tid, records=n)
+        if mark_done:
+            append_done(tid)
+        return True
+    except Exception as e:
+        metrics.log(f"  FAILED for topic {tid}: {e}", metrics.QUIET)   # shown even with -q
+        metrics.METRICS.inc("topics_total", result="failed")
+        metrics.event("topic", topic=tid, error=repr(e))
+        return False
+
+def harvest_batch(tids, limiter=None, mark_done=True, **opts):
+    if len(tids) == 1:
+        return [tids[0]] if not harvest_topic(tids[0], limiter, mark_done, **opts) else []
+    metrics.log(f"Downloading batch of {len(tids)} topics ...")
+    try:
+        counts = download_openalex_matching.download_topic_batch(tids, primary_only=True, limiter=limiter, **opts)
+    except Exception as e:
+        metrics.log(f"  FAILED for batch {tids}: {e}", metrics.QUIET)
+        metrics.METRICS.inc("topics_total", len(tids), result="failed")
+        metrics.event("batch", topics=list(tids), error=repr(e))
+        return list(tids)
+    if mark_done:
+        for tid in tids:
+            append_done(tid)
+    metrics.log(f"  Downloaded {sum(counts.values())} records for topics {tids}")
+    metrics.METRICS.inc("topics_total", len(tids), result="done")
+    metrics.event("batch", topics=list(tids), records=sum(counts.values()))
+    return []
+
+def delta_since(tid, fmt="csv", store=None, done=()):
+    """
+    Day to fetch changes from: the topic's high-water mark, else, for a topic
+    in ``done``, its file's mtime.  None (a full, resumable harvest) for
+    topics that never finished.
+    """
+    out_path = download_openalex_matching.topic_out_path(tid, primary_only=True, fmt=fmt)
+    if store is not None:
+        return store.high_water_mark(out_path.stem)
+    mark = download_openalex_matching.high_water_mark(out_path)
+    if mark is None and tid in done and out_path.is_file():
+        # harvested before high-water marks were recorded
+        mark = datetime.fromtimestamp(out_path.stat().st_mtime, timezone.utc).date().isoformat()
+    return mark
+
+def run_delta(tids, limiter, workers, batch, **opts):
+    """Refresh every topic with works created/updated since its last harvest."""
+    groups, done = {}, read_done()
+    for tid in tids:
+        since = delta_since(tid, opts.get("fmt", "csv"), opts.get("store"), done)
+        groups.setdefault(since, []).append(tid)
+    jobs = []
+    for since, group in groups.items():
+        size = download_openalex_matching.MAX_OR_VALUES if batch else 1
+        for i in range(0, len(group), size):
+            jobs.append((since, group[i:i + size]))
+    print(f"Delta refresh of {len(tids)} topics in {len(jobs)} cursor walks")
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(harvest_batch, group, limiter, since is None, since=since, **opts)
+                   for since, group in jobs]
+        for fut in as_completed(futures):
+            failed.extend(fut.result())
+    print(f"Refreshed {len(tids) - len(failed)} of {len(tids)} topics; failed: {sorted(failed)}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Download OpenAlex works for every ESS topic.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of topics harvested concurrently (default: 1, serial)")
+    parser.add_argument("--requests-per-minute", type=float, default=OPENALEX_REQUESTS_PER_MINUTE,
+                        help="Global OpenAlex budget shared by all workers")
+    parser.add_argument("--batch", action="store_true",
+                        help="Pack small topics into OR-filtered cursor streams")
+    parser.add_argument("--batch-max-works", type=int,
+                        default=download_openalex_matching.BATCH_MAX_WORKS,
+                        help="Expected works per batch before starting a new one")
+    parser.add_argument("--projected", action="store_true",
+                        help="Request only the fields extract_row needs (select=)")
+    parser.add_argument("--lazy-abstracts", action="store_true",
+                        help="Walk metadata only, then fetch abstracts for unseen works in batches")
+    parser.add_argument("--stream-pages", action="store_true",
+                        help="Decode result pages incrementally instead of resp.json()")
+    parser.add_argument("--delta", action="store_true",
+                        help="Refresh all topics with works new since each topic's last harvest")
+    parser.add_argument("--delta-field", choices=["created", "updated"], default="created",
+                        help="Use from_created_date or from_updated_date "
+                             "(the latter needs an OpenAlex premium key)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Per-topic output format (parquet needs pyarrow)")
+    parser.add_argument("--store", metavar="SQLITE",
+                        help="Harvest into a SQLite work store (e.g. ../abstracts/works.sqlite) "
+                             "instead of per-topic files")
+    parser.add_argument("--snapshot", metavar="DIR", nargs="?", const=str(snapshot_harvest.SNAPSHOT_DIR),
+                        help="Harvest all topics from a local OpenAlex works snapshot instead of the API "
+                             f"(default DIR: {snapshot_harvest.SNAPSHOT_DIR})")
+    parser.add_argument("--snapshot-workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes scanning snapshot partitions (default: all cores)")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    if args.format == "parquet" and args.batch:
+        parser.error("--format parquet writes one topic at a time; drop --batch")
+    if args.format == "parquet" and args.store:
+        parser.error("--store and --format parquet are mutually exclusive")
+    if args.snapshot and (args.format != "csv" or args.store or args.delta):
+        parser.error("--snapshot writes the per-topic CSVs; drop --format/--store/--delta")
+    metrics.setup(args)
+    page_stats = []
+    opts = dict(projected=args.projected, lazy_abstracts=args.lazy_abstracts,
+                stream_pages=args.stream_pages, page_stats=page_stats)
+    if args.format != "csv":
+        opts["fmt"] = args.format
+    if args.store:
+        opts["store"] = WorkStore(args.store, download_openalex_matching.FIELDNAMES)
+    # the shared OpenAlex limiter, also used by requests made without an explicit one
+    limiter = openalex_bucket(args.requests_per_minute)
+
+    if args.snapshot:
+        tids = [int(t) for t in pd.read_csv(TOPIC_CSV)["topic_id"]]
+        stats = snapshot_harvest.harvest(tids, Path(args.snapshot), workers=args.snapshot_workers)
+        done = read_done()
+        for tid in tids:
+            if tid not in done:
+                append_done(tid)
+        print(f"Snapshot: {stats['scanned']:,} partitions scanned ({stats['skipped']:,} unchanged), "
+              f"{stats['lines']:,} works, {stats['written']:,} new rows for "
+              f"{sum(1 for n in stats['topics'].values() if n)} topics in {stats['seconds']:.0f}s")
+        return
+
+    if args.delta:
+        topics = pd.read_csv(TOPIC_CSV)
+        run_delta([int(t) for t in topics["topic_id"]], limiter, args.workers, args.batch,
+                  date_field=args.delta_field, **opts)
+        print(f"Pages: {download_openalex_matching.summarize_page_stats(page_stats)}")
+        return
+
     topics = pd.read_csv(TOPIC_CSV)
     done = read_done()
     print(f"Already done: {len(done)} topics")
+    todo = []
     for _, row in topics.iterrows():
         tid = int(row["topic_id"])
         if tid in done:
-            print(f"Skipping {tid} (already done)")
+            metrics.log(f"Skipping {tid} (already done)")
             continue
-        print(f"Downloading topic {tid} ...")
-        try:
-            n = download_openalex_matching.download_topic(tid, primary_only=True)
-            print(f"  Downloaded {n} records for topic {tid}")
-            append_done(tid)
-        except Exception as e:
-            print(f"  FAILED for topic {tid}: {e}")
+        todo.append(tid)
+
+    if args.batch:
+        counts = download_openalex_matching.topic_counts(todo, primary=True, limiter=limiter)
+        batches = download_openalex_matching.plan_batches(counts, max_works=args.batch_max_works)
+        print(f"Packed {len(todo)} topics into {len(batches)} batches")
+        failed = []
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            for fut in as_completed([pool.submit(harvest_batch, b, limiter, **opts) for b in batches]):
+                failed.extend(fut.result())
+        print(f"Finished {len(todo) - len(failed)} of {len(todo)} topics; failed: {sorted(failed)}")
+        print(f"Pages: {download_openalex_matching.summarize_page_stats(page_stats)}")
+        return
+
+    if args.workers <= 1:
+        for tid in todo:
+            harvest_topic(tid, limiter, **opts)
+        print(f"Pages: {download_openalex_matching.summarize_page_stats(page_stats)}")
+        return
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(harvest_topic, tid, limiter, **opts): tid for tid in todo}
+        for fut in as_completed(futures):
+            if not fut.result():
+                failed.append(futures[fut])
+    print(f"Finished {len(todo) - len(failed)} of {len(todo)} topics; failed: {sorted(failed)}")
+    print(f"Pages: {download_openalex_matching.summarize_page_stats(page_stats)}")
 
 if __name__ == "__main__":
     main()
@@ -1,36 +1,353 @@
 #!/usr/bin/env python3
+"""
+Merge the per-topic abstract files into ``all_records.csv`` (or ``.parquet``).
+
+* Topic files are parsed in parallel worker processes (``--workers``); the
+  parent consumes them in file order, with at most ``2 × workers`` parsed
+  files in flight, and streams rows straight to the output.
+* A work that appears in several topic files is written once, the first
+  time it is seen.  The seen-set holds the numeric part of each OpenAlex ID
+  (``W2741809807`` → ``2741809807``) rather than the full URL string.
+* Duplicate counts and throughput are printed at the end.
+
+Runs are incremental.  ``all_records.csv.manifest.json`` records the size,
+mtime, sha256, header and work IDs of every topic file merged so far.  On the
+next run unchanged files are not opened at all: rows of new files are
+appended, rows of changed or deleted files are dropped from the output and
+the new versions appended.  A work that a dropped file had contributed but
+that an unchanged file also lists is re-read from that file.  The output is
+rebuilt from scratch (``--full`` forces it) when there is no manifest, the
+merged header changes, or the output was modified outside the combiner.
+"""
 import re
 import csv
+import hashlib
+import os
+import time
+import argparse
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
+import parquet_output
+from json_util import save_json_atomic
+
 ##############################################################################
 # Main filter ----------------------------------------------------------------
 ##############################################################################
 
-# Create abstracts directory if it doesn't exist
 ABSTRACTS_DIR = Path("../abstracts")
-ABSTRACTS_DIR.mkdir(exist_ok=True)
-
-ALL_FIELDS = set()
-
-for csv_path in ABSTRACTS_DIR.glob("T*.csv"):
-    with csv_path.open(newline="", encoding="utf-8") as fin:
-        ALL_FIELDS.update(next(csv.reader(fin)))   # header row only
-
-ALL_FIELDS = list(ALL_FIELDS)                      # keep arbitrary order
-
-##########################################################################
-#  write the merged file
-##########################################################################
-OUT = ABSTRACTS_DIR / "all_records.csv"
-with OUT.open("w", newline="", encoding="utf-8") as fout:
-    writer = csv.DictWriter(fout, fieldnames=ALL_FIELDS)
-    writer.writeheader()
-
-    for csv_path in ABSTRACTS_DIR.glob("T1*.csv"):
-        with csv_path.open(newline="", encoding="utf-8") as fin:
-            reader = csv.DictReader(fin)
-            for row in reader:
-                # fill blanks for any missing columns
-                full_row = {k: row.get(k, "") for k in ALL_FIELDS}
-                writer.writerow(full_row)
+
+WORK_ID_RE = re.compile(r"W(\d+)$")
+
+
+def topic_files():
+    """Per-topic outputs of B_download_all_topics, CSV or Parquet."""
+    return sorted(ABSTRACTS_DIR.glob("T*.csv")) + sorted(ABSTRACTS_DIR.glob("T*.parquet"))
+
+
+def header(path):
+    if path.suffix == ".parquet":
+        return parquet_output.schema_names(path)
+    with path.open(newline="", encoding="utf-8") as fin:
+        return next(csv.reader(fin), [])   # header row only
+
+
+def read_rows(path):
+    if path.suffix == ".parquet":
+        yield from parquet_output.read_records(path)
+        return
+    with path.open(newline="", encoding="utf-8") as fin:
+        yield from csv.DictReader(fin)
+
+
+def work_key(openalex_id):
+    """Compact dedup key: the integer of ``.../W123``, else the raw string."""
+    m = WORK_ID_RE.search(openalex_id or "")
+    return int(m.group(1)) if m else openalex_id
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint(path):
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256_file(path)}
+
+
+def parse_file(path, fields):
+    """
+    Worker: ``(entry, [(key, values), ...])`` for one topic file.  ``values``
+    are already in ``fields`` order with blanks for columns the file does not
+    have; ``entry`` is the file's manifest record.
+    """
+    entry = fingerprint(path)
+    entry["fields"] = header(path)
+    parsed = []
+    for row in read_rows(path):
+        parsed.append((work_key(row.get("openalex_id")),
+                       [row.get(k, "") for k in fields]))
+    entry["ids"] = [key for key, _ in parsed if key]
+    entry["anonymous"] = len(parsed) - len(entry["ids"])
+    return entry, parsed
+
+
+def iter_parsed(paths, fields, workers):
+    """Yield ``(path, entry, parsed)`` in input order, parsing up to ``2 × workers`` files ahead."""
+    if workers <= 1:
+        for path in paths:
+            yield (path,) + parse_file(path, fields)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append((path, pool.submit(parse_file, path, fields)))
+            if len(pending) >= 2 * workers:
+                p, fut = pending.popleft()
+                yield (p,) + fut.result()
+        while pending:
+            p, fut = pending.popleft()
+            yield (p,) + fut.result()
+
+
+def merge_fields(paths):
+    """Union of all headers, first-seen order."""
+    fields = {}
+    for path in paths:
+        fields.update(dict.fromkeys(header(path)))
+    return list(fields)
+
+
+def merge(paths, write, fields, workers, seen=None, entries=None, anonymous=True):
+    """
+    Stream the rows of ``paths`` to ``write(values)``, skipping works whose key
+    is already in ``seen``.  Rows without an ``openalex_id`` are kept, unless
+    ``anonymous`` is False (files whose rows are already in the output).
+    The manifest record of each file is stored in ``entries`` (if given).
+    Returns the stats dict.
+    """
+    seen = set() if seen is None else seen
+    stats = {"files": 0, "rows_read": 0, "duplicates": 0, "rows_written": 0}
+    for path, entry, parsed in iter_parsed(paths, fields, workers):
+        if entries is not None:
+            entries[path.name] = entry
+        stats["files"] += 1
+        stats["rows_read"] += len(parsed)
+        for key, values in parsed:
+            if not key and not anonymous:
+                continue
+            if key:
+                if key in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(key)
+            write(values)
+            stats["rows_written"] += 1
+    return stats
+
+
+##############################################################################
+# Manifest / incremental merge -----------------------------------------------
+##############################################################################
+
+def manifest_path(out_path):
+    return out_path.with_name(out_path.name + ".manifest.json")
+
+
+def load_manifest(out_path):
+    try:
+        with manifest_path(out_path).open(encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_manifest(out_path, fields, entries):
+    st = out_path.stat()
+    save_json_atomic(manifest_path(out_path), {
+        "fields": fields,
+        "output": {"size": st.st_size, "mtime_ns": st.st_mtime_ns},
+        "files": entries,
+    })
+
+
+def output_untouched(out_path, manifest):
+    try:
+        st = out_path.stat()
+    except FileNotFoundError:
+        return False
+    return manifest["output"] == {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def classify(inputs, old_entries):
+    """
+    Split ``inputs`` into unchanged and dirty (new or changed) files.  Size
+    and mtime are compared first; only when they differ is the file hashed,
+    so a file that was merely touched still counts as unchanged.
+    """
+    unchanged, dirty = {}, []
+    for path in inputs:
+        old = old_entries.get(path.name)
+        if old is not None:
+            st = path.stat()
+            if (old["size"], old["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+                unchanged[path.name] = old
+                continue
+            if old["size"] == st.st_size and old["sha256"] == sha256_file(path):
+                unchanged[path.name] = dict(old, mtime_ns=st.st_mtime_ns)
+                continue
+        dirty.append(path)
+    return unchanged, dirty
+
+
+@contextmanager
+def open_output(out_path, fields, fmt, append=False):
+    """Yield ``write(values)`` for the merged file; rewrites go via a temp file."""
+    if fmt == "parquet":
+        with parquet_output.ParquetRowWriter(out_path, fields) as writer:
+            yield writer.write_values
+        return
+    if append:
+        with out_path.open("a", newline="", encoding="utf-8") as fout:
+            yield csv.writer(fout).writerow
+        return
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    try:
+        with tmp.open("w", newline="", encoding="utf-8") as fout:
+            writer = csv.writer(fout)
+            writer.writerow(fields)
+            yield writer.writerow
+        os.replace(tmp, out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def read_output(out_path, fields):
+    """Rows of the current merged file as ``(key, values)``."""
+    idx = fields.index("openalex_id")
+    if out_path.suffix == ".parquet":
+        for row in parquet_output.read_records(out_path):
+            values = [row.get(k) for k in fields]
+            yield work_key(values[idx]), values
+        return
+    with out_path.open(newline="", encoding="utf-8") as fin:
+        reader = csv.reader(fin)
+        next(reader, None)   # header
+        for values in reader:
+            yield work_key(values[idx]), values
+
+
+def full_merge(inputs, out_path, fields, fmt, workers):
+    entries = {}
+    with open_output(out_path, fields, fmt) as write:
+        stats = merge(inputs, write, fields, workers, entries=entries)
+    save_manifest(out_path, fields, entries)
+    return stats
+
+
+def incremental_merge(inputs, out_path, fmt, workers, manifest):
+    """
+    Bring ``out_path`` up to date with ``inputs`` using the previous run's
+    manifest.  Returns the stats dict, or None when a full rebuild is needed.
+    """
+    old_entries = manifest["files"]
+    unchanged, dirty = classify(inputs, old_entries)
+    # changed or deleted since the last run: their old rows leave the output
+    removed = [name for name in old_entries if name not in unchanged]
+    if any(old_entries[name]["anonymous"] for name in removed):
+        return None   # rows without an ID cannot be found again in the output
+
+    fields = {}
+    for path in inputs:
+        names = unchanged[path.name]["fields"] if path.name in unchanged else header(path)
+        fields.update(dict.fromkeys(names))
+    fields = list(fields)
+    if fields != manifest["fields"] or "openalex_id" not in fields:
+        return None
+
+    stats = {"files": len(dirty), "unchanged": len(unchanged), "removed": 0,
+             "rows_read": 0, "duplicates": 0, "rows_written": 0, "rows_dropped": 0}
+    if not dirty and not removed:
+        save_manifest(out_path, fields, unchanged)   # refresh touched mtimes
+        return stats
+
+    drop = set()
+    for name in removed:
+        drop.update(old_entries[name]["ids"])
+    dirty_names = {p.name for p in dirty}
+    stats["removed"] = sum(name not in dirty_names for name in removed)
+
+    kept = set()
+    for entry in unchanged.values():
+        kept.update(entry["ids"])
+    orphans = drop & kept
+    seen = kept - drop
+
+    entries = dict(unchanged)
+    append = not drop and fmt == "csv"
+    rows = [] if append else read_output(out_path, fields)
+    with open_output(out_path, fields, fmt, append=append) as write:
+        for key, values in rows:
+            if key in drop:
+                stats["rows_dropped"] += 1
+                continue
+            write(values)
+        part = merge(dirty, write, fields, workers, seen=seen, entries=entries)
+        for k in ("rows_read", "duplicates", "rows_written"):
+            stats[k] += part[k]
+        orphans -= seen
+        if orphans:
+            rescan = [p for p in inputs if p.name in unchanged
+                      and orphans.intersection(unchanged[p.name]["ids"])]
+            # their ID-less rows never left the output
+            part = merge(rescan, write, fields, workers, seen=seen, anonymous=False)
+            stats["rows_written"] += part["rows_written"]
+    # keep the manifest in input order so rebuilds and increments agree
+    save_manifest(out_path, fields, {p.name: entries[p.name] for p in inputs})
+    return stats
+
+
+def print_stats(stats, elapsed):
+    rate = stats["rows_read"] / elapsed if elapsed > 0 else 0.0
+    if "unchanged" in stats:
+        print(f"{stats['unchanged']:,} files unchanged, {stats['removed']:,} removed, "
+              f"{stats['rows_dropped']:,} old rows dropped")
+    print(f"Merged {stats['files']:,} files: {stats['rows_read']:,} rows read, "
+          f"{stats['duplicates']:,} duplicates dropped, {stats['rows_written']:,} written "
+          f"in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the per-topic abstract files.")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Write all_records.csv or all_records.parquet (needs pyarrow)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Parser processes (default: all cores)")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the manifest and rebuild the merged file from scratch")
+    args = parser.parse_args()
+
+    ABSTRACTS_DIR.mkdir(exist_ok=True)
+    t0 = time.perf_counter()
+    inputs = topic_files()
+    OUT = ABSTRACTS_DIR / f"all_records.{args.format}"
+
+    stats = None
+    manifest = None if args.full else load_manifest(OUT)
+    if manifest is not None and output_untouched(OUT, manifest):
+        stats = incremental_merge(inputs, OUT, args.format, args.workers, manifest)
+    if stats is None:
+        print("[info] Full rebuild")
+        stats = full_merge(inputs, OUT, merge_fields(inputs), args.format, args.workers)
+    print_stats(stats, time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,92 @@
 #!/usr/bin/env python3
 """
-fetch_fulltext.py
-─────────────────
-• Read a Scopus-like CSV that has columns: Title, doi (or DOI), decision …
-• Only rows whose decision == "INCLUDE" are processed.
-• Tries several public APIs (Unpaywall → Semantic Scholar → OpenAlex → CORE)
-  and finally a DOI HEAD redirect to locate an OA PDF.
-• Handles MDPI and Elsevier quirks automatically.
-• If no PDF is captured *but* `oa_status == yes` and you have a
-  publication_url, it saves the HTML page instead (to htmls/).
-• Creates   pdfs/   and   htmls/   directories beside the script.
-• Lots of print lines so you can see *everything* that happens.
+D_download_fulltexts.py
+───────────────────────
+• Reads the merged corpus (``--input``: ``all_records.csv`` from
+  C_combine_csvs.py, or ``all_records.parquet``) and tries to save one PDF
+  per row with a DOI; titles containing "peer review" are skipped.
+• Per row: the Elsevier full-text API first, then the row's OpenAlex
+  ``pdf_url``, then the PDF locators (Unpaywall → Semantic Scholar →
+  OpenAlex → CORE, and finally a DOI HEAD redirect).
+• Handles MDPI and Elsevier quirks automatically.  An Elsevier download
+  that is a full article is also put in ``pdfs/``; anything shorter (usually
+  the abstract page) stays in ``elsevier_pdfs/`` only.
+• Writes under ``fulltexts/`` (``--out-dir``): ``pdfs/``,
+  ``elsevier_pdfs/`` and one line per row in ``scraping_stats.csv``.
+• Lots of print lines so you can see *everything* that happens (``-q``
+  turns them off; ``-v`` adds response headers).  Requests, locators,
+  downloads and PDF checks are also counted and timed in metrics.py, with
+  ``--metrics-port``/``--metrics-json`` exports and ``--events`` JSON logs.
+• ``--workers N`` processes N rows at once.  Every request goes through
+  ``request()``, which holds a per-hostname slot (``--per-host`` requests in
+  flight, ``--host-delay`` seconds between request starts) instead of the
+  old global one-second sleep after each row.
+• ``--locators hedged`` starts the PDF locators staggered by ``--stagger``
+  seconds (0 = all at once) instead of one after another, and takes the
+  highest-priority hit as soon as every locator ahead of it has come back
+  empty.  Locators still running at that point are recorded as "cancelled"
+  and send no further requests; an answer already on its way is ignored.
+• PDF bodies are streamed to ``<name>.part`` and renamed into place only
+  once complete: a body that does not start with ``%PDF`` is abandoned after
+  its first kilobyte, and one larger than ``--max-pdf-mb`` is cut off.
+• PDFs are kept once per content in ``fulltexts/store`` (see pdf_store.py),
+  indexed by DOI; ``pdfs/`` and ``elsevier_pdfs/`` hold hard links to them.
+  A DOI already in the store is skipped whatever its row number.
+• Requests to the metadata APIs and Elsevier also draw from the shared
+  per-provider limiters in rate_limit.py (budgets via ``--rate``), which
+  slow down on 429/503 and honour ``Retry-After``.
+• ``request()`` also consults host_health.py: a host that failed or timed
+  out ``--host-failures`` times in a row is skipped for ``--host-cooldown``
+  seconds, and timeouts shrink to a multiple of the host's observed p95
+  latency.  A TLS error counts as a host failure; only ``BAD_TLS`` hosts
+  are fetched without a certificate check.
+• Every attempt is recorded per DOI and provider in download_state.py; a
+  DOI that failed is only retried once its exponential backoff has passed.
+  A failed row that skipped a host with an open circuit (status
+  ``host_down``) is not recorded, so it is simply tried again next run.
+• Saved PDFs are checked by pdf_validation.py in ``--validate-workers``
+  processes while downloading continues; the row's stats line is written
+  when its check finishes.
+• With a local Unpaywall snapshot index (build_unpaywall_index.py) the
+  Unpaywall locator answers from disk and only asks the API about DOIs the
+  snapshot does not know.
+• ``--shard I/N`` processes only the rows whose DOI hashes to shard I, with
+  its own output directory (stats, PDFs, store, state), so N machines can
+  split the run without talking to each other; merge_fulltext_shards.py
+  combines the shard directories afterwards.
+• Metadata lookups (``fetch_json``) are cached in ``--http-cache`` (SQLite,
+  see http_cache.py), so a re-run mostly skips the network.
 """
 
-import csv, os, re, time, json, urllib.parse
+import argparse, csv, os, re, time, json, urllib.parse, threading, hashlib, itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import ExitStack
 from pathlib import Path
-from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 from urllib3.exceptions import NameResolutionError
 
-from io import BytesIO
-import fitz  # PyMuPDF
 import shutil
 
 import pprint
+
+import parquet_output
+import rate_limit
+from rate_limit import HostLimiter, PROVIDERS
+import host_health
+from host_health import HostHealth, hostname
+import http_cache
+import pdf_validation
+import pdf_store
+import download_state
+import build_unpaywall_index
+import metrics
+
 # ───────────────────────── configurable paths ────────────────────────────────
-CSV_IN   = "../abstracts/all_records.csv"
+CSV_IN   = "../abstracts/all_records.csv"   # or all_records.parquet via --input
+# the only columns main() reads; Parquet input loads just these
+RECORD_COLUMNS = ["title", "doi", "pdf_url", "landing_url", "oa_status"]
 
 # Create fulltexts directory and subdirectories
 FULLTEXTS_DIR = Path("../fulltexts")
@@ -41,10 +101,40 @@ FIELDNAMES = ["tag", "doi", "oa_status",
               "elsevier_error_code", "elsevier_pages","elsevier_status", "success",
               "unpaywall_status", "semantic_status",
               "openalex_status", "core_status",
-              "doi_head_status","direct_download_status"]
+              "doi_head_status","direct_download_status",
+              "pdf_sha256", "pdf_pages", "pdf_chars_per_page", "pdf_check"]
 STATS_CSV = "../fulltexts/scraping_stats.csv"
 
 
+def set_output_dir(root: Path) -> None:
+    """Send PDFs and stats to ``root`` instead of ../fulltexts (e.g. one dir per shard)."""
+    global FULLTEXTS_DIR, ELSEVIER_PDF_DIR, PDF_DIR, STATS_CSV
+    FULLTEXTS_DIR = Path(root)
+    ELSEVIER_PDF_DIR = FULLTEXTS_DIR / "elsevier_pdfs"
+    PDF_DIR = FULLTEXTS_DIR / "pdfs"
+    STATS_CSV = str(FULLTEXTS_DIR / "scraping_stats.csv")
+    for d in (FULLTEXTS_DIR, ELSEVIER_PDF_DIR, PDF_DIR):
+        d.mkdir(parents=True, exist_ok=True)
+
+
+def shard_of(doi: str | None, shards: int) -> int:
+    """Shard of a row, from a hash of its DOI that is the same on every machine."""
+    key = (sanitize_doi(doi) or "").lower().encode("utf-8")
+    return int.from_bytes(hashlib.sha1(key).digest()[:8], "big") % shards
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """``"2/8"`` → ``(2, 8)``; shards are numbered from 0."""
+    i, sep, n = spec.partition("/")
+    if not (sep and i.isdigit() and n.isdigit() and 0 <= int(i) < int(n)):
+        raise ValueError(f"--shard expects I/N with 0 <= I < N, got {spec!r}")
+    return int(i), int(n)
+
+
+def shard_dir(shard: tuple[int, int]) -> Path:
+    return Path("../fulltexts") / f"shard-{shard[0]}-of-{shard[1]}"
+
+
 # Load API key from API_KEYS.txt file
 def load_api_key():
     try:
@@ -75,6 +165,31 @@ HEADERS = {
 }
 SESSION = requests.Session()
 SESSION.headers.update(HEADERS)
+# the Elsevier API gets the plain requests User-Agent, as before
+ELSEVIER_SESSION = requests.Session()
+
+PER_HOST = 2          # requests in flight per hostname
+HOST_DELAY = 1.0      # seconds between request starts to one hostname
+HOSTS = HostLimiter(PER_HOST, HOST_DELAY)
+BAD_TLS = {"mausamjournal.imd.gov.in"}   # hostnames whose certs are broken
+HEALTH = HostHealth()
+THROTTLE_RETRIES = 2  # retries of a 429/503 from a rate-limited API
+CACHE = None          # http_cache.HttpCache, opened by main()
+VALIDATOR = pdf_validation.Validator(workers=0)   # main() starts the process pool
+STORE = None          # pdf_store.PdfStore, opened by main(); None writes plain files
+STATE = None          # download_state.DownloadState, opened by main()
+IGNORE_BACKOFF = False
+UNPAYWALL = None      # build_unpaywall_index.UnpaywallIndex, opened by main() if built
+# stats columns recorded per provider in the state store
+PROVIDER_COLUMNS = {
+    "elsevier": "elsevier_error_code",
+    "unpaywall": "unpaywall_status",
+    "semantic": "semantic_status",
+    "openalex": "openalex_status",
+    "core": "core_status",
+    "doi_head": "doi_head_status",
+    "direct_download": "direct_download_status",
+}
 
 # Load email from API_KEYS.txt file
 def load_email():
@@ -88,32 +203,43 @@ def load_email():
     except FileNotFoundError:
         raise FileNotFoundError("API_KEYS.txt file not found. Please create it with your email address.")
 
+_stats_lock = threading.Lock()
+
 def write_stats(row):
-    with open(STATS_CSV, "a", newline="", encoding="utf-8") as fh:
+    # one locked append per row, so rows from different workers never interleave
+    with _stats_lock, open(STATS_CSV, "a", newline="", encoding="utf-8") as fh:
         csv.DictWriter(fh, fieldnames=FIELDNAMES).writerow(row)
 
-
-
-def is_full_article(pdf_file) -> bool:
-    """
-    True  → looks like a complete article
-    False → probably just the title/abstract page
-
-    • Primary test: ≥ `min_pages` pages using PyPDF2
-    • Fallback:     at least `min_len` bytes if PyPDF2 unavailable
-    """
-
-    doc = fitz.open(pdf_file)
-    num_pages = len(doc)
-    print(f"num_pages: {num_pages}")
-    return num_pages >= 2
-
-
-def looks_like_pdf(blob: bytes) -> bool:
-    return blob[:4] == b"%PDF" and len(blob) > 10_000
-
+def ensure_stats_file():
+    """Create scraping_stats.csv, or rewrite it under the current header if columns changed."""
+    if not os.path.exists(STATS_CSV):
+        with open(STATS_CSV, "w", newline="", encoding="utf-8") as fh:
+            csv.DictWriter(fh, fieldnames=FIELDNAMES).writeheader()
+        return
+    with open(STATS_CSV, newline="", encoding="utf-8") as fh:
+        reader = csv.DictReader(fh)
+        if reader.fieldnames == FIELDNAMES:
+            return
+        old_rows = list(reader)
+    dbg(f"Migrating {STATS_CSV} to the current columns ({len(old_rows):,} rows)")
+    tmp = STATS_CSV + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=FIELDNAMES, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(old_rows)
+    os.replace(tmp, STATS_CSV)
+
+
+_log = threading.local()
 
 def dbg(msg: str):
+    """Per-row log line; ``-q`` turns them all off."""
+    if metrics.VERBOSITY < metrics.NORMAL:
+        return
+    tag = getattr(_log, "tag", None)   # set per row when running with workers
+    if tag:
+        body = msg.lstrip("\n")
+        msg = f"{msg[:len(msg) - len(body)]}[{tag}] {body}"
     print(msg, flush=True)
 
 def safe_filename(text: str, limit: int = 80) -> str:
@@ -126,19 +252,148 @@ def sanitize_doi(raw: str | None) -> str | None:
     raw = re.sub(r"https?://(dx\.)?doi\.org/", "", raw)
     return re.sub(r"\s+", "", raw)
 
+def mount_pools(size: int) -> None:
+    """Keep up to ``size`` connections per host alive, one per worker."""
+    for session in (SESSION, ELSEVIER_SESSION):
+        adapter = HTTPAdapter(pool_connections=max(10, size), pool_maxsize=max(10, size))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+class HostDown(requests.ConnectionError):
+    """A request was not sent because the host's circuit is open."""
+
+HOST_DOWN = "host_down"   # status of a provider or download skipped by an open circuit
+
+class Cancelled(Exception):
+    """A hedged locator was not sent because another locator already won."""
+
+def check_cancelled() -> None:
+    cancel = getattr(_log, "cancel", None)   # set per hedged locator task
+    if cancel is not None and cancel.is_set():
+        raise Cancelled
+
+def request(method: str, url: str, session: requests.Session = SESSION, **kw) -> requests.Response:
+    """
+    All HTTP traffic goes through here so the per-host limits apply.  URLs
+    of a known API provider first wait for its limiter, which is told about
+    every answer; throttled answers are retried ``THROTTLE_RETRIES`` times.
+    A hedged locator whose race is already decided raises Cancelled instead
+    of sending anything.
+    """
+    limiter = PROVIDERS.for_url(url)
+    for attempt in range(THROTTLE_RETRIES + 1):
+        check_cancelled()
+        if limiter is not None:
+            limiter.acquire()
+            check_cancelled()   # the wait for the provider may have been long
+        r = send(method, url, session, throttle_aware=limiter is not None, **kw)
+        if limiter is None:
+            return r
+        retry_after = r.headers.get("Retry-After")
+        limiter.feedback(r.status_code, retry_after)
+        if r.status_code not in rate_limit.THROTTLE_STATUSES or attempt == THROTTLE_RETRIES:
+            return r
+        if (rate_limit.parse_retry_after(retry_after) or 0) > rate_limit.MAX_PAUSE:
+            return r                # e.g. a daily quota is used up; not worth waiting for
+        metrics.event("throttled", host=hostname(url), status=r.status_code, retry_after=retry_after)
+        dbg(f"    ↪ {r.status_code} from {hostname(url)}, slowing down and retrying …")
+        r.close()
+
+def send(method: str, url: str, session: requests.Session, throttle_aware: bool = False,
+         **kw) -> requests.Response:
+    """
+    One request under the host's slot.  The ``timeout`` given is an upper
+    bound; HEALTH shortens it for hosts that usually answer quickly, and
+    skips hosts that keep failing.  With ``stream=True`` the slot is held
+    until the response is closed, so ``--per-host`` also caps the bodies
+    being downloaded from one host.
+    """
+    if not HEALTH.allow(url):
+        metrics.METRICS.inc("http_skipped_total", host=hostname(url))
+        raise HostDown(f"{hostname(url)} skipped, circuit open for {HEALTH.retry_in(url):.0f}s")
+    if "timeout" in kw:
+        kw["timeout"] = HEALTH.timeout(url, kw["timeout"])
+    with ExitStack() as slot:
+        slot.enter_context(HOSTS.slot(url))
+        t0 = time.monotonic()
+        try:
+            r = session.request(method, url, **kw)
+        except requests.Timeout as e:
+            metrics.http(url, f"error:{e.__class__.__name__}", time.monotonic() - t0)
+            HEALTH.failure(url, latency=time.monotonic() - t0)
+            raise
+        except requests.RequestException as e:
+            metrics.http(url, f"error:{e.__class__.__name__}", time.monotonic() - t0)
+            HEALTH.failure(url)
+            raise
+        except BaseException:
+            HEALTH.release(url)
+            raise
+        if kw.get("stream"):
+            hold_until_closed(r, slot.pop_all())
+    metrics.http(url, r.status_code, time.monotonic() - t0)
+    if throttle_aware and r.status_code in rate_limit.THROTTLE_STATUSES:
+        HEALTH.release(url)         # busy, not down: the limiter slows down instead
+    elif r.status_code >= 500:
+        HEALTH.failure(url)
+    else:
+        HEALTH.success(url, time.monotonic() - t0)
+    return r
+
+def hold_until_closed(r: requests.Response, slot: ExitStack) -> None:
+    """Release ``slot`` when ``r`` is closed (``with r:`` and ``r.close()`` both do)."""
+    close = r.close
+    def close_and_release():
+        try:
+            close()
+        finally:
+            slot.close()    # a no-op the second time
+    r.close = close_and_release
+
+def cached_json(entry) -> dict | None:
+    return json.loads(entry.body) if entry.status == 200 else None
+
 def fetch_json(url: str) -> dict | None:
     dbg(f"  GET-JSON  {url}")
+    entry = CACHE.get(url) if CACHE is not None else None
+    if entry is not None and entry.fresh:
+        dbg(f"    ↪ cached {entry.status}")
+        return cached_json(entry)
+    headers = entry.validators() if entry is not None else {}
     try:
-        r = SESSION.get(url, timeout=20)
+        r = request("GET", url, headers=headers, timeout=20)
         dbg(f"    ↪ {r.status_code}  {r.reason}  len={len(r.content)}")
+        if r.status_code == 304 and entry is not None:
+            CACHE.revalidated(url)
+            return cached_json(entry)
+        if CACHE is not None and r.status_code in http_cache.NEGATIVE_STATUSES:
+            CACHE.put(url, r.status_code)
         r.raise_for_status()
-        return r.json()
-    except (requests.RequestException, json.JSONDecodeError) as e:
+        data = r.json()
+        if CACHE is not None:
+            CACHE.put(url, 200, r.content, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return data
+    except (HostDown, Cancelled):
+        raise
+    except requests.RequestException as e:
+        status = getattr(e.response, "status_code", None)
+        if entry is not None and status not in http_cache.NEGATIVE_STATUSES:
+            # an outdated answer beats none while the API is unreachable
+            dbg(f"    ! {e}; using the stale cached {entry.status}")
+            return cached_json(entry)
+        dbg(f"    ! JSON error: {e}")
+        return None
+    except json.JSONDecodeError as e:
         dbg(f"    ! JSON error: {e}")
         return None
 
 # ──────────────────────────── locators ───────────────────────────────────────
 def url_unpaywall(doi):
+    if UNPAYWALL is not None:
+        found, url = UNPAYWALL.lookup(doi)
+        if found:
+            dbg(f"  unpaywall snapshot: {url or 'no PDF'}")
+            return url
     j = fetch_json(f"https://api.unpaywall.org/v2/{doi}?email={load_email()}")
     if not j:
         return None
@@ -170,10 +425,12 @@ def url_doi_head(doi):
     url = f"https://doi.org/{doi}"
     dbg(f"  HEAD/doi  {url}")
     try:
-        r = SESSION.head(url, allow_redirects=False, timeout=20)
+        r = request("HEAD", url, allow_redirects=False, timeout=20)
         dbg(f"    ↪ {r.status_code}  Location={r.headers.get('Location')}")
         if r.status_code in (302, 303):
             return r.headers.get("Location")
+    except HostDown:
+        raise
     except requests.RequestException as e:
         dbg(f"    ! doi HEAD error: {e}")
     return None
@@ -185,6 +442,115 @@ LOCATORS = [
     ("core_status", url_core_doi),
     ("doi_head_status", url_doi_head)
 ]
+LOCATOR_MODE = "serial"   # or "hedged"
+STAGGER = 0.5             # seconds between hedged locator starts
+LOCATOR_POOL = None       # ThreadPoolExecutor, created by main() for hedged mode
+
+
+def run_locator(locator, doi) -> tuple[str, str | None]:
+    """``(status, url)`` for one locator, retrying once after a DNS failure."""
+    name = locator.__name__[4:]
+    dbg(f"* locator: {name}")
+    with metrics.METRICS.timer("stage_seconds", stage="locator", locator=name):
+        status, url = _run_locator(locator, doi)
+    metrics.METRICS.inc("locator_results_total", locator=name, result=status.split(":")[0])
+    return status, url
+
+
+def _run_locator(locator, doi) -> tuple[str, str | None]:
+    try:
+        url = locator(doi)
+    except HostDown:
+        return HOST_DOWN, None
+    except Cancelled:
+        return "cancelled", None
+    except NameResolutionError:
+        dbg("  ! DNS error, retrying once …")
+        time.sleep(3)
+        try:
+            url = locator(doi)
+        except HostDown:
+            return HOST_DOWN, None
+        except Cancelled:
+            return "cancelled", None
+        except Exception as e:
+            return f"error:{e.__class__.__name__}", None
+    except Exception as e:
+        return f"error:{e.__class__.__name__}", None
+    if url:
+        dbg(f"  → {url}")
+        return "SUCCESS", url
+    return "none", None
+
+
+def first_hit(tasks, is_hit, pool, stagger):
+    """
+    Run the zero-argument ``tasks`` (highest priority first) on ``pool``,
+    starting one every ``stagger`` seconds, or sooner once everything started
+    so far has finished without a hit.  Returns ``(winner, results, abandoned)``:
+    the index of the highest-priority task whose result ``is_hit`` (None if
+    there is none), the results of the tasks that finished, and the indices
+    of tasks that were started but are no longer waited for.
+    """
+    futures, results = {}, {}
+    t0 = time.monotonic()
+    while True:
+        # the winner is known once every task ahead of a hit has missed
+        for i in range(len(tasks)):
+            if i not in results:
+                break
+            if is_hit(results[i]):
+                abandoned = [j for j in futures if j not in results]
+                for j in abandoned:
+                    futures[j].cancel()
+                return i, results, abandoned
+        else:
+            return None, results, []
+        running = [f for j, f in futures.items() if j not in results]
+        if len(futures) < len(tasks) and (
+                not running or time.monotonic() >= t0 + len(futures) * stagger):
+            futures[len(futures)] = pool.submit(tasks[len(futures)])
+            continue
+        timeout = None
+        if len(futures) < len(tasks):
+            timeout = max(0.0, t0 + len(futures) * stagger - time.monotonic())
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for j, f in futures.items():
+            if f in done:
+                results[j] = f.result()
+
+
+def locate_pdf(doi, stats_row) -> str | None:
+    """Ask the LOCATORS for a PDF URL, filling their status columns in ``stats_row``."""
+    if LOCATOR_MODE != "hedged":
+        for colname, locator in LOCATORS:
+            status, url = run_locator(locator, doi)
+            stats_row[colname] = status
+            if url:
+                return url
+        return None
+
+    tag = getattr(_log, "tag", None)
+    cancel = threading.Event()
+    def task(locator):
+        def call():
+            _log.tag = tag   # pool threads log under the row's tag
+            _log.cancel = cancel
+            try:
+                return run_locator(locator, doi)
+            finally:
+                _log.cancel = None
+        return call
+
+    winner, results, abandoned = first_hit(
+        [task(locator) for _, locator in LOCATORS], lambda r: r[1] is not None,
+        LOCATOR_POOL, STAGGER)
+    cancel.set()   # abandoned locators send no further requests
+    for i, (status, _) in results.items():
+        stats_row[LOCATORS[i][0]] = status
+    for i in abandoned:
+        stats_row[LOCATORS[i][0]] = "cancelled"
+    return results[winner][1] if winner is not None else None
 
 # ─────────────────── provider-specific URL tweaks ────────────────────────────
 pii_re = re.compile(r"/retrieve/pii/(S\d{15,})")
@@ -200,194 +566,482 @@ def maybe_fix_mdpi(url, html_url):
         return url, {"Referer": html_url or "https://www.mdpi.com/"}
     return url, {}
 
-BAD_TLS = {"mausamjournal.imd.gov.in"}   # hostnames whose certs are broken
-
 # ───────────────────────── download helpers ─────────────────────────────────
-def download(url: str, dest: Path, html_ref: str | None = None) -> bool:
+CHUNK_BYTES = 64 * 1024
+PDF_MAGIC_WINDOW = 1024              # "%PDF" must appear within the first KiB
+MAX_PDF_BYTES = 100 * 1024 * 1024    # --max-pdf-mb
+
+class NotAPdf(ValueError):
+    pass
+
+def save_pdf_stream(r, dest: Path, min_bytes: int = 0) -> str:
+    """
+    Stream the body of ``r`` (opened with ``stream=True``) to ``dest`` and
+    return its sha256.  Raises NotAPdf without touching ``dest`` if the body
+    is not a PDF, is larger than MAX_PDF_BYTES or smaller than ``min_bytes``.
+    """
+    declared = r.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > MAX_PDF_BYTES:
+        raise NotAPdf(f"too large ({int(declared):,} bytes)")
+    chunks = r.iter_content(CHUNK_BYTES)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= PDF_MAGIC_WINDOW:
+            break
+    if b"%PDF" not in head[:PDF_MAGIC_WINDOW]:
+        raise NotAPdf("not PDF")
+
+    sha = hashlib.sha256()
+    size = 0
+    tmp = dest.with_name(dest.name + ".part")
+    try:
+        with tmp.open("wb") as fh:
+            for chunk in itertools.chain([head], chunks):
+                size += len(chunk)
+                if size > MAX_PDF_BYTES:
+                    raise NotAPdf(f"too large (> {MAX_PDF_BYTES:,} bytes)")
+                sha.update(chunk)
+                fh.write(chunk)
+            fh.flush()
+            os.fsync(fh.fileno())
+        if size < min_bytes:
+            raise NotAPdf(f"too small ({size:,} bytes)")
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    dbg(f"    ✓ {size:,} bytes  sha256={sha.hexdigest()[:12]}")
+    return sha.hexdigest()
+
+def store_pdf(r, dest: Path, min_bytes: int = 0) -> str:
+    """
+    Stream a PDF response into the store and make ``dest`` a view of it
+    (or write ``dest`` directly when running without a store).  Returns the sha256.
+    """
+    if STORE is None:
+        return save_pdf_stream(r, dest, min_bytes)
+    tmp = STORE.new_tmp()
+    sha = save_pdf_stream(r, tmp, min_bytes)
+    STORE.put(tmp, sha)
+    STORE.view(sha, dest)
+    return sha
+
+def remember(doi: str, sha: str, source: str) -> None:
+    if STORE is not None:
+        STORE.link(doi, sha, source)
+
+def download(url: str, dest: Path, html_ref: str | None = None) -> str | None:
+    """
+    Save ``url`` to ``dest`` if it is a PDF; returns its sha256, else None.
+    Raises HostDown, without a request, while the host's circuit is open.
+    """
     # MDPI referer tweak
     url, extra_hdr = maybe_fix_mdpi(url, html_ref)
     # Elsevier tweak
     if "elsevier.com/retrieve/pii/" in url:
         url = fix_elsevier(url)
 
-    verify_tls = urlparse(url).hostname not in BAD_TLS
     dbg(f"  DOWNLOAD {url}")
+    with metrics.stage("download"):
+        sha = _download(url, dest, extra_hdr)
+    metrics.METRICS.inc("downloads_total", result="pdf" if sha else "failed")
+    return sha
+
+def _download(url: str, dest: Path, extra_hdr: dict) -> str | None:
+    # only hand-picked hosts are fetched without a certificate check; a TLS
+    # error anywhere else is an ordinary failure of that host
+    verify_tls = hostname(url) not in BAD_TLS
     try:
-        r = SESSION.get(url, headers=extra_hdr, timeout=40,
-                        allow_redirects=True, verify=verify_tls)
-        dbg(f"    ↪ {r.status_code}  {r.reason}  ct={r.headers.get('Content-Type')}  len={len(r.content)}")
-        r.raise_for_status()
-
-        if "pdf" not in r.headers.get("Content-Type", "").lower():
-            raise ValueError("not PDF")
-
-        dest.write_bytes(r.content)
-        return True
+        return fetch_pdf(url, dest, extra_hdr, verify_tls)
+    except HostDown:
+        raise
     except (requests.RequestException, ValueError) as e:
         dbg(f"    ! download error: {e}")
-        return False
-
-# HTML saving functionality removed - only saving PDFs now
-
-# ─────────────────────────────── main ───────────────────────────────────────
-def main():
-    if not os.path.exists(STATS_CSV):
-        with open(STATS_CSV, "w", newline="", encoding="utf-8") as fh:
-            csv.DictWriter(fh, fieldnames=FIELDNAMES).writeheader()
-
-
-    with open(CSV_IN, newline='', encoding='utf-8') as fh:
-        rows = [row for row in csv.DictReader(fh)]
+        return None
 
-    # start_idx = 1200   # <-- minimal edit, 0-based (row 649 is the 650th row)
-    for idx, row in enumerate(rows):
-        # if idx < start_idx:
-        #     continue        
-        title   = row.get("title") or "untitled"
-        doi_raw = row.get("doi") or ""
-        doi     = sanitize_doi(doi_raw)
-        pdf_url= row.get("pdf_url") or ""
-        html_url= row.get("landing_url") or ""
+def fetch_pdf(url: str, dest: Path, headers: dict, verify: bool) -> str:
+    with request("GET", url, headers=headers, timeout=40, stream=True,
+                 allow_redirects=True, verify=verify) as r:
+        dbg(f"    ↪ {r.status_code}  {r.reason}  ct={r.headers.get('Content-Type')}  "
+            f"len={r.headers.get('Content-Length', '?')}")
+        r.raise_for_status()
+        # the body is sniffed, so PDFs served as octet-stream are kept too
+        return store_pdf(r, dest)
 
-        if "peer review" in title.lower():
-            print("\nThis is a peer review, skipping\n")
-            continue
+# HTML saving functionality removed - only saving PDFs now
 
-        tag = f"row{idx:03d}"
-
-        oa_flag = row.get("oa_status")
-        stats_row = {                    
-            "tag": tag,
-            "doi": doi or "",
-            "oa_status": oa_flag,
-            "elsevier_error_code": "",     # HTTP code or short label
-            "elsevier_pages": "",         # int, blank if not tried / failed
-            "elsevier_status": "",      
-            "success": 0,
-            "unpaywall_status": "",
-            "semantic_status": "",
-            "openalex_status": "",
-            "core_status": "",
-            "doi_head_status": "",
-            "direct_download_status": "",
-        }
-
-
-        dbg(f"\n=== [{tag}]  {title[:70]}")
-
-        if not doi:
-            dbg("! no DOI → skipped")
-            stats_row["elsevier_error_code"] = "NO DOI, SKIPPING"
-            write_stats(stats_row)
-            continue
+def load_records(path: str) -> list[dict]:
+    if str(path).endswith(".parquet"):
+        return list(parquet_output.read_records(path, columns=RECORD_COLUMNS))
+    with open(path, newline='', encoding='utf-8') as fh:
+        return [row for row in csv.DictReader(fh)]
 
-        pdf_name = f"{tag}__{safe_filename(title)}.pdf"
-        elsevier_pdf_path = ELSEVIER_PDF_DIR / pdf_name
-        pdf_path = PDF_DIR / pdf_name
+# ─────────────────────────────── main ───────────────────────────────────────
+def finish_row(stats_row: dict, host_down: bool = False) -> None:
+    """
+    Write the row's stats line and record the attempt for its DOI.  A failed
+    row that skipped a host with an open circuit (``host_down``, or a
+    HOST_DOWN status) was not a full attempt and is not recorded.
+    """
+    write_stats(stats_row)
+    outcomes = {p: stats_row[c] for p, c in PROVIDER_COLUMNS.items() if stats_row[c] != ""}
+    skipped = not stats_row["success"] and (host_down or HOST_DOWN in outcomes.values())
+    outcome = "pdf" if stats_row["success"] else HOST_DOWN if skipped else "no_pdf"
+    metrics.METRICS.inc("rows_total", outcome=outcome)
+    metrics.event("row", **stats_row)
+    if STATE is not None and stats_row["doi"]:
+        if skipped:
+            dbg("  state: not recorded, a host was skipped")
+            return
+        status = STATE.record(stats_row["doi"], outcomes, bool(stats_row["success"]))
+        if status != "done":
+            dbg(f"  state: {status}")
+
+
+def finish_pdf(stats_row: dict, path: Path, sha: str, on_checked=None) -> None:
+    """
+    Validate ``path`` in the background, then record the result and write
+    the row's stats line.  ``on_checked(result)`` runs first, if given.
+    """
+    stats_row["pdf_sha256"] = sha
+    tag = getattr(_log, "tag", None)
 
-        if elsevier_pdf_path.exists():
-            dbg(f"✓ PDF already exists (elsevier) ({pdf_name})")
-            continue
-        if pdf_path.exists():
-            dbg(f"✓ PDF already exists ({pdf_name})")
-            continue
+    def done(result):
+        _log.tag = tag
+        try:
+            stats_row["pdf_check"] = result["check"]
+            stats_row["pdf_pages"] = result["pages"]
+            stats_row["pdf_chars_per_page"] = result["chars_per_page"]
+            dbg(f"  pdf check {path.name}: {result['check']}  pages={result['pages']}")
+            if on_checked is not None:
+                try:
+                    on_checked(result)
+                except Exception as e:   # still write the row below
+                    metrics.METRICS.inc("pdf_check_callback_errors_total", step="on_checked")
+                    dbg(f"  post-check step failed for {path.name}: {e!r}")
+            finish_row(stats_row)
+        finally:
+            _log.tag = None
+
+    VALIDATOR.submit(path, done)
+
+
+def process_row(idx: int, row: dict) -> None:
+    with metrics.stage("row"):
+        _process_row(idx, row)
+
+
+def _process_row(idx: int, row: dict) -> None:
+    title   = row.get("title") or "untitled"
+    doi_raw = row.get("doi") or ""
+    doi     = sanitize_doi(doi_raw)
+    pdf_url= row.get("pdf_url") or ""
+    html_url= row.get("landing_url") or ""
+
+    if "peer review" in title.lower():
+        dbg("\nThis is a peer review, skipping\n")
+        metrics.METRICS.inc("rows_total", outcome="peer_review")
+        return
+
+    tag = f"row{idx:03d}"
+
+    oa_flag = row.get("oa_status")
+    stats_row = {                    
+        "tag": tag,
+        "doi": doi or "",
+        "oa_status": oa_flag,
+        "elsevier_error_code": "",     # HTTP code or short label
+        "elsevier_pages": "",         # int, blank if not tried / failed
+        "elsevier_status": "",      
+        "success": 0,
+        "unpaywall_status": "",
+        "semantic_status": "",
+        "openalex_status": "",
+        "core_status": "",
+        "doi_head_status": "",
+        "direct_download_status": "",
+        "pdf_sha256": "",
+        "pdf_pages": "",
+        "pdf_chars_per_page": "",
+        "pdf_check": "",
+    }
 
 
+    dbg(f"\n=== [{tag}]  {title[:70]}")
 
-        api_url = f"https://api.elsevier.com/content/article/doi/{doi}"
-        print("api_url")
-        print(api_url)
-        try:
-            resp = requests.get(api_url, headers=get_elsevier_headers(), timeout=60)
-            stats_row["elsevier_error_code"] = resp.status_code    # <- NEW
-            stats_row["elsevier_status"] = resp.headers.get("X-ELS-Status", "")
-            print("X-ELS-Status")
-            print(resp.headers.get("X-ELS-Status", ""))
-        except Exception as e:
-            stats_row["elsevier_error_code"] = f"EXC:{e.__class__.__name__}"   # <- NEW
-            print(f"except: {e}")
-            print(f"FAIL elsevier")
-            # continue
-        if resp and resp.ok and looks_like_pdf(resp.content):
-            elsevier_pdf_path.write_bytes(resp.content)
-            num_pages = len(fitz.open(elsevier_pdf_path))            # <- NEW
-            stats_row["elsevier_pages"] = num_pages                  # <- NEW
-            print()
-            print("ELSEVIERresp.headers")
-            pprint.pprint(resp.headers)
-            print(f"✅ {elsevier_pdf_path.name}   ")
-            print()
-
-            if is_full_article(str(elsevier_pdf_path)):
+    if not doi:
+        dbg("! no DOI → skipped")
+        stats_row["elsevier_error_code"] = "NO DOI, SKIPPING"
+        write_stats(stats_row)
+        metrics.METRICS.inc("rows_total", outcome="no_doi")
+        return
+
+    pdf_name = f"{tag}__{safe_filename(title)}.pdf"
+    elsevier_pdf_path = ELSEVIER_PDF_DIR / pdf_name
+    pdf_path = PDF_DIR / pdf_name
+
+    known = STORE.lookup(doi) if STORE is not None else None
+    if known:
+        sha, source = known
+        # move the views to this row's name; only full articles appear in pdfs/
+        if source == "elsevier_partial":
+            STORE.relink(sha, elsevier_pdf_path)
+        else:
+            STORE.relink(sha, pdf_path)
+            if source == "elsevier":
+                STORE.relink(sha, elsevier_pdf_path)
+        dbg(f"✓ PDF already stored ({source}, {sha[:12]})")
+        metrics.METRICS.inc("rows_total", outcome="already_stored")
+        return
+    if elsevier_pdf_path.exists() or pdf_path.exists():
+        dbg(f"✓ PDF already exists{' (elsevier)' if elsevier_pdf_path.exists() else ''} ({pdf_name})")
+        metrics.METRICS.inc("rows_total", outcome="already_stored")
+        return
+    if STATE is not None and not IGNORE_BACKOFF and not STATE.due(doi):
+        retry = STATE.next_retry(doi)
+        when = time.strftime("%Y-%m-%d", time.localtime(retry)) if retry else "never"
+        dbg(f"– tried before, next retry {when}")
+        metrics.METRICS.inc("rows_total", outcome="backoff")
+        return
+
+
+
+    api_url = f"https://api.elsevier.com/content/article/doi/{doi}"
+    dbg(f"api_url {api_url}")
+    resp = None
+    elsevier_sha = None
+    elsevier_t0 = time.perf_counter()
+    try:
+        resp = request("GET", api_url, session=ELSEVIER_SESSION,
+                       headers=get_elsevier_headers(), timeout=60, stream=True)
+        stats_row["elsevier_error_code"] = resp.status_code    # <- NEW
+        stats_row["elsevier_status"] = resp.headers.get("X-ELS-Status", "")
+        dbg(f"X-ELS-Status {resp.headers.get('X-ELS-Status', '')}")
+        if resp.ok:
+            # a PDF of more than 10 kB; anything smaller is an error page
+            elsevier_sha = store_pdf(resp, elsevier_pdf_path, min_bytes=10_001)
+    except NotAPdf as e:
+        dbg(f"elsevier body rejected: {e}")
+    except HostDown as e:
+        stats_row["elsevier_error_code"] = HOST_DOWN
+        dbg(f"elsevier skipped: {e}")
+    except Exception as e:
+        stats_row["elsevier_error_code"] = f"EXC:{e.__class__.__name__}"   # <- NEW
+        dbg(f"except: {e}")
+        dbg(f"FAIL elsevier")
+        # continue
+    finally:
+        if resp is not None:
+            resp.close()
+        metrics.METRICS.observe("stage_seconds", time.perf_counter() - elsevier_t0, stage="elsevier")
+    if elsevier_sha:
+        if metrics.verbose(metrics.DEBUG):
+            dbg("ELSEVIERresp.headers")
+            dbg(pprint.pformat(dict(resp.headers)))
+        dbg(f"✅ {elsevier_pdf_path.name}   ")
+
+        def elsevier_checked(result):
+            stats_row["elsevier_pages"] = result["pages"]
+            # anything short of a full article (e.g. the abstract page) stays in elsevier_pdfs/
+            if pdf_validation.is_full_article(result):
                 stats_row["success"] = 1
-                print("full article, copying...")
                 dst = PDF_DIR / pdf_path.name
-                shutil.copy2(elsevier_pdf_path, dst)
+                if STORE is not None:
+                    dbg("full article, linking...")
+                    STORE.view(elsevier_sha, dst)
+                else:
+                    dbg("full article, copying...")
+                    shutil.copy2(elsevier_pdf_path, dst)
                 stats_row["elsevier_error_code"] = "SUCCESS"        # clear it – call was a success
-                write_stats(stats_row)   # see helper below
-                print()
-                print()
-                print()
-            continue
-        print()
+                remember(doi, elsevier_sha, "elsevier")
+            else:
+                remember(doi, elsevier_sha, "elsevier_partial")
 
-        print("elsevier failed, moving on...")
+        finish_pdf(stats_row, elsevier_pdf_path, elsevier_sha, elsevier_checked)
+        return
 
-        if pdf_url:
-            if download(pdf_url, pdf_path, html_ref=html_url):
-                stats_row["openalex_status"] = "SUCCESS"        # clear it – call was a success
-                stats_row["success"] = 1                    # <---- add this!
-                write_stats(stats_row)
-                dbg(f"✓ PDF saved from openalex pdf url → {pdf_name}")
-                continue
+    dbg("elsevier failed, moving on...")
 
-        pdf_url = None
-        for colname, locator in LOCATORS:
-            dbg(f"* locator: {locator.__name__[4:]}")
-            try:
-                url = locator(doi)
-                if url:
-                    stats_row[colname] = "SUCCESS"
-                    pdf_url = url
-                    dbg(f"  → {pdf_url}")
-                    break
-                else:
-                    stats_row[colname] = "none"
-            except NameResolutionError:
-                stats_row[colname] = "dns_error"
-                dbg("  ! DNS error, retrying once …")
-                time.sleep(3)
-                try:
-                    url = locator(doi)
-                    if url:
-                        stats_row[colname] = "SUCCESS"
-                        pdf_url = url
-                        dbg(f"  → {pdf_url}")
-                        break
-                    else:
-                        stats_row[colname] = "none"
-                except Exception as e:
-                    stats_row[colname] = f"error:{e.__class__.__name__}"
-            except Exception as e:
-                stats_row[colname] = f"error:{e.__class__.__name__}"
-
-        # -------- try to fetch ----------
-        if pdf_url:
-            if download(pdf_url, pdf_path, html_ref=html_url):
-                stats_row["direct_download_status"] = "SUCCESS"
-                stats_row["success"] = 1                  
-                write_stats(stats_row)
-                dbg(f"✓ PDF saved → {pdf_name}")
-                continue
-            else:
-                stats_row["direct_download_status"] = "DIRECT DOWNLOAD FAILED"
-        else:
-            stats_row["direct_download_status"] = "NO PDF URL FOUND"
+    host_down = False
+    if pdf_url:
+        try:
+            sha = download(pdf_url, pdf_path, html_ref=html_url)
+        except HostDown as e:
+            dbg(f"    ! {e}")
+            sha, host_down = None, True
+        if sha:
+            stats_row["openalex_status"] = "SUCCESS"        # clear it – call was a success
+            stats_row["success"] = 1                    # <---- add this!
+            dbg(f"✓ PDF saved from openalex pdf url → {pdf_name}")
+            remember(doi, sha, "openalex")
+            finish_pdf(stats_row, pdf_path, sha)
+            return
+
+    pdf_url = locate_pdf(doi, stats_row)
+
+    # -------- try to fetch ----------
+    if pdf_url:
+        try:
+            sha = download(pdf_url, pdf_path, html_ref=html_url)
+        except HostDown as e:
+            dbg(f"    ! {e}")
+            sha = None
+            stats_row["direct_download_status"] = HOST_DOWN
+        if sha:
+            stats_row["direct_download_status"] = "SUCCESS"
+            stats_row["success"] = 1                  
+            dbg(f"✓ PDF saved → {pdf_name}")
+            remember(doi, sha, "located")
+            finish_pdf(stats_row, pdf_path, sha)
+            return
+        elif not stats_row["direct_download_status"]:
+            stats_row["direct_download_status"] = "DIRECT DOWNLOAD FAILED"
+    else:
+        stats_row["direct_download_status"] = "NO PDF URL FOUND"
+
+
+    dbg("– no PDF captured")
+    finish_row(stats_row, host_down)
+
+
+def worker(idx: int, row: dict) -> None:
+    """Per-row entry point: tag log lines with the row and keep going on errors."""
+    _log.tag = f"row{idx:03d}"
+    try:
+        process_row(idx, row)
+    except Exception as e:
+        dbg(f"! unexpected error: {e!r}")
+    finally:
+        _log.tag = None
 
 
-        dbg("– no PDF captured")
-        write_stats(stats_row)
-        time.sleep(1)          # steady-state politeness delay
+def main():
+    global HOSTS, LOCATOR_MODE, STAGGER, LOCATOR_POOL, CACHE, MAX_PDF_BYTES, VALIDATOR, STORE
+    global STATE, IGNORE_BACKOFF, HEALTH, UNPAYWALL
+    parser = argparse.ArgumentParser(description="Download full-text PDFs for all records.")
+    parser.add_argument("--input", default=CSV_IN,
+                        help="all_records.csv or all_records.parquet")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Rows processed concurrently (default: 1, one row at a time)")
+    parser.add_argument("--shard", metavar="I/N",
+                        help="Only process rows whose DOI hashes to shard I of N (0-based)")
+    parser.add_argument("--out-dir",
+                        help="Directory for PDFs, stats, store and state "
+                             "(default: ../fulltexts, or ../fulltexts/shard-I-of-N with --shard)")
+    parser.add_argument("--per-host", type=int,
+                        help=f"Max requests in flight to one hostname (default: {PER_HOST}, "
+                             "divided among the shards)")
+    parser.add_argument("--host-delay", type=float,
+                        help=f"Seconds between request starts to one hostname (default: {HOST_DELAY}, "
+                             "times the number of shards)")
+    parser.add_argument("--host-failures", type=int, default=host_health.FAILURES,
+                        help="Consecutive failures or timeouts after which a host is skipped")
+    parser.add_argument("--host-cooldown", type=float, default=host_health.COOLDOWN,
+                        help="Seconds a failing host is skipped before it is probed again")
+    parser.add_argument("--rate", action="append", default=[], metavar="PROVIDER=PER_MINUTE",
+                        help="Request budget of one API provider, e.g. core=30 (repeatable); "
+                             f"defaults: {rate_limit.PROVIDER_BUDGETS}, divided among the shards")
+    parser.add_argument("--locators", choices=["serial", "hedged"], default=LOCATOR_MODE,
+                        help="Try the PDF locators one after another or hedged in parallel")
+    parser.add_argument("--stagger", type=float, default=STAGGER,
+                        help="Hedged mode: seconds between locator starts (0 = all at once)")
+    parser.add_argument("--http-cache",
+                        help="SQLite file caching the metadata API responses "
+                             "(default: http_cache.sqlite in the output directory)")
+    parser.add_argument("--no-http-cache", action="store_true",
+                        help="Always ask the APIs, never read or write the cache")
+    parser.add_argument("--cache-ttl-days", type=float, default=http_cache.DEFAULT_TTL / http_cache.DAY,
+                        help="Serve cached responses this long before revalidating")
+    parser.add_argument("--unpaywall-index", default=str(build_unpaywall_index.DEFAULT_PATH),
+                        help="Unpaywall snapshot index from build_unpaywall_index.py (used if it exists)")
+    parser.add_argument("--max-pdf-mb", type=float, default=MAX_PDF_BYTES / 2**20,
+                        help="Abort PDF downloads larger than this")
+    parser.add_argument("--validate-workers", type=int, default=2,
+                        help="Processes checking saved PDFs (0 = check inline)")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Write plain files into pdfs/ and elsevier_pdfs/ instead of the PDF store")
+    parser.add_argument("--ignore-backoff", action="store_true",
+                        help="Retry every DOI without a PDF, even if its backoff has not passed")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.setup(args)
+
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+        budgets = rate_limit.parse_budgets(args.rate)
+    except ValueError as e:
+        parser.error(str(e))
+    # N shards share the same hosts and APIs: by default each takes 1/N of the politeness budget
+    shards = shard[1] if shard else 1
+    for provider, per_minute in rate_limit.PROVIDER_BUDGETS.items():
+        PROVIDERS.configure(provider, budgets.get(provider, per_minute / shards))
+    per_host = args.per_host if args.per_host is not None else max(1, PER_HOST // shards)
+    host_delay = args.host_delay if args.host_delay is not None else HOST_DELAY * shards
+    out_dir = Path(args.out_dir) if args.out_dir else shard_dir(shard) if shard else FULLTEXTS_DIR
+    set_output_dir(out_dir)
+
+    MAX_PDF_BYTES = int(args.max_pdf_mb * 2**20)
+    HOSTS = HostLimiter(per_host, host_delay)
+    HEALTH = HostHealth(args.host_failures, args.host_cooldown)
+    mount_pools(args.workers)
+    LOCATOR_MODE, STAGGER = args.locators, args.stagger
+    if not args.no_http_cache:
+        CACHE = http_cache.HttpCache(args.http_cache or out_dir / "http_cache.sqlite",
+                                     ttl=args.cache_ttl_days * http_cache.DAY)
+    if LOCATOR_MODE == "hedged":
+        LOCATOR_POOL = ThreadPoolExecutor(max_workers=max(1, args.workers) * len(LOCATORS),
+                                          thread_name_prefix="locator")
+
+    ensure_stats_file()
+    if not args.no_store:
+        STORE = pdf_store.PdfStore(out_dir / "store")
+    STATE = download_state.DownloadState(out_dir / "download_state.sqlite")
+    IGNORE_BACKOFF = args.ignore_backoff
+    if os.path.exists(args.unpaywall_index):
+        UNPAYWALL = build_unpaywall_index.UnpaywallIndex(args.unpaywall_index)
+        print(f"Unpaywall snapshot index: {args.unpaywall_index} (built {UNPAYWALL.meta.get('built')})")
+    VALIDATOR = pdf_validation.Validator(args.validate_workers)
+
+
+    rows = load_records(args.input)
+    # row numbers stay those of the whole input, so file names match across shards
+    todo = list(enumerate(rows))
+    if shard:
+        todo = [(idx, row) for idx, row in todo if shard_of(row.get("doi"), shards) == shard[0]]
+        print(f"Shard {shard[0]}/{shards}: {len(todo):,} of {len(rows):,} rows → {out_dir}")
+    print(f"Politeness: {per_host} per host, {host_delay:g}s apart; API budgets {PROVIDERS.report()}")
+
+    if args.workers <= 1:
+        for idx, row in todo:
+            worker(idx, row)
+    else:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            # bounded window so 50k rows never sit in the queue at once
+            pending = set()
+            for idx, row in todo:
+                pending.add(pool.submit(worker, idx, row))
+                if len(pending) >= 4 * args.workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            wait(pending)
+
+    VALIDATOR.close()   # writes the stats lines of the last PDFs
+    if LOCATOR_POOL is not None:
+        LOCATOR_POOL.shutdown(wait=True)   # abandoned locators may still write to the cache
+    if CACHE is not None:
+        print(f"HTTP cache: {CACHE.stats}")
+        CACHE.close()
+    if STORE is not None:
+        print(f"PDF store: {STORE.stats()}")
+        STORE.close()
+    for row in HEALTH.report():
+        p95 = f", p95 {row['p95']}s" if row["p95"] is not None else ""
+        print(f"host {row['host']}: {row['requests']} requests, {row['skipped']} skipped, "
+              f"circuit opened {row['trips']}x{p95}")
+    if UNPAYWALL is not None:
+        UNPAYWALL.close()
+    print(f"API rates: {PROVIDERS.report()}")
+    print(f"DOI state: {STATE.summary()}")
+    STATE.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Extract the text of the downloaded PDFs into compressed JSONL shards.
+
+* Every PDF in ``fulltexts/pdfs`` is opened once with PyMuPDF in a worker
+  process (``--workers``).  ``elsevier_pdfs`` is not read: D puts the
+  Elsevier downloads that are full articles into ``pdfs`` as well, and the
+  rest are abstract pages.
+* PDFs are matched to D's ``scraping_stats.csv`` by sha256.  One whose
+  recorded check is not a full article (``pdf_validation.is_full_article``)
+  is skipped without parsing it.
+* One JSON line per PDF: ``openalex_id``, ``doi``, ``file``, ``sha256`` and
+  ``pages`` (the text of page 1, 2, ...).  The DOI is the one D recorded for
+  that sha256, and the openalex_id the ``all_records.csv`` row with that DOI.
+* Lines go to ``fulltexts/text/text-00000.jsonl.gz``, ``text-00001...``; a
+  shard is closed at ``--shard-mb`` compressed and only then renamed from
+  ``.tmp`` into place, so a crash loses at most the open shard.
+* ``manifest.json`` records size, mtime, sha256 and shard of every PDF done.
+  Later runs only extract new or changed PDFs; a changed PDF's new text goes
+  to a new shard and the manifest points there (``iter_documents`` skips
+  the stale line).  PDFs that fail are logged to ``failures.jsonl`` and not
+  retried until they change or ``--retry-failed`` is given.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+import parquet_output
+import pdf_validation
+from json_util import save_json_atomic
+
+FULLTEXTS_DIR = Path("../fulltexts")
+PDF_DIRS = [FULLTEXTS_DIR / "pdfs"]
+TEXT_DIR = FULLTEXTS_DIR / "text"
+STATS_CSV = FULLTEXTS_DIR / "scraping_stats.csv"
+RECORDS = "../abstracts/all_records.csv"
+SHARD_MB = 64
+DOI_PREFIX_RE = re.compile(r"^https?://(dx\.)?doi\.org/", re.IGNORECASE)
+
+
+# ─────────────────────────── worker ──────────────────────────────────────────
+def extract(path: str, skip: frozenset = frozenset()) -> Dict[str, Any]:
+    """
+    Worker: sha256 and per-page text of one PDF, or the error.  A PDF whose
+    sha256 is in ``skip`` is not parsed (``"skipped": True``).
+    """
+    try:
+        data = Path(path).read_bytes()
+        sha = hashlib.sha256(data).hexdigest()
+        if sha in skip:
+            return {"sha256": sha, "skipped": True}
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            pages = [page.get_text("text") for page in doc]
+        return {"sha256": sha, "pages": pages}
+    except Exception as e:   # PyMuPDF raises a variety of errors on broken files
+        return {"error": f"{e.__class__.__name__}: {e}"}
+
+
+# ─────────────────────────── inputs ──────────────────────────────────────────
+def pdf_files(pdf_dirs: List[Path]) -> List[Path]:
+    """All PDFs, skipping copies of a file name already seen in an earlier dir."""
+    seen, files = set(), []
+    for d in pdf_dirs:
+        for path in sorted(Path(d).glob("*.pdf")):
+            if path.name not in seen:
+                seen.add(path.name)
+                files.append(path)
+    return files
+
+
+def doi_key(doi: Optional[str]) -> str:
+    """``https://doi.org/10.1/X`` and ``10.1/x`` alike → ``10.1/x``."""
+    return DOI_PREFIX_RE.sub("", (doi or "").strip()).lower()
+
+
+def load_ids(records_path: str) -> Dict[str, str]:
+    """``doi_key → openalex_id`` from all_records.csv / .parquet."""
+    if not os.path.exists(records_path):
+        return {}
+    if records_path.endswith(".parquet"):
+        rows = parquet_output.read_records(records_path, columns=["openalex_id", "doi"])
+    else:
+        with open(records_path, newline="", encoding="utf-8") as fh:
+            rows = list(csv.DictReader(fh))
+    return {doi_key(r.get("doi")): r.get("openalex_id") or "" for r in rows if r.get("doi")}
+
+
+def load_pdf_checks(stats_path: Path) -> Dict[str, Tuple[str, bool]]:
+    """
+    ``sha256 → (doi, full article?)`` from D's scraping_stats.csv; the last
+    row wins for a PDF saved more than once.
+    """
+    checks = {}
+    if not Path(stats_path).is_file():
+        return checks
+    with open(stats_path, newline="", encoding="utf-8") as fh:
+        for r in csv.DictReader(fh):
+            if not r.get("pdf_sha256"):
+                continue
+            pages = int(r["pdf_pages"]) if (r.get("pdf_pages") or "").isdigit() else ""
+            checks[r["pdf_sha256"]] = (r.get("doi") or "",
+                                       pdf_validation.is_full_article({"pages": pages}))
+    return checks
+
+
+# ─────────────────────────── shards / manifest ───────────────────────────────
+class ShardWriter:
+    """gzip JSONL shards of at most ``max_bytes`` compressed, renamed into place on close."""
+
+    def __init__(self, out_dir: Path, max_bytes: int, on_close):
+        self.out_dir = out_dir
+        self.max_bytes = max_bytes
+        self.on_close = on_close          # called with the shard name once it is durable
+        existing = [int(p.name[5:10]) for p in out_dir.glob("text-*.jsonl.gz")]
+        self.next_index = max(existing, default=-1) + 1
+        self._raw = self._gz = None
+        self.name = None
+
+    def write(self, record: Dict[str, Any]) -> str:
+        """Append one record; returns the name of the shard it went to."""
+        if self._gz is None:
+            self.name = f"text-{self.next_index:05d}.jsonl.gz"
+            self.next_index += 1
+            self._raw = (self.out_dir / (self.name + ".tmp")).open("wb")
+            self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self._gz.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        name = self.name
+        if self._raw.tell() >= self.max_bytes:
+            self.close()
+        return name
+
+    def close(self) -> None:
+        if self._gz is None:
+            return
+        self._gz.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self.out_dir / (self.name + ".tmp"), self.out_dir / self.name)
+        self._gz = self._raw = None
+        self.on_close(self.name)
+
+
+def load_manifest(out_dir: Path) -> Dict[str, Any]:
+    try:
+        with (out_dir / "manifest.json").open(encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"files": {}}
+
+
+def log_failure(out_dir: Path, path: Path, error: str) -> None:
+    with (out_dir / "failures.jsonl").open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"file": str(path), "error": error,
+                            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}) + "\n")
+
+
+def iter_documents(out_dir: Path = TEXT_DIR) -> Iterator[Dict[str, Any]]:
+    """Current record of every extracted PDF (stale lines of changed PDFs are skipped)."""
+    files = load_manifest(out_dir)["files"]
+    for shard in sorted(out_dir.glob("text-*.jsonl.gz")):
+        with gzip.open(shard, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                entry = files.get(record["file"])
+                if entry and entry.get("shard") == shard.name and entry["sha256"] == record["sha256"]:
+                    yield record
+
+
+# ─────────────────────────── run ─────────────────────────────────────────────
+def todo(files: List[Path], manifest: Dict[str, Any], retry_failed: bool) -> List[Path]:
+    """PDFs that are new, changed since the manifest, or failed (with retry_failed)."""
+    out = []
+    for path in files:
+        entry = manifest["files"].get(path.name)
+        st = path.stat()
+        if entry and (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            if "error" not in entry or not retry_failed:
+                continue
+        out.append(path)
+    return out
+
+
+def run(pdf_dirs: List[Path], out_dir: Path, ids: Dict[str, str],
+        checks: Dict[str, Tuple[str, bool]], workers: int = os.cpu_count() or 1,
+        shard_bytes: int = SHARD_MB * 2**20, retry_failed: bool = False) -> Dict[str, int]:
+    """
+    Extract every new or changed PDF of ``pdf_dirs``; ``ids`` and ``checks``
+    come from ``load_ids`` and ``load_pdf_checks``.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    files = pdf_files(pdf_dirs)
+    queue = todo(files, manifest, retry_failed)
+    partial = frozenset(sha for sha, (_, full) in checks.items() if not full)
+    stats = {"pdfs": len(files), "skipped": len(files) - len(queue),
+             "extracted": 0, "partial": 0, "failed": 0, "pages": 0}
+    # manifest entries wait until their shard is renamed into place
+    pending_entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def shard_closed(name):
+        manifest["files"].update(pending_entries.pop(name, {}))
+        save_json_atomic(out_dir / "manifest.json", manifest)
+
+    writer = ShardWriter(out_dir, shard_bytes, shard_closed)
+
+    def handle(path: Path, result: Dict[str, Any]) -> None:
+        st = path.stat()
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if "error" in result:
+            stats["failed"] += 1
+            log_failure(out_dir, path, result["error"])
+            manifest["files"][path.name] = dict(entry, error=result["error"])
+            return
+        if result.get("skipped"):
+            stats["partial"] += 1
+            manifest["files"][path.name] = dict(entry, sha256=result["sha256"], partial=True)
+            return
+        doi = checks.get(result["sha256"], ("", True))[0]
+        openalex_id = ids.get(doi_key(doi), "") if doi else ""
+        shard = writer.write({"openalex_id": openalex_id, "doi": doi, "file": path.name,
+                              "sha256": result["sha256"], "pages": result["pages"]})
+        entry.update(sha256=result["sha256"], shard=shard, pages=len(result["pages"]))
+        pending_entries.setdefault(shard, {})[path.name] = entry
+        stats["extracted"] += 1
+        stats["pages"] += len(result["pages"])
+
+    try:
+        if workers <= 1:
+            for path in queue:
+                handle(path, extract(str(path), partial))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                running = {}
+                for path in queue:
+                    running[pool.submit(extract, str(path), partial)] = path
+                    if len(running) >= 4 * workers:
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            handle(running.pop(fut), fut.result())
+                for fut in list(running):
+                    handle(running.pop(fut), fut.result())
+    finally:
+        writer.close()
+        save_json_atomic(out_dir / "manifest.json", manifest)   # failures of the last batch
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract PDF text into gzip JSONL shards.")
+    parser.add_argument("--records", default=RECORDS,
+                        help="all_records.csv or .parquet, to map DOIs to OpenAlex IDs")
+    parser.add_argument("--stats", default=str(STATS_CSV),
+                        help="D's scraping_stats.csv: the DOI and page check of each PDF")
+    parser.add_argument("--out-dir", default=str(TEXT_DIR))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-mb", type=float, default=SHARD_MB,
+                        help="Start a new shard once one reaches this compressed size")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Try PDFs that failed before even if they have not changed")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    stats = run(PDF_DIRS, Path(args.out_dir), load_ids(args.records), load_pdf_checks(Path(args.stats)),
+                args.workers, int(args.shard_mb * 2**20), args.retry_failed)
+    print(f"{stats['pdfs']:,} PDFs: {stats['extracted']:,} extracted ({stats['pages']:,} pages), "
+          f"{stats['partial']:,} not full articles, "
+          f"{stats['skipped']:,} unchanged, {stats['failed']:,} failed "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
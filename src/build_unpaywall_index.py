@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Build a local DOI → PDF URL index from an Unpaywall snapshot.
+
+``url_unpaywall`` in D_download_fulltexts used to ask the Unpaywall API once
+per DOI.  Unpaywall publishes its whole database as gzipped JSON Lines (one
+work per line); this script streams such a dump once into a small SQLite
+table that D reads instead:
+
+    oa(doi PRIMARY KEY, pdf_url)      -- best_oa_location.url_for_pdf
+
+With ``--records`` only the DOIs of ``all_records.csv`` are kept, and those
+without a PDF are kept too (``pdf_url`` NULL) so D knows not to ask the API
+about them.  Without it every DOI that has a PDF URL is kept.  Lines of DOIs
+that are not wanted are skipped before they are JSON-decoded.
+
+The index is built under a temporary name and renamed into place, so D never
+sees a half-built one.  From the git root's ``src/``:
+
+    python build_unpaywall_index.py ~/unpaywall/snapshot.jsonl.gz \\
+        --records ../abstracts/all_records.csv
+"""
+from __future__ import annotations
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+DEFAULT_PATH = Path("../fulltexts/unpaywall_index.sqlite")
+RECORDS = "../abstracts/all_records.csv"
+BATCH = 10_000
+DOI_RE = re.compile(rb'"doi"\s*:\s*"([^"]+)"')
+
+
+def normalize_doi(doi: str) -> str:
+    return re.sub(r"^https?://(dx\.)?doi\.org/", "", doi.strip()).lower()
+
+
+def open_dump(path: Path):
+    path = Path(path)
+    return gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+
+
+def iter_dump(paths: Iterable[Path], wanted: Optional[Set[str]] = None
+              ) -> Iterator[Tuple[str, Optional[str]]]:
+    """``(doi, url_for_pdf or None)`` for every work in the dump files."""
+    for path in paths:
+        with open_dump(path) as f:
+            for line in f:
+                if wanted is not None:
+                    m = DOI_RE.search(line)
+                    # escaped DOIs are left to the JSON decoder
+                    if m and b"\\" not in m.group(1) and \
+                            normalize_doi(m.group(1).decode("utf-8", "replace")) not in wanted:
+                        continue
+                try:
+                    work = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                doi = normalize_doi(work.get("doi") or "")
+                if not doi or (wanted is not None and doi not in wanted):
+                    continue
+                loc = work.get("best_oa_location")
+                url = loc.get("url_for_pdf") if isinstance(loc, dict) else None
+                yield doi, url or None
+
+
+def build(paths: Iterable[Path], out: Path = DEFAULT_PATH,
+          wanted: Optional[Set[str]] = None) -> Dict[str, int]:
+    """Write the index to ``out``; returns counts of works read and kept."""
+    paths = [Path(p) for p in paths]
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp))
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE oa (doi TEXT PRIMARY KEY, pdf_url TEXT) WITHOUT ROWID")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    stats = {"works": 0, "with_pdf": 0, "kept": 0}
+    batch = []
+
+    def flush():
+        conn.executemany("INSERT OR REPLACE INTO oa VALUES (?, ?)", batch)
+        conn.commit()
+        batch.clear()
+
+    for doi, url in iter_dump(paths, wanted):
+        stats["works"] += 1
+        stats["with_pdf"] += url is not None
+        if url is None and wanted is None:
+            continue
+        batch.append((doi, url))
+        if len(batch) >= BATCH:
+            flush()
+    flush()
+    stats["kept"] = conn.execute("SELECT COUNT(*) FROM oa").fetchone()[0]
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("sources", json.dumps([p.name for p in paths])),
+        ("built", time.strftime("%Y-%m-%dT%H:%M:%S")),
+        ("negatives", "1" if wanted is not None else "0"),
+    ])
+    conn.commit()
+    conn.close()
+    os.replace(tmp, out)
+    return stats
+
+
+class UnpaywallIndex:
+    """Read-only, thread-safe lookups in an index written by ``build``."""
+
+    def __init__(self, path: Path = DEFAULT_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self.meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+
+    def lookup(self, doi: str) -> Tuple[bool, Optional[str]]:
+        """``(found, pdf_url)``; ``found`` is False for DOIs the index knows nothing about."""
+        with self._lock:
+            row = self.conn.execute("SELECT pdf_url FROM oa WHERE doi = ?",
+                                    (normalize_doi(doi),)).fetchone()
+        return (True, row[0]) if row else (False, None)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+def record_dois(records_path: str) -> Set[str]:
+    with open(records_path, newline="", encoding="utf-8") as fh:
+        return {normalize_doi(r["doi"]) for r in csv.DictReader(fh) if r.get("doi")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index an Unpaywall snapshot by DOI.")
+    parser.add_argument("dumps", nargs="+", help="Unpaywall snapshot file(s), .jsonl or .jsonl.gz")
+    parser.add_argument("--out", default=str(DEFAULT_PATH))
+    parser.add_argument("--records", help=f"Keep only the DOIs of this CSV (e.g. {RECORDS})")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    wanted = record_dois(args.records) if args.records else None
+    stats = build(args.dumps, Path(args.out), wanted)
+    print(f"{stats['works']:,} works decoded, {stats['with_pdf']:,} with a PDF URL, "
+          f"{stats['kept']:,} indexed in {args.out} ({time.perf_counter() - t0:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
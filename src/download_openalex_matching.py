@@ -6,6 +6,10 @@ Features
 --------
 * Supports either **primary-topic only** (topic is first) or **any-position**.
 * Streams through the cursor‑based API (no page limits).
+* Delta mode (``since=``) fetches only works created/updated after the topic's
+  last complete harvest (``abstracts/high_water_marks.json``) and upserts them.
+* Checkpoints ``next_cursor`` after every written page (``abstracts/checkpoints/``)
+  so an interrupted topic resumes at the last committed page.
 * Extracts and stores:
   - OpenAlex ID (work URL)
   - Title (`display_name`)
@@ -20,7 +24,9 @@ Features
 
 Notes
 -----
-* OpenAlex allows ~200 requests/minute; the script sleeps politely every 20 calls.
+* OpenAlex allows ~200 requests/minute; every request draws from the
+  process-wide ``rate_limit.PROVIDERS["openalex"]`` limiter (or the one passed
+  in), and 429/503 answers are retried after ``Retry-After``.
 * For extremely large topics (hundreds of thousands of works) the CSV may be
   several hundred MB. Use gzip or a database if storage is a concern.
 """
@@ -28,14 +34,26 @@ from __future__ import annotations
 import pprint
 import argparse
 import csv
+import hashlib
+import json
+import os
 import sys
+import threading
 import time
+from datetime import datetime, timezone
+from contextlib import ExitStack
 from pathlib import Path
 from typing import Dict, Any, Iterator, Optional
 
 import requests
 from tqdm import tqdm
 
+import metrics
+import page_stream
+import parquet_output
+import rate_limit
+from json_util import save_json_atomic
+
 import urllib.parse as up
 from pathlib import Path 
 import pandas as pd
@@ -44,56 +62,348 @@ import pandas as pd
 OPENALEX_BASE = "https://api.openalex.org"
 REQUEST_TIMEOUT = 10  # seconds
 PER_PAGE = 200        # API max is 200
-SLEEP_EVERY = 20      # polite rate limiting
-SLEEP_SECONDS = 1
+MAX_RETRIES = 5       # retries of a throttled (429/503) request
+STREAM_CHUNK_BYTES = 64 * 1024  # read size for streamed pages
+
+
+PUBLICATION_YEARS = (2010, 2025)   # inclusive; also used by snapshot_harvest.py
+MAX_OR_VALUES = 100   # OpenAlex caps pipe-joined OR filters at 100 values
+BATCH_MAX_WORKS = 1000  # pack small topics until a batch expects this many works
+
+# Everything extract_row reads.  host_venue is left out: OpenAlex no longer
+# serves it and refuses it in select=, so `journal` is empty either way.
+SELECT_FIELDS = [
+    "id", "display_name", "doi", "publication_year", "cited_by_count",
+    "best_oa_location", "primary_location", "primary_topic", "topics",
+    "sustainable_development_goals", "authorships", "language",
+    "citation_normalized_percentile", "abstract_inverted_index",
+]
+# phase one of a lazy-abstract harvest: everything but the (large) abstract
+META_FIELDS = [f for f in SELECT_FIELDS if f != "abstract_inverted_index"]
+
+
+def make_filter(topic_id: int, primary: bool, since: Optional[str] = None,
+                date_field: str = "created") -> str:
+    return make_batch_filter([topic_id], primary, since=since, date_field=date_field)
+
 
+def make_batch_filter(topic_ids, primary: bool, since: Optional[str] = None,
+                      date_field: str = "created") -> str:
+    """Like ``make_filter`` but ORs several topics: ``primary_topic.id:T1|T2|...``.
 
-def make_filter(topic_id: int, primary: bool) -> str:
-    tid = f"T{topic_id}"
+    ``since`` (YYYY-MM-DD) restricts a delta harvest to works created, or with
+    ``date_field="updated"`` changed, on or after that day.
+    """
+    tids = "|".join(f"T{t}" for t in topic_ids)
     parts = [
-        f"{'primary_topic.id' if primary else 'topic.id'}:{tid}",
-        f"publication_year:2010-2025",
+        f"{'primary_topic.id' if primary else 'topic.id'}:{tids}",
+        f"publication_year:{PUBLICATION_YEARS[0]}-{PUBLICATION_YEARS[1]}",
         f"has_abstract:true",
         f"has_doi:true",
     ]
+    if since:
+        parts.append(f"from_{date_field}_date:{since}")
     return ",".join(parts)
 
 
-def work_iter(topic_id: int, primary_only: bool = False) -> Iterator[Dict[str, Any]]:
-    """Yield every work JSON for the topic via cursor pagination."""
-    filter_str = make_filter(topic_id,primary_only)
-    cursor = "*"  # initial cursor
-    calls = 0
+# review-paper rule applied on top of every topic filter
+REVIEW_FILTER = (
+    "title.search:(review NOT \"peer review\"),"
+    "is_oa:true,"
+    "has_fulltext:true"
+)
+
+
+def works_url(filter_str: str, cursor: str = "*", per_page: int = PER_PAGE,
+              select=None) -> str:
+    url = (
+        f"{OPENALEX_BASE}/works"
+        f"?filter={filter_str},{REVIEW_FILTER}"
+        f"&per-page={per_page}"
+        f"&cursor={cursor}"
+    )
+    if select:
+        url += f"&select={','.join(select)}"
+    return url
+
+
+def harvest_select(projected: bool = False, lazy_abstracts: bool = False):
+    """The ``select=`` list for a harvest mode (None = full work JSON)."""
+    if lazy_abstracts:
+        return META_FIELDS
+    if projected:
+        return SELECT_FIELDS
+    return None
+
+
+def work_iter(topic_id: int, primary_only: bool = False,
+              limiter=None, select=None, **page_opts) -> Iterator[Dict[str, Any]]:
+    """Yield every work JSON for the topic via cursor pagination.
+
+    ``limiter`` (a ``rate_limit.AdaptiveLimiter``) defaults to the shared
+    OpenAlex limiter, so several iterators running in parallel share one
+    request budget.
+
+    ``select`` restricts the returned fields (see ``SELECT_FIELDS``);
+    ``page_opts`` (``stream_pages``, ``page_stats``) go to ``cursor_iter``.
+    """
+    yield from cursor_iter(make_filter(topic_id, primary_only), limiter=limiter,
+                           select=select, **page_opts)
+
+
+def openalex_get(url: str, limiter=None, **kw) -> requests.Response:
+    """
+    GET ``url`` through ``limiter`` (default: the shared OpenAlex limiter).
+    429/503 answers slow the limiter down and are retried up to
+    ``MAX_RETRIES`` times; the last response is returned whatever its status.
+    """
+    if limiter is None:
+        limiter = rate_limit.PROVIDERS["openalex"]
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        t0 = time.perf_counter()
+        try:
+            resp = requests.get(url, timeout=REQUEST_TIMEOUT, **kw)
+        except requests.RequestException as e:
+            metrics.http(url, f"error:{e.__class__.__name__}", time.perf_counter() - t0)
+            raise
+        metrics.http(url, resp.status_code, time.perf_counter() - t0)
+        retry_after = resp.headers.get("Retry-After")
+        if hasattr(limiter, "feedback"):
+            limiter.feedback(resp.status_code, retry_after)
+        if resp.status_code not in rate_limit.THROTTLE_STATUSES or attempt == MAX_RETRIES:
+            return resp
+        metrics.event("throttled", provider="openalex", status=resp.status_code, retry_after=retry_after)
+        metrics.log(f"OpenAlex throttled ({resp.status_code}, Retry-After={retry_after}), retrying …")
+        resp.close()
+        if not hasattr(limiter, "feedback"):   # a plain TokenBucket does not pause itself
+            time.sleep(rate_limit.parse_retry_after(retry_after) or 2 ** attempt)
+
+
+class PageEnd:
+    """Marker yielded by ``cursor_iter(mark_pages=True)`` after a page's last work."""
+    __slots__ = ("next_cursor",)
+
+    def __init__(self, next_cursor: Optional[str]):
+        self.next_cursor = next_cursor
+
+
+def cursor_iter(filter_str: str, limiter=None, select=None,
+                stream_pages: bool = False, page_stats=None,
+                cursor: str = "*", mark_pages: bool = False) -> Iterator[Dict[str, Any]]:
+    """Walk every page of ``/works`` matching ``filter_str``.
+
+    With ``stream_pages`` each page is decoded incrementally
+    (``page_stream.iter_results``) instead of through ``resp.json()``, so peak
+    memory no longer grows with page size.  If ``page_stats`` is a list, one
+    dict per page (mode, bytes, results, decode_s) is appended to it.
+
+    ``cursor`` resumes a walk from a saved ``next_cursor``; ``mark_pages``
+    yields a ``PageEnd`` after each page so callers can checkpoint.
+    """
     while True:
 
-        url = (
-            f"{OPENALEX_BASE}/works"
-            f"?filter={filter_str},"
-            "title.search:(review NOT \"peer review\"),"
-            "is_oa:true,"
-            "has_fulltext:true"
-            f"&per-page={PER_PAGE}"
-            f"&cursor={cursor}"
-        )
-        print("url")
-        print(url)
+        url = works_url(filter_str, cursor, select=select)
+        metrics.log(f"url {url}", metrics.DEBUG)
 
-        resp = requests.get(url, timeout=REQUEST_TIMEOUT)
-        pprint.pprint(resp)
+        t0 = time.perf_counter()
+        resp = openalex_get(url, limiter, stream=stream_pages)
+        request_s = time.perf_counter() - t0
+        if metrics.verbose(metrics.DEBUG):
+            pprint.pprint(resp)
 
         if resp.status_code != 200:
             raise RuntimeError(f"OpenAlex API error: {resp.status_code} {resp.text[:200]}")
-        data = resp.json()
-        for item in data.get("results", []):
-            yield item
+        stats = page_stream.new_stats()
+        if stream_pages:
+            stats["mode"] = "stream"
+            data = {}
+            with resp:
+                yield from page_stream.iter_results(
+                    resp.iter_content(chunk_size=STREAM_CHUNK_BYTES), data, stats)
+        else:
+            stats["mode"] = "json"
+            t0 = time.perf_counter()
+            data = resp.json()
+            stats["decode_s"] = time.perf_counter() - t0
+            stats["bytes"] = len(resp.content)
+            stats["results"] = len(data.get("results", []))
+            for item in data.get("results", []):
+                yield item
+        # request plus decoding; the caller's time between works is not counted
+        seconds = request_s + stats["decode_s"]
+        metrics.METRICS.observe("stage_seconds", seconds, stage="page_fetch")
+        metrics.METRICS.inc("pages_total", mode=stats["mode"])
+        metrics.METRICS.inc("works_total", stats["results"])
+        metrics.event("page", mode=stats["mode"], bytes=stats["bytes"], results=stats["results"],
+                      decode_s=round(stats["decode_s"], 4), seconds=round(seconds, 3))
+        if page_stats is not None:
+            page_stats.append(stats)
         # pprint.pprint("data")
         # pprint.pprint(data)
         cursor = data.get("meta", {}).get("next_cursor")
+        if mark_pages:
+            yield PageEnd(cursor)
         if not cursor:
             break
-        calls += 1
-        if calls % SLEEP_EVERY == 0:
-            time.sleep(SLEEP_SECONDS)
+
+
+def summarize_page_stats(page_stats) -> str:
+    """One-line summary of the per-page stats collected by ``cursor_iter``."""
+    if not page_stats:
+        return "no pages fetched"
+    n = len(page_stats)
+    decode = sum(p["decode_s"] for p in page_stats)
+    nbytes = sum(p["bytes"] for p in page_stats)
+    works = sum(p["results"] for p in page_stats)
+    modes = ",".join(sorted({p["mode"] for p in page_stats}))
+    return (f"{n:,} pages ({modes}), {works:,} works, {nbytes / 1e6:.1f} MB, "
+            f"decode {decode:.2f}s total / {1000 * decode / n:.1f} ms per page")
+
+
+def topic_counts(topic_ids, primary: bool = True, limiter=None) -> Dict[int, int]:
+    """
+    Number of matching works per topic, using one ``group_by`` request for
+    every ``MAX_OR_VALUES`` topics instead of one count request per topic.
+    """
+    group_field = "primary_topic.id" if primary else "topics.id"
+    topic_ids = list(topic_ids)
+    counts = {tid: 0 for tid in topic_ids}
+    for i in range(0, len(topic_ids), MAX_OR_VALUES):
+        chunk = topic_ids[i:i + MAX_OR_VALUES]
+        url = (
+            f"{OPENALEX_BASE}/works"
+            f"?filter={make_batch_filter(chunk, primary)},{REVIEW_FILTER}"
+            f"&group_by={group_field}"
+        )
+        resp = openalex_get(url, limiter)
+        if resp.status_code != 200:
+            raise RuntimeError(f"OpenAlex API error: {resp.status_code} {resp.text[:200]}")
+        for group in resp.json().get("group_by", []):
+            key = str(group.get("key", "")).split("/")[-1]
+            if key[1:].isdigit() and int(key[1:]) in counts:
+                counts[int(key[1:])] = group.get("count", 0)
+    return counts
+
+
+def plan_batches(counts: Dict[int, int], max_works: int = BATCH_MAX_WORKS,
+                 max_topics: int = MAX_OR_VALUES):
+    """
+    Greedily pack topics (smallest first) into batches whose expected total
+    stays below ``max_works``.  Topics larger than that get a batch of their own.
+    """
+    batches, current, total = [], [], 0
+    for tid, n in sorted(counts.items(), key=lambda kv: (kv[1], kv[0])):
+        if current and (total + n > max_works or len(current) == max_topics):
+            batches.append(current)
+            current, total = [], 0
+        current.append(tid)
+        total += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def fetch_abstracts(work_ids, limiter=None) -> Dict[str, Optional[dict]]:
+    """Abstract inverted indexes for up to ``MAX_OR_VALUES`` works per request."""
+    work_ids = list(work_ids)
+    out = {}
+    for i in range(0, len(work_ids), MAX_OR_VALUES):
+        chunk = work_ids[i:i + MAX_OR_VALUES]
+        ids = "|".join(w.split("/")[-1] for w in chunk)
+        url = (
+            f"{OPENALEX_BASE}/works"
+            f"?filter=ids.openalex:{ids}"
+            f"&select=id,abstract_inverted_index"
+            f"&per-page={MAX_OR_VALUES}"
+        )
+        resp = openalex_get(url, limiter)
+        if resp.status_code != 200:
+            raise RuntimeError(f"OpenAlex API error: {resp.status_code} {resp.text[:200]}")
+        for item in resp.json().get("results", []):
+            out[item["id"]] = item.get("abstract_inverted_index")
+    return out
+
+
+def attach_abstracts(works, limiter=None, batch_size: int = MAX_OR_VALUES):
+    """
+    Second phase of a lazy-abstract harvest: buffer metadata-only works and
+    fill in ``abstract_inverted_index`` with one request per ``batch_size``.
+    Callers drop already-stored works *before* this step, so abstracts are
+    only downloaded for works that will actually be written.
+    """
+    buf = []
+    for work in works:
+        if isinstance(work, PageEnd):
+            # a page is only complete once its abstracts are in
+            yield from _with_abstracts(buf, limiter)
+            buf = []
+            yield work
+            continue
+        buf.append(work)
+        if len(buf) >= batch_size:
+            yield from _with_abstracts(buf, limiter)
+            buf = []
+    if buf:
+        yield from _with_abstracts(buf, limiter)
+
+
+def _with_abstracts(works, limiter):
+    if not works:
+        return
+    abstracts = fetch_abstracts([w["id"] for w in works], limiter=limiter)
+    for work in works:
+        work["abstract_inverted_index"] = abstracts.get(work["id"])
+        yield work
+
+
+def progress(works, desc: str):
+    """``tqdm`` over a marked walk that counts works only, not ``PageEnd`` markers."""
+    with tqdm(desc=desc, disable=not metrics.verbose()) as bar:
+        for work in works:
+            if not isinstance(work, PageEnd):
+                bar.update()
+            yield work
+
+
+def extract_rows(works):
+    """
+    ``(work, extract_row(work))`` for each work; ``PageEnd`` markers pass
+    through.  The conversion time is observed once per page, not per row.
+    """
+    seconds, n = 0.0, 0
+    for work in works:
+        if isinstance(work, PageEnd):
+            if n:
+                metrics.METRICS.observe("stage_seconds", seconds, stage="extract_row")
+            seconds, n = 0.0, 0
+            yield work
+            continue
+        t0 = time.perf_counter()
+        row = extract_row(work)
+        seconds += time.perf_counter() - t0
+        n += 1
+        yield work, row
+
+
+def keep_new(works, is_new):
+    """Drop works for which ``is_new(work)`` is False; ``PageEnd`` markers pass through."""
+    for work in works:
+        if isinstance(work, PageEnd) or is_new(work):
+            yield work
+
+
+def route_topic_ids(work: Dict[str, Any], wanted: Dict[str, int], primary_only: bool):
+    """Which batched topics a work belongs to; ``wanted`` maps 'T10004' -> 10004."""
+    if primary_only:
+        tid = ((work.get("primary_topic") or {}).get("id") or "").split("/")[-1]
+        return [wanted[tid]] if tid in wanted else []
+    hits = []
+    for t in work.get("topics", []):
+        tid = t.get("id", "").split("/")[-1]
+        if tid in wanted and wanted[tid] not in hits:
+            hits.append(wanted[tid])
+    return hits
 
 
 def decode_abstract(inv_idx: Optional[dict]) -> Optional[str]:
@@ -188,47 +498,373 @@ def extract_row(work: Dict[str, Any]) -> Dict[str, Any]:
 
 
 
-def download_topic(topic_id: int, primary_only: bool = False):
+ABSTRACTS_DIR = Path("../abstracts")
+FIELDNAMES = [
+    "openalex_id","title","doi","publication_year","cited_by_count",
+    "journal","is_oa","oa_status","landing_url","pdf_url",
+    "topic_id_1","topic_id_2","topic_id_3",
+    "sdg_pairs","country_codes","language","citation_norm_pct",
+    "abstract"
+]
+
+
+def topic_out_path(topic_id: int, primary_only: bool, fmt: str = "csv") -> Path:
+    out_name = f"T{topic_id}_{'primary' if primary_only else 'any' }_works.{fmt}"
+    return ABSTRACTS_DIR / out_name
+
+
+def load_existing_ids(out_path: Path) -> set:
+    already = set()
+    try:
+        already = set(pd.read_csv(out_path, usecols=["openalex_id"])["openalex_id"].dropna().unique())
+        metrics.log(f"[info] {len(already):,} rows already in {out_path}")
+    except Exception as e:
+        print("[warn] Could not read existing file; treating as empty:", e)
+    return already
+
+
+def checkpoint_path(name: str) -> Path:
+    return ABSTRACTS_DIR / "checkpoints" / f"{name}.json"
+
+
+def commit_page(ckpt_path: Path, next_cursor: Optional[str], handles: Dict[Path, Any], rows: int,
+                started: Optional[str] = None, filter_str: Optional[str] = None) -> None:
+    """
+    Make every row written so far durable, then record where to resume.  The
+    checkpoint holds the committed size of each output file, so rows written
+    after it (an interrupted page) can be cut off again on restart, the day
+    the walk started, which becomes the high-water mark once it finishes, and
+    the filter the cursor belongs to.
+    """
+    sizes = {}
+    for path, f in handles.items():
+        f.flush()
+        os.fsync(f.fileno())
+        sizes[path.name] = os.fstat(f.fileno()).st_size
+    if next_cursor:
+        save_json_atomic(ckpt_path, {"cursor": next_cursor, "rows": rows, "files": sizes,
+                                     "started": started, "filter": filter_str})
+    elif ckpt_path.exists():
+        ckpt_path.unlink()          # walk finished; nothing to resume
+
+
+def resume_checkpoint(ckpt_path: Path, out_paths, filter_str: Optional[str] = None):
+    """
+    Return ``(cursor, rows, started)`` to continue from, truncating each output
+    back to its committed size.  Falls back to ``("*", 0, None)`` without a
+    usable checkpoint, or when the checkpoint was written by a walk with a
+    different filter (e.g. an interrupted delta run followed by a full one):
+    its cursor would skip works this walk must see.  ``started`` is also None
+    for checkpoints that predate it.
+    """
+    if not ckpt_path.is_file():
+        return "*", 0, None
+    try:
+        state = json.loads(ckpt_path.read_text(encoding="utf-8"))
+        sizes = state["files"]
+        for p in out_paths:
+            if not p.is_file() or p.stat().st_size < sizes[p.name]:
+                raise ValueError(f"{p.name} is shorter than its checkpoint")
+    except Exception as e:
+        print(f"[warn] Ignoring checkpoint {ckpt_path}: {e}")
+        return "*", 0, None
+    for p in out_paths:
+        with p.open("r+b") as f:
+            f.truncate(sizes[p.name])
+    if state.get("filter") != filter_str:
+        print(f"[warn] Checkpoint {ckpt_path} is for filter {state.get('filter')!r}; starting over")
+        return "*", 0, None
+    metrics.log(f"[info] Resuming {ckpt_path.stem} after {state['rows']:,} rows")
+    return state["cursor"], state["rows"], state.get("started")
+
+
+HWM_FILE = "high_water_marks.json"  # per-output date of the last complete harvest
+_hwm_lock = threading.Lock()
+
+
+def load_high_water_marks() -> Dict[str, str]:
+    path = ABSTRACTS_DIR / HWM_FILE
+    if not path.is_file():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def high_water_mark(out_path: Path) -> Optional[str]:
+    """Day the last complete harvest of ``out_path`` started, if known."""
+    return load_high_water_marks().get(out_path.stem)
+
+
+def record_high_water_mark(out_path: Path, day: str) -> None:
+    with _hwm_lock:
+        marks = load_high_water_marks()
+        marks[out_path.stem] = day
+        save_json_atomic(ABSTRACTS_DIR / HWM_FILE, marks)
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def compact_csv(out_path: Path) -> int:
+    """
+    Keep only the last row written for each ``openalex_id`` (delta harvests
+    append updated works instead of rewriting them in place).  Returns the
+    number of superseded rows dropped.
+    """
+    with out_path.open(newline="", encoding="utf-8") as f:
+        last = {row["openalex_id"]: i for i, row in enumerate(csv.DictReader(f))}
+    tmp = out_path.with_suffix(".compact.tmp")
+    dropped = 0
+    with out_path.open(newline="", encoding="utf-8") as fin, \
+            tmp.open("w", newline="", encoding="utf-8") as fout:
+        reader = csv.DictReader(fin)
+        writer = csv.DictWriter(fout, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        for i, row in enumerate(reader):
+            if last[row["openalex_id"]] == i:
+                writer.writerow(row)
+            else:
+                dropped += 1
+        fout.flush()
+        os.fsync(fout.fileno())
+    os.replace(tmp, out_path)
+    return dropped
+
+
+def download_topic(topic_id: int, primary_only: bool = False, limiter=None,
+                   projected: bool = False, lazy_abstracts: bool = False,
+                   since: Optional[str] = None, date_field: str = "created",
+                   fmt: str = "csv", store=None, **page_opts):
+    """
+    Append the topic's not-yet-saved works to its CSV (``fmt="parquet"``:
+    see ``download_topic_parquet``; with a ``work_store.WorkStore`` as
+    ``store``: see ``download_topics_to_store``).
+
+    ``projected`` asks OpenAlex only for the fields ``extract_row`` reads;
+    ``lazy_abstracts`` additionally leaves abstracts out of the cursor walk and
+    fetches them in batches for the new works only.  ``page_opts`` are passed
+    on to ``cursor_iter`` (streamed page parsing and per-page stats).
+
+    With ``since`` only works created/updated from that day on are fetched
+    (delta mode); they are upserted, replacing any older row of the same work.
+    A complete walk records its start day as the topic's high-water mark.
+    """
+    if store is not None:
+        return download_topics_to_store([topic_id], primary_only, store, limiter, projected,
+                                        lazy_abstracts, since, date_field, **page_opts)[topic_id]
+    if fmt == "parquet":
+        return download_topic_parquet(topic_id, primary_only, limiter, projected,
+                                      lazy_abstracts, since, date_field, **page_opts)
     # Create abstracts directory if it doesn't exist
-    abstracts_dir = Path("../abstracts")
-    abstracts_dir.mkdir(exist_ok=True)
-    
-    out_name = f"T{topic_id}_{'primary' if primary_only else 'any' }_works.csv"
-    out_path = abstracts_dir / out_name
-    fieldnames = [
-        "openalex_id","title","doi","publication_year","cited_by_count",
-        "journal","is_oa","oa_status","landing_url","pdf_url",
-        "topic_id_1","topic_id_2","topic_id_3",
-        "sdg_pairs","country_codes","language","citation_norm_pct",
-        "abstract"
-    ]
+    ABSTRACTS_DIR.mkdir(exist_ok=True)
+    out_path = topic_out_path(topic_id, primary_only)
 
+    # 0. Drop any half-written page and pick up the cursor after the last committed one
+    flt = make_filter(topic_id, primary_only, since=since, date_field=date_field)
+    ckpt_path = checkpoint_path(out_path.stem)
+    cursor, rows, started = resume_checkpoint(ckpt_path, [out_path], flt)
+    started = started or today()   # a resumed walk keeps the day it began
 
     # 1. Gather already-saved OpenAlex IDs
     already = set()
     mode = "w"
     if out_path.is_file():
         mode = "a"
-        try:
-            already = set(pd.read_csv(out_path, usecols=["openalex_id"])["openalex_id"].dropna().unique())
-            print(f"[info] {len(already):,} rows already in {out_path}")
-        except Exception as e:
-            print("[warn] Could not read existing file; treating as empty:", e)
+        if since is None:
+            already = load_existing_ids(out_path)
 
     # 2. Write only new rows
     with out_path.open(mode, newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         if mode == "w":
             writer.writeheader()
         count = 0
-        for work in tqdm(work_iter(topic_id, primary_only=primary_only), desc=f"Fetching works for {topic_id}"):
-            if work["id"] in already:
+        select = harvest_select(projected, lazy_abstracts)
+        works = cursor_iter(flt, limiter=limiter, select=select,
+                            cursor=cursor, mark_pages=True, **page_opts)
+        new_works = keep_new(progress(works, f"Fetching works for {topic_id}"),
+                             lambda w: since is not None or w["id"] not in already)
+        if lazy_abstracts:
+            new_works = attach_abstracts(new_works, limiter=limiter)
+        for item in extract_rows(new_works):
+            if isinstance(item, PageEnd):
+                commit_page(ckpt_path, item.next_cursor, {out_path: f}, rows + count, started, flt)
                 continue
-            row = extract_row(work)
+            work, row = item
             writer.writerow(row)
             count += 1
+    if since is not None and count:
+        compact_csv(out_path)
+    record_high_water_mark(out_path, started)
     return count
 
+
+def download_topic_parquet(topic_id: int, primary_only: bool = False, limiter=None,
+                           projected: bool = False, lazy_abstracts: bool = False,
+                           since: Optional[str] = None, date_field: str = "created",
+                           **page_opts) -> int:
+    """
+    ``download_topic`` writing ``T{id}_..._works.parquet`` in row groups.
+
+    Parquet files cannot be appended to, so the fetched rows are written to a
+    fresh file first and the previous file's rows that were not re-fetched
+    are copied in after them; the result replaces the old file on success.
+    There is no mid-topic checkpoint: an interrupted walk leaves the previous
+    file untouched and starts over.
+    """
+    started = today()
+    ABSTRACTS_DIR.mkdir(exist_ok=True)
+    out_path = topic_out_path(topic_id, primary_only, fmt="parquet")
+    old_path = out_path.with_name(out_path.name + ".old")
+    already = set()
+    if out_path.is_file():
+        os.replace(out_path, old_path)
+        if since is None:
+            already = parquet_output.read_column_values(old_path, "openalex_id")
+    elif old_path.is_file():
+        # a previous run died between the two renames
+        already = parquet_output.read_column_values(old_path, "openalex_id") if since is None else set()
+
+    written = set()
+    try:
+        with parquet_output.ParquetRowWriter(out_path, FIELDNAMES) as writer:
+            select = harvest_select(projected, lazy_abstracts)
+            flt = make_filter(topic_id, primary_only, since=since, date_field=date_field)
+            works = cursor_iter(flt, limiter=limiter, select=select, mark_pages=True, **page_opts)
+            new_works = keep_new(progress(works, f"Fetching works for {topic_id}"),
+                                 lambda w: since is not None or w["id"] not in already)
+            if lazy_abstracts:
+                new_works = attach_abstracts(new_works, limiter=limiter)
+            for item in extract_rows(new_works):
+                if isinstance(item, PageEnd):
+                    continue        # Parquet has no mid-topic checkpoint
+                work, row = item
+                if work["id"] in written:
+                    continue
+                writer.writerow(row)
+                written.add(work["id"])
+            if old_path.is_file():
+                for row in parquet_output.read_records(old_path):
+                    if row["openalex_id"] not in written:
+                        writer.writerow(row)
+    except BaseException:
+        if old_path.is_file() and not out_path.is_file():
+            os.replace(old_path, out_path)
+        raise
+    old_path.unlink(missing_ok=True)
+    record_high_water_mark(out_path, started)
+    return len(written)
+
+
+def download_topics_to_store(topic_ids, primary_only: bool, store, limiter=None,
+                             projected: bool = False, lazy_abstracts: bool = False,
+                             since: Optional[str] = None, date_field: str = "created",
+                             **page_opts) -> Dict[int, int]:
+    """
+    Harvest one or more topics into a ``work_store.WorkStore``.
+
+    A work already in the store (from any topic) is only linked to the
+    topic, never extracted or written again, and with ``lazy_abstracts`` its
+    abstract is not fetched either.  Rows and the resume cursor are committed
+    together after every page.  Returns the number of works stored per topic.
+    """
+    topic_ids = list(topic_ids)
+    mode = "primary" if primary_only else "any"
+    counts = {tid: 0 for tid in topic_ids}
+    wanted = {f"T{t}": t for t in topic_ids}
+    name = ",".join(f"T{t}" for t in sorted(topic_ids)) + f"_{mode}"
+    if since:
+        name += f"_{date_field}_since{since}"
+    cursor, rows, started = store.resume(name)
+    started = started or today()
+
+    def is_new(work):
+        if since is None and store.has(work["id"]):
+            for tid in route_topic_ids(work, wanted, primary_only):
+                store.link(work["id"], tid, mode)
+            return False
+        return True
+
+    select = harvest_select(projected, lazy_abstracts)
+    flt = make_batch_filter(topic_ids, primary_only, since=since, date_field=date_field)
+    stream = cursor_iter(flt, limiter=limiter, select=select,
+                         cursor=cursor, mark_pages=True, **page_opts)
+    new_works = keep_new(progress(stream, f"Fetching works for {len(topic_ids)} topic(s)"), is_new)
+    if lazy_abstracts:
+        new_works = attach_abstracts(new_works, limiter=limiter)
+    for item in extract_rows(new_works):
+        if isinstance(item, PageEnd):
+            store.commit_page(name, item.next_cursor, rows + sum(counts.values()), started)
+            continue
+        work, row = item
+        for tid in route_topic_ids(work, wanted, primary_only):
+            store.add(row, tid, mode, replace=since is not None)
+            counts[tid] += 1
+    for tid in topic_ids:
+        store.set_high_water_mark(topic_out_path(tid, primary_only).stem, started)
+    return counts
+
+
+def download_topic_batch(topic_ids, primary_only: bool = True, limiter=None,
+                         projected: bool = False, lazy_abstracts: bool = False,
+                         since: Optional[str] = None, date_field: str = "created",
+                         store=None, **page_opts) -> Dict[int, int]:
+    """
+    Harvest several topics through one OR-filtered cursor stream and route
+    each work to its ``T{id}_..._works.csv`` by topic id.  Returns the number
+    of new rows written per topic.  ``since``/``date_field``/``store`` work as
+    in ``download_topic``.
+    """
+    if store is not None:
+        return download_topics_to_store(topic_ids, primary_only, store, limiter, projected,
+                                        lazy_abstracts, since, date_field, **page_opts)
+    topic_ids = list(topic_ids)
+    ABSTRACTS_DIR.mkdir(exist_ok=True)
+    counts = {tid: 0 for tid in topic_ids}
+    out_paths = {tid: topic_out_path(tid, primary_only) for tid in topic_ids}
+    flt = make_batch_filter(topic_ids, primary_only, since=since, date_field=date_field)
+    batch_key = hashlib.sha1((",".join(map(str, sorted(topic_ids))) + (since or "")
+                              + date_field).encode()).hexdigest()[:12]
+    ckpt_path = checkpoint_path(f"batch_{batch_key}")
+    cursor, rows, started = resume_checkpoint(ckpt_path, list(out_paths.values()), flt)
+    started = started or today()
+    with ExitStack() as stack:
+        writers, already, handles = {}, {}, {}
+        for tid in topic_ids:
+            out_path = out_paths[tid]
+            mode = "a" if out_path.is_file() else "w"
+            already[tid] = load_existing_ids(out_path) if mode == "a" and since is None else set()
+            f = stack.enter_context(out_path.open(mode, newline="", encoding="utf-8"))
+            handles[out_path] = f
+            writers[tid] = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            if mode == "w":
+                writers[tid].writeheader()
+
+        wanted = {f"T{t}": t for t in topic_ids}
+        select = harvest_select(projected, lazy_abstracts)
+        stream = cursor_iter(flt, limiter=limiter,
+                             select=select, cursor=cursor, mark_pages=True, **page_opts)
+        new_works = keep_new(progress(stream, f"Fetching works for {len(topic_ids)} topics"),
+                             lambda w: since is not None or any(w["id"] not in already[t]
+                                           for t in route_topic_ids(w, wanted, primary_only)))
+        if lazy_abstracts:
+            new_works = attach_abstracts(new_works, limiter=limiter)
+        for item in extract_rows(new_works):
+            if isinstance(item, PageEnd):
+                commit_page(ckpt_path, item.next_cursor, handles, rows + sum(counts.values()), started, flt)
+                continue
+            work, row = item
+            for tid in route_topic_ids(work, wanted, primary_only):
+                if since is None and work["id"] in already[tid]:
+                    continue
+                writers[tid].writerow(row)
+                counts[tid] += 1
+    for tid in topic_ids:
+        if since is not None and counts[tid]:
+            compact_csv(out_paths[tid])
+        record_high_water_mark(out_paths[tid], started)
+    return counts
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Download OpenAlex works for a topic.")
     parser.add_argument("topic", type=int, help="Numeric topic ID (e.g. 10004)")
@@ -242,20 +878,12 @@ def main() -> None:
     out_path = Path(out_name)
 
     # Stream works and write CSV incrementally
-    fieldnames = [
-        "openalex_id","title","doi","publication_year","cited_by_count",
-        "journal","is_oa","oa_status","landing_url","pdf_url",
-        "topic_id_1","topic_id_2","topic_id_3",
-        "sdg_pairs","country_codes","language","citation_norm_pct",
-        "abstract"
-    ]
-
     with out_path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
         count = 0
         iterator = work_iter(topic_id, primary_only=primary_only)
-        for work in tqdm(iterator, desc="Fetching works"):
+        for work in tqdm(iterator, desc="Fetching works", disable=not metrics.verbose()):
             row = extract_row(work)
             writer.writerow(row)
             count += 1
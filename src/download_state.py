@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Per-DOI download state for D_download_fulltexts.
+
+``scraping_stats.csv`` is an append-only log; this SQLite file is what the
+downloader reads back to decide which DOIs to touch:
+
+* ``dois``       one row per DOI: ``done`` / ``failed`` / ``gave_up``, number of
+                 attempts, and when the next retry is due
+* ``providers``  per DOI and provider (elsevier, unpaywall, ...): attempts
+                 and the outcome of the latest one
+
+A failed DOI is retried after ``BACKOFF_BASE`` × 2^(attempts-1), capped at
+``BACKOFF_MAX``; after ``MAX_ATTEMPTS`` it is given up on until reset.
+
+Quick queries (from the git root's ``src/``):
+
+    python download_state.py summary --records ../abstracts/all_records.csv
+    python download_state.py reset --failed
+"""
+from __future__ import annotations
+import argparse
+import csv
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+DEFAULT_PATH = Path("../fulltexts/download_state.sqlite")
+DAY = 24 * 3600
+BACKOFF_BASE = 1 * DAY
+BACKOFF_MAX = 60 * DAY
+MAX_ATTEMPTS = 8
+
+
+def backoff(attempts: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Seconds to wait after the ``attempts``-th failure."""
+    return min(cap, base * 2 ** max(0, attempts - 1))
+
+
+class DownloadState:
+    """Thread-safe DOI state store."""
+
+    def __init__(self, path: Path = DEFAULT_PATH, clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._clock = clock
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS dois (
+                    doi TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_attempt REAL NOT NULL,
+                    next_retry REAL
+                );
+                CREATE INDEX IF NOT EXISTS dois_due ON dois (status, next_retry);
+                CREATE TABLE IF NOT EXISTS providers (
+                    doi TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    outcome TEXT NOT NULL,
+                    last_attempt REAL NOT NULL,
+                    PRIMARY KEY (doi, provider)
+                ) WITHOUT ROWID;
+            """)
+
+    def due(self, doi: str) -> bool:
+        """True for a DOI never tried, or failed with its retry time reached."""
+        with self._lock:
+            row = self.conn.execute("SELECT status, next_retry FROM dois WHERE doi = ?",
+                                    (doi.lower(),)).fetchone()
+        if row is None:
+            return True
+        status, next_retry = row
+        return status == "failed" and next_retry <= self._clock()
+
+    def next_retry(self, doi: str) -> Optional[float]:
+        with self._lock:
+            row = self.conn.execute("SELECT next_retry FROM dois WHERE doi = ?",
+                                    (doi.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def record(self, doi: str, outcomes: Dict[str, str], success: bool) -> str:
+        """
+        Store one attempt: ``outcomes`` maps provider → status string (providers
+        that were not tried are left out).  Returns the DOI's new status.
+        """
+        doi = doi.lower()
+        now = self._clock()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT attempts FROM dois WHERE doi = ?", (doi,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            if success:
+                status, next_retry = "done", None
+            elif attempts >= MAX_ATTEMPTS:
+                status, next_retry = "gave_up", None
+            else:
+                status, next_retry = "failed", now + backoff(attempts)
+            self.conn.execute("INSERT OR REPLACE INTO dois VALUES (?, ?, ?, ?, ?)",
+                              (doi, status, attempts, now, next_retry))
+            self.conn.executemany("""
+                INSERT INTO providers VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (doi, provider) DO UPDATE SET
+                    attempts = attempts + 1, outcome = excluded.outcome,
+                    last_attempt = excluded.last_attempt
+            """, [(doi, provider, str(outcome), now) for provider, outcome in outcomes.items()])
+        return status
+
+    def reset(self, doi: Optional[str] = None, status: Optional[str] = None) -> int:
+        """Make DOIs due again: one DOI, or all with ``status``."""
+        with self._lock, self.conn:
+            if doi is not None:
+                cur = self.conn.execute("UPDATE dois SET status = 'failed', next_retry = 0 "
+                                        "WHERE doi = ? AND status != 'done'", (doi.lower(),))
+            else:
+                cur = self.conn.execute("UPDATE dois SET status = 'failed', next_retry = 0 "
+                                        "WHERE status = ?", (status,))
+        return cur.rowcount
+
+    def summary(self, dois: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Counts per status, how many failed DOIs are due now, and, given the
+        input DOIs, how many were never tried and how many are pending in total.
+        """
+        now = self._clock()
+        with self._lock:
+            out = dict(self.conn.execute("SELECT status, COUNT(*) FROM dois GROUP BY status"))
+            out["due_now"] = self.conn.execute(
+                "SELECT COUNT(*) FROM dois WHERE status = 'failed' AND next_retry <= ?",
+                (now,)).fetchone()[0]
+            if dois is not None:
+                wanted = {d.lower() for d in dois if d}
+                known = {r[0] for r in self.conn.execute("SELECT doi FROM dois")}
+                out["new"] = len(wanted - known)
+                out["pending"] = out["new"] + out["due_now"]
+        return out
+
+    def provider_summary(self) -> Dict[str, Dict[str, int]]:
+        """``provider → outcome → number of DOIs`` over the latest attempts."""
+        out: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for provider, outcome, n in self.conn.execute(
+                    "SELECT provider, outcome, COUNT(*) FROM providers GROUP BY provider, outcome"):
+                out.setdefault(provider, {})[outcome] = n
+        return out
+
+    def merge(self, other: Path) -> int:
+        """Take over the DOIs of another state file (e.g. a shard's) where its attempt is newer."""
+        with self._lock:
+            self.conn.execute("ATTACH DATABASE ? AS other", (str(other),))
+            try:
+                with self.conn:
+                    n = self.conn.execute("""
+                        INSERT INTO dois SELECT * FROM other.dois WHERE true
+                        ON CONFLICT (doi) DO UPDATE SET
+                            status = excluded.status, attempts = excluded.attempts,
+                            last_attempt = excluded.last_attempt, next_retry = excluded.next_retry
+                        WHERE excluded.last_attempt > dois.last_attempt
+                    """).rowcount
+                    self.conn.execute("""
+                        INSERT INTO providers SELECT * FROM other.providers WHERE true
+                        ON CONFLICT (doi, provider) DO UPDATE SET
+                            attempts = excluded.attempts, outcome = excluded.outcome,
+                            last_attempt = excluded.last_attempt
+                        WHERE excluded.last_attempt > providers.last_attempt
+                    """)
+            finally:
+                self.conn.execute("DETACH DATABASE other")
+        return n
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the per-DOI download state.")
+    parser.add_argument("command", choices=["summary", "providers", "reset"])
+    parser.add_argument("--db", default=str(DEFAULT_PATH))
+    parser.add_argument("--records", help="all_records.csv, to count DOIs never tried")
+    parser.add_argument("--doi", help="reset: this DOI only")
+    parser.add_argument("--failed", action="store_true", help="reset: every failed DOI")
+    parser.add_argument("--gave-up", action="store_true", help="reset: every DOI given up on")
+    args = parser.parse_args()
+
+    state = DownloadState(args.db)
+    if args.command == "summary":
+        dois = None
+        if args.records:
+            import D_download_fulltexts as D   # for sanitize_doi
+            with open(args.records, newline="", encoding="utf-8") as fh:
+                dois = [D.sanitize_doi(r.get("doi")) for r in csv.DictReader(fh)]
+        for key, n in sorted(state.summary(dois).items()):
+            print(f"{key:>10}: {n:,}")
+    elif args.command == "providers":
+        for provider, outcomes in sorted(state.provider_summary().items()):
+            print(provider, dict(sorted(outcomes.items(), key=lambda kv: -kv[1])))
+    else:
+        if args.doi:
+            n = state.reset(doi=args.doi)
+        elif args.failed or args.gave_up:
+            n = state.reset(status="failed") if args.failed else 0
+            n += state.reset(status="gave_up") if args.gave_up else 0
+        else:
+            parser.error("reset needs --doi, --failed or --gave-up")
+        print(f"{n:,} DOIs due again")
+    state.close()
+
+
+if __name__ == "__main__":
+    main()
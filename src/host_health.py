@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Per-hostname health for the full-text downloader.
+
+With many workers a publisher that is down, or one that accepts connections
+and never answers, used to cost every row that pointed at it a full fixed
+timeout.  ``HostHealth`` keeps, per hostname:
+
+* a circuit breaker: after ``failures`` consecutive failures (timeouts,
+  connection errors, 5xx answers) the host is skipped for ``cooldown``
+  seconds.  Then one probe request is let through: success closes the
+  circuit, failure opens it again for twice as long (up to ``max_cooldown``).
+* recent latencies (time until the response headers arrive), from which
+  ``timeout()`` derives ``factor`` × the 95th percentile, between
+  ``min_timeout`` and the caller's fixed timeout.  A timeout counts as a
+  latency of the timeout itself, so a host that is merely slow gets longer
+  timeouts again instead of being cut off for good.
+"""
+from __future__ import annotations
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+FAILURES = 5             # consecutive failures that open the circuit
+COOLDOWN = 300.0         # seconds a host is skipped after its circuit opens
+MAX_COOLDOWN = 3600.0
+WINDOW = 50              # latencies kept per host
+MIN_SAMPLES = 5          # before that, callers get their fixed timeout
+PERCENTILE = 0.95
+FACTOR = 4.0
+MIN_TIMEOUT = 5.0
+
+
+def hostname(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class _Host:
+    __slots__ = ("latencies", "failures", "opened_until", "cooldown", "probing",
+                 "requests", "skipped", "trips")
+
+    def __init__(self, window: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.failures = 0
+        self.opened_until: Optional[float] = None
+        self.cooldown = 0.0
+        self.probing = False
+        self.requests = self.skipped = self.trips = 0
+
+
+class HostHealth:
+    """Thread-safe circuit breakers and adaptive timeouts, one per hostname."""
+
+    def __init__(self, failures: int = FAILURES, cooldown: float = COOLDOWN,
+                 max_cooldown: float = MAX_COOLDOWN, window: int = WINDOW,
+                 min_samples: int = MIN_SAMPLES, factor: float = FACTOR,
+                 min_timeout: float = MIN_TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.window = window
+        self.min_samples = min_samples
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _Host] = {}
+
+    def _host(self, host: str) -> _Host:
+        h = self._hosts.get(host)
+        if h is None:
+            h = self._hosts[host] = _Host(self.window)
+        return h
+
+    # ── circuit ──────────────────────────────────────────────────────────────
+    def allow(self, url: str) -> bool:
+        """False while the host's circuit is open (or its one probe is in flight)."""
+        with self._lock:
+            h = self._host(hostname(url))
+            if h.opened_until is not None:
+                if self._clock() < h.opened_until or h.probing:
+                    h.skipped += 1
+                    return False
+                h.probing = True        # half-open: this request is the probe
+            h.requests += 1
+            return True
+
+    def success(self, url: str, latency: float) -> None:
+        with self._lock:
+            h = self._host(hostname(url))
+            h.latencies.append(latency)
+            h.failures = 0
+            h.opened_until = None
+            h.cooldown = 0.0
+            h.probing = False
+
+    def failure(self, url: str, latency: Optional[float] = None) -> None:
+        """Record a failed request; ``latency`` is given for timeouts."""
+        with self._lock:
+            h = self._host(hostname(url))
+            if latency is not None:
+                h.latencies.append(latency)
+            h.failures += 1
+            if h.opened_until is not None and not h.probing:
+                return          # a request started before the circuit opened
+            if h.probing or h.failures >= self.failures:
+                h.cooldown = min(self.max_cooldown, h.cooldown * 2 if h.cooldown else self.cooldown)
+                h.opened_until = self._clock() + h.cooldown
+                h.trips += 1
+            h.probing = False
+
+    def release(self, url: str) -> None:
+        """Forget a probe that ended without telling anything about the host."""
+        with self._lock:
+            self._host(hostname(url)).probing = False
+
+    def retry_in(self, url: str) -> float:
+        """Seconds until the host's circuit lets a request through again."""
+        with self._lock:
+            h = self._host(hostname(url))
+            return max(0.0, (h.opened_until or 0.0) - self._clock())
+
+    # ── timeouts ─────────────────────────────────────────────────────────────
+    def timeout(self, url: str, default: float) -> float:
+        """``factor`` × p95 latency of the host, within [min_timeout, default]."""
+        with self._lock:
+            latencies = list(self._host(hostname(url)).latencies)
+        if len(latencies) < self.min_samples:
+            return default
+        return min(default, max(self.min_timeout, self.factor * percentile(latencies, PERCENTILE)))
+
+    # ── reporting ────────────────────────────────────────────────────────────
+    def report(self) -> List[Dict[str, object]]:
+        """Hosts that were skipped or tripped, worst first."""
+        now = self._clock()
+        rows = []
+        with self._lock:
+            for host, h in self._hosts.items():
+                if not (h.skipped or h.trips):
+                    continue
+                rows.append({
+                    "host": host, "requests": h.requests, "skipped": h.skipped,
+                    "trips": h.trips, "open": h.opened_until is not None and now < h.opened_until,
+                    "p95": round(percentile(h.latencies, PERCENTILE), 2) if h.latencies else None,
+                })
+        return sorted(rows, key=lambda r: (-r["skipped"], -r["trips"], r["host"]))
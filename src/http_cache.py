@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent HTTP response cache for the metadata lookups in D_download_fulltexts.
+
+Responses are stored in SQLite, keyed by the normalised URL: scheme and host
+lower-cased, query parameters sorted, and parameters that only identify the
+caller (``email``, ``mailto``, ``api_key``) dropped, so changing the contact
+address in API_KEYS.txt does not invalidate the cache.
+
+* ``ttl``           how long a 200 response is served without asking again
+* ``negative_ttl``  how long a 404 ("this DOI is unknown here") is remembered
+* ``max_bytes``     total body size; least recently used entries go first
+                    (recency is kept to ``TOUCH_INTERVAL``, so most hits are
+                    read-only)
+* expired entries that carried an ``ETag`` or ``Last-Modified`` header are
+  revalidated with ``If-None-Match`` / ``If-Modified-Since``; a 304 answer
+  refreshes the entry without re-downloading the body.
+
+Server errors, rate-limit answers and network failures are never cached.
+"""
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PATH = Path("../fulltexts/http_cache.sqlite")
+DAY = 24 * 3600
+DEFAULT_TTL = 30 * DAY
+DEFAULT_NEGATIVE_TTL = 3 * DAY
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+NEGATIVE_STATUSES = {404, 410}
+STRIP_PARAMS = {"email", "mailto", "api_key"}
+TOUCH_INTERVAL = 60.0   # seconds; a hit refreshes last_used at most this often
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in STRIP_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/",
+                       urlencode(query), ""))
+
+
+class Entry(NamedTuple):
+    status: int
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh: bool
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional-request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """Thread-safe SQLite response cache with TTLs and LRU size eviction."""
+
+    def __init__(self, path: Path = DEFAULT_PATH, ttl: float = DEFAULT_TTL,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL, max_bytes: int = DEFAULT_MAX_BYTES,
+                 clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "evicted": 0}
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used);
+            """)
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url: str) -> Optional[Entry]:
+        """The cached entry (fresh or stale), or None; marks it recently used."""
+        key = normalize_url(url)
+        now = self._clock()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, body, etag, last_modified, expires_at, last_used "
+                "FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if now - row[5] >= TOUCH_INTERVAL:
+                with self.conn:
+                    self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            fresh = now < row[4]
+            self.stats["hits" if fresh else "stale"] += 1
+        return Entry(row[0], bytes(row[1]), row[2], row[3], fresh)
+
+    def put(self, url: str, status: int, body: bytes = b"",
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> bool:
+        """Store a response; returns False for statuses that are not cacheable."""
+        if status == 200:
+            ttl = self.ttl
+        elif status in NEGATIVE_STATUSES:
+            ttl, body = self.negative_ttl, b""
+        else:
+            return False
+        key = normalize_url(url)
+        now = self._clock()
+        with self._lock, self.conn:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (key, status, body, etag, last_modified, now + ttl, now, len(body)))
+            self._size += len(body) - (old[0] if old else 0)
+            self._evict()
+        return True
+
+    def revalidated(self, url: str) -> None:
+        """The server answered 304: keep the body for another ``ttl``."""
+        now = self._clock()
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE responses SET expires_at = ?, last_used = ? WHERE key = ?",
+                              (now + self.ttl, now, normalize_url(url)))
+            self.stats["revalidated"] += 1
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the bodies fit in 90% of ``max_bytes``."""
+        if self._size <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used")
+        doomed = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            doomed.append((key,))
+            self._size -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.stats["evicted"] += len(doomed)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
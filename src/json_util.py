@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+JSON state files shared by the harvest, the combiner and the extractor
+(checkpoints, high-water marks, manifests).
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+
+def save_json_atomic(path: Path, state: Dict[str, Any]) -> None:
+    """Write ``state`` atomically: a crash leaves either the old or the new file."""
+    path.parent.mkdir(exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Combine the outputs of a sharded full-text run into ``../fulltexts``.
+
+``D_download_fulltexts.py --shard I/N`` writes everything a run produces into
+its own directory (``../fulltexts/shard-I-of-N`` unless ``--out-dir`` is
+given), so N machines never share a file.  Once the shard directories are
+copied back, this script merges them:
+
+* ``scraping_stats.csv``: the rows of every shard are added to the main
+  file (rows already in it are not repeated) and sorted by row tag;
+* the PDF store: blobs and the DOI index of each shard go into
+  ``fulltexts/store``, and ``pdfs/`` and ``elsevier_pdfs/`` get views of
+  them (shards run with ``--no-store`` have their PDFs stored on the way);
+* ``download_state.sqlite``: the newest attempt per DOI wins.
+
+Merging again after more shards arrive (or a shard re-ran) is safe.
+From the git root's ``src/``:
+
+    python merge_fulltext_shards.py                      # every ../fulltexts/shard-*-of-*
+    python merge_fulltext_shards.py /mnt/node3/fulltexts/shard-3-of-4
+"""
+from __future__ import annotations
+import argparse
+import csv
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import D_download_fulltexts as D
+import download_state
+import pdf_store
+
+FULLTEXTS_DIR = Path("../fulltexts")
+TAG_RE = re.compile(r"row(\d+)")
+
+
+def shard_dirs(root: Path = FULLTEXTS_DIR) -> List[Path]:
+    return sorted(p for p in Path(root).glob("shard-*-of-*") if p.is_dir())
+
+
+# ─────────────────────────── stats ───────────────────────────────────────────
+def read_stats(path: Path) -> List[Dict[str, str]]:
+    if not path.is_file():
+        return []
+    with path.open(newline="", encoding="utf-8") as fh:
+        return [{f: row.get(f) or "" for f in D.FIELDNAMES} for row in csv.DictReader(fh)]
+
+
+def row_number(row: Dict[str, str]) -> int:
+    m = TAG_RE.search(row["tag"])
+    return int(m.group(1)) if m else -1
+
+
+def merge_stats(shards: List[Path], out_csv: Path) -> int:
+    """Add the shards' stats rows to ``out_csv``; returns the number of new rows."""
+    rows = read_stats(out_csv)
+    seen = {tuple(r.values()) for r in rows}
+    added = 0
+    for shard in shards:
+        for row in read_stats(shard / "scraping_stats.csv"):
+            key = tuple(row.values())
+            if key not in seen:
+                seen.add(key)
+                rows.append(row)
+                added += 1
+    rows.sort(key=row_number)   # stable: repeated attempts of a row keep their order
+    tmp = out_csv.with_name(out_csv.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=D.FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, out_csv)
+    return added
+
+
+# ─────────────────────────── PDFs ────────────────────────────────────────────
+def shard_links(shard: Path) -> Dict[str, Tuple[str, str]]:
+    index = shard / "store" / "index.sqlite"
+    if not index.is_file():
+        return {}
+    conn = sqlite3.connect(f"file:{index}?mode=ro", uri=True)
+    try:
+        return {d: (sha, src) for d, sha, src in conn.execute("SELECT doi, sha256, source FROM dois")}
+    finally:
+        conn.close()
+
+
+def merge_pdfs(shard: Path, store: pdf_store.PdfStore, out_dir: Path) -> int:
+    """Store the shard's PDFs, merge its DOI index and recreate its views; returns PDFs seen."""
+    # blobs are named by their hash; anything else is hashed on the way in
+    by_inode = {}
+    for blob in (shard / "store" / "blobs").glob("*/*.pdf"):
+        store.adopt(blob, blob.stem)
+        st = blob.stat()
+        by_inode[(st.st_dev, st.st_ino)] = blob.stem
+    existing = store.links()
+    for doi, (sha, source) in shard_links(shard).items():
+        known = existing.get(doi)
+        if known and known[1] != "elsevier_partial" and source == "elsevier_partial":
+            continue   # the main store already has the full article
+        store.link(doi, sha, source)
+    n = 0
+    for sub in ("pdfs", "elsevier_pdfs"):
+        for path in sorted((shard / sub).glob("*.pdf")):
+            st = path.stat()
+            sha = by_inode.get((st.st_dev, st.st_ino)) or pdf_store.sha256_file(path)
+            store.adopt(path, sha)
+            store.view(sha, out_dir / sub / path.name)
+            n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge sharded full-text runs.")
+    parser.add_argument("shards", nargs="*", help="Shard directories (default: ../fulltexts/shard-*-of-*)")
+    parser.add_argument("--out", default=str(FULLTEXTS_DIR))
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    shards = [Path(s) for s in args.shards] or shard_dirs(out_dir)
+    if not shards:
+        parser.error(f"no shard directories found in {out_dir}")
+    for sub in ("pdfs", "elsevier_pdfs"):
+        (out_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    added = merge_stats(shards, out_dir / "scraping_stats.csv")
+    print(f"scraping_stats.csv: {added:,} new rows from {len(shards)} shards")
+    store = pdf_store.PdfStore(out_dir / "store")
+    state = download_state.DownloadState(out_dir / "download_state.sqlite")
+    for shard in shards:
+        n = merge_pdfs(shard, store, out_dir)
+        m = state.merge(shard / "download_state.sqlite") \
+            if (shard / "download_state.sqlite").is_file() else 0
+        print(f"{shard}: {n:,} PDFs, {m:,} DOI states")
+    print(f"PDF store: {store.stats()}")
+    print(f"DOI state: {state.summary()}")
+    store.close()
+    state.close()
+
+
+if __name__ == "__main__":
+    main()
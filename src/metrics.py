@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Counters, latency histograms and structured event logs for the harvesters.
+
+Until now the only way to see what a long run was doing was its ``print``
+output: one or more lines per row or page, too slow to write at volume and
+impossible to aggregate.  ``METRICS`` is one registry per process that the
+scripts feed as they go:
+
+* ``http_requests_total{provider,host,status}`` and
+  ``http_request_seconds{provider,host}`` for every request (``provider`` is
+  the API, see ``rate_limit.PROVIDER_HOSTS``, or ``other`` for publishers);
+* ``stage_seconds{stage}`` for the pipeline stages (``page_fetch``,
+  ``locator``, ``download``, ``pdf_validation``, ...; ``extract_row`` is
+  observed once per page or snapshot partition, not per work);
+* a few plain counters (pages, works, rows by outcome, ...).
+
+It can be read while the run goes on, from a Prometheus-format endpoint
+(``--metrics-port``, ``GET /metrics``; ``/metrics.json`` for JSON) or from a
+JSON snapshot rewritten every ``--metrics-interval`` seconds
+(``--metrics-json``).  ``--events FILE`` writes one JSON object per line for
+every row, page, throttle, ...; ``-q`` turns the per-row and per-page prints
+off, ``-v`` adds the raw responses.
+"""
+from __future__ import annotations
+import atexit
+import bisect
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import rate_limit
+from host_health import hostname
+
+NAMESPACE = "climsight"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+SNAPSHOT_INTERVAL = 30.0   # seconds between --metrics-json rewrites
+
+QUIET, NORMAL, DEBUG = 0, 1, 2
+VERBOSITY = NORMAL
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n: int):
+        self.counts = [0] * n
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """Thread-safe counters and fixed-bucket histograms, keyed by name and labels."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+                 clock: Callable[[], float] = time.time):
+        self.buckets = buckets
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._hists: Dict[Tuple[str, Labels], _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = _Histogram(len(self.buckets))
+            h.counts[i] += 1
+            h.sum += value
+            h.count += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observe the duration of the ``with`` block (also when it raises)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._hists.clear()
+
+    # ── export ───────────────────────────────────────────────────────────────
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything as plain JSON types; bucket counts are cumulative, as in Prometheus."""
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v}
+                        for (n, l), v in sorted(self._counters.items())]
+            hists = []
+            for (n, l), h in sorted(self._hists.items()):
+                cumulative, total = {}, 0
+                for le, c in zip(self.buckets, h.counts):
+                    total += c
+                    cumulative["+Inf" if le == math.inf else repr(le)] = total
+                hists.append({"name": n, "labels": dict(l), "count": h.count,
+                              "sum": round(h.sum, 6), "buckets": cumulative})
+        return {"time": self._clock(), "counters": counters, "histograms": hists}
+
+    def prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines, typed = [], set()
+
+        def series(name, kind):
+            full = f"{NAMESPACE}_{name}"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for c in snap["counters"]:
+            full = series(c["name"], "counter")
+            lines.append(f"{full}{_prom_labels(c['labels'])} {c['value']:g}")
+        for h in snap["histograms"]:
+            full = series(h["name"], "histogram")
+            for le, n in h["buckets"].items():
+                lines.append(f"{full}_bucket{_prom_labels(h['labels'], le=le)} {n}")
+            lines.append(f"{full}_sum{_prom_labels(h['labels'])} {h['sum']:g}")
+            lines.append(f"{full}_count{_prom_labels(h['labels'])} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path) -> None:
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+
+def _prom_labels(labels: Dict[str, str], **extra) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+
+METRICS = Metrics()   # shared by every script in this process
+
+
+def http(url: str, status: Any, seconds: float) -> None:
+    """Count one HTTP request to ``url`` and its latency; ``status`` may be an error name."""
+    host = hostname(url)
+    provider = rate_limit.PROVIDER_HOSTS.get(host, "other")
+    METRICS.inc("http_requests_total", provider=provider, host=host, status=status)
+    METRICS.observe("http_request_seconds", seconds, provider=provider, host=host)
+
+
+def stage(name: str):
+    """``with stage("download"): ...`` observes ``stage_seconds{stage=name}``."""
+    return METRICS.timer("stage_seconds", stage=name)
+
+
+# ─────────────────────────── events / verbosity ──────────────────────────────
+class EventLog:
+    """JSON Lines event sink; one object per ``write`` with ``ts`` and ``event``."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._own = path != "-"
+        self._f = open(path, "a", encoding="utf-8", buffering=1) if self._own else sys.stdout
+
+    def write(self, name: str, fields: Dict[str, Any]) -> None:
+        line = json.dumps({"ts": round(time.time(), 3), "event": name, **fields}, default=str)
+        with self._lock:
+            self._f.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._own:
+                self._f.close()
+            else:
+                self._f.flush()
+
+
+EVENTS: Optional[EventLog] = None
+
+
+def event(name: str, **fields) -> None:
+    """Write a structured event, if ``--events`` is on."""
+    if EVENTS is not None:
+        EVENTS.write(name, fields)
+
+
+def verbose(level: int = NORMAL) -> bool:
+    return VERBOSITY >= level
+
+
+def log(msg: str, level: int = NORMAL) -> None:
+    """``print`` for per-row and per-page output, silenced below ``level``."""
+    if VERBOSITY >= level:
+        print(msg, flush=True)
+
+
+# ─────────────────────────── exporters ───────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    registry: Metrics = METRICS
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, ctype = self.registry.prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, ctype = json.dumps(self.registry.snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass   # scrapes are not worth a line each
+
+
+def serve(port: int, registry: Metrics = METRICS, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` and ``/metrics.json`` from a daemon thread."""
+    handler = type("Handler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class Snapshotter:
+    """Rewrite a JSON snapshot of ``registry`` every ``interval`` seconds, and once more on ``stop``."""
+
+    def __init__(self, path: Path, interval: float = SNAPSHOT_INTERVAL, registry: Metrics = METRICS):
+        self.path = Path(path)
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-json", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.registry.write_json(self.path)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.registry.write_json(self.path)
+
+
+# ─────────────────────────── CLI glue ────────────────────────────────────────
+def add_arguments(parser) -> None:
+    """The observability flags shared by B and D."""
+    group = parser.add_argument_group("metrics and logging")
+    group.add_argument("-q", "--quiet", action="store_const", const=QUIET, dest="verbosity",
+                       default=NORMAL, help="No per-row or per-page output")
+    group.add_argument("-v", "--verbose", action="store_const", const=DEBUG, dest="verbosity",
+                       help="Also print raw responses and headers")
+    group.add_argument("--events", metavar="JSONL",
+                       help="Append structured JSON events to this file ('-' for stdout)")
+    group.add_argument("--metrics-port", type=int,
+                       help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    group.add_argument("--metrics-json", metavar="PATH",
+                       help="Rewrite a JSON snapshot of the metrics here periodically and at exit")
+    group.add_argument("--metrics-interval", type=float, default=SNAPSHOT_INTERVAL,
+                       help=f"Seconds between JSON snapshots (default: {SNAPSHOT_INTERVAL:g})")
+
+
+_started: List[Callable[[], None]] = []
+
+
+def setup(args) -> None:
+    """Apply the flags of ``add_arguments``; exporters are stopped at exit."""
+    global VERBOSITY, EVENTS
+    VERBOSITY = args.verbosity
+    if args.events:
+        EVENTS = EventLog(args.events)
+        _started.append(EVENTS.close)
+    if args.metrics_port:
+        server = serve(args.metrics_port)
+        _started.append(server.shutdown)
+    if args.metrics_json:
+        _started.append(Snapshotter(args.metrics_json, args.metrics_interval).stop)
+    if _started:
+        atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Stop the exporters, writing the final JSON snapshot (runs at exit)."""
+    while _started:
+        _started.pop()()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental parser for OpenAlex list responses.
+
+``resp.json()`` materialises a whole page (up to 200 works, inverted-index
+abstracts included) before the first work can be processed.  ``iter_results``
+instead decodes the top-level ``results`` array one work at a time straight
+from the response byte chunks, so at most about two works plus one chunk are
+held in memory.  The other top-level members (``meta``, ``group_by``) are small and are
+decoded whole into the ``other`` dict passed by the caller.
+
+Only the standard library is used: every value is decoded with
+``json.JSONDecoder.raw_decode`` and more input is pulled in whenever the
+buffer ends in the middle of a value.  A value that spans many chunks is only
+decoded again once its buffered part has doubled, so a large work costs a
+few decode attempts instead of one per chunk.
+"""
+from __future__ import annotations
+import codecs
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+_DECODER = json.JSONDecoder()
+_WS = " \t\n\r"
+
+
+class _Reader:
+    def __init__(self, chunks: Iterable[bytes], stats: Dict[str, Any]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._stats = stats
+        self.buf = ""
+        self.pos = 0
+        self.done = False
+
+    def fill(self) -> bool:
+        """Append the next chunk to the buffer; False once the body is exhausted."""
+        if self.done:
+            return False
+        chunk = next(self._chunks, None)
+        t0 = time.perf_counter()
+        if chunk is None:
+            self.done = True
+            text = self._utf8.decode(b"", final=True)
+        else:
+            self._stats["bytes"] += len(chunk)
+            text = self._utf8.decode(chunk)
+        # drop what has been consumed so the buffer never grows past one value
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        self._stats["decode_s"] += time.perf_counter() - t0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("unexpected end of JSON body")
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} at offset {self.pos}, got {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        tried = 0   # buffered length of the value at the last failed attempt
+        while True:
+            if self.done or len(self.buf) - self.pos >= 2 * tried:
+                t0 = time.perf_counter()
+                try:
+                    val, end = _DECODER.raw_decode(self.buf, self.pos)
+                except json.JSONDecodeError:
+                    val, end = None, None
+                self._stats["decode_s"] += time.perf_counter() - t0
+                # a value that ends exactly at the buffer edge may be a truncated number
+                if end is not None and (end < len(self.buf) or self.done):
+                    self.pos = end
+                    return val
+                if self.done:
+                    raise ValueError("truncated JSON value")
+                tried = len(self.buf) - self.pos
+            self.fill()
+
+
+def new_stats() -> Dict[str, Any]:
+    return {"bytes": 0, "results": 0, "decode_s": 0.0}
+
+
+def iter_results(chunks: Iterable[bytes], other: Dict[str, Any],
+                 stats: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield each element of the top-level ``results`` array of a JSON object
+    read from ``chunks``.  Every other top-level member is stored in ``other``.
+
+    ``stats`` (see ``new_stats``) accumulates body bytes, number of results and
+    the seconds spent decoding; time spent waiting on the network or inside
+    the consumer is not counted.
+    """
+    stats = stats if stats is not None else new_stats()
+    r = _Reader(chunks, stats)
+    r.expect("{")
+    if r.peek() == "}":
+        return
+    while True:
+        key = r.value()
+        r.expect(":")
+        if key == "results" and r.peek() == "[":
+            r.expect("[")
+            if r.peek() == "]":
+                r.pos += 1
+            else:
+                while True:
+                    item = r.value()
+                    stats["results"] += 1
+                    yield item
+                    if r.peek() == ",":
+                        r.pos += 1
+                        continue
+                    r.expect("]")
+                    break
+        else:
+            other[key] = r.value()
+        if r.peek() == ",":
+            r.pos += 1
+            continue
+        r.expect("}")
+        return
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Optional Parquet output for the abstract CSVs.
+
+``ParquetRowWriter`` is a drop-in for ``csv.DictWriter``: rows are buffered
+and written as row groups of ``ROW_GROUP_ROWS``, the numeric columns keep
+their types, and the heavily repeated low-cardinality columns (topic IDs,
+language, OA status, ...) are dictionary-encoded.  The file is written under
+a temporary name and only renamed into place by ``close()``, so a crash never
+leaves a truncated Parquet file behind.
+
+Needs ``pyarrow`` (``pip install pyarrow``); nothing else in the pipeline does.
+"""
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional
+    pa = pq = None
+
+ROW_GROUP_ROWS = 5000
+DICTIONARY_COLUMNS = [
+    "journal", "is_oa", "oa_status", "topic_id_1", "topic_id_2", "topic_id_3",
+    "language", "country_codes",
+]
+INT_COLUMNS = {"publication_year", "cited_by_count"}
+FLOAT_COLUMNS = {"citation_norm_pct"}
+BOOL_COLUMNS = {"is_oa"}
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+
+def _arrow_type(name: str):
+    if name in INT_COLUMNS:
+        return pa.int64()
+    if name in FLOAT_COLUMNS:
+        return pa.float64()
+    if name in BOOL_COLUMNS:
+        return pa.bool_()
+    return pa.string()
+
+
+def make_schema(fieldnames: Iterable[str]):
+    require_pyarrow()
+    return pa.schema([(name, _arrow_type(name)) for name in fieldnames])
+
+
+def _coerce(name: str, value: Any) -> Any:
+    """Values read back from CSV are strings; turn them into the column type."""
+    if value is None or value == "":
+        return None
+    if name in INT_COLUMNS:
+        return int(float(value))
+    if name in FLOAT_COLUMNS:
+        return float(value)
+    if name in BOOL_COLUMNS:
+        return value if isinstance(value, bool) else str(value).lower() == "true"
+    return value if isinstance(value, str) else str(value)
+
+
+class ParquetRowWriter:
+    """``csv.DictWriter``-like writer producing one Parquet file in row groups."""
+
+    def __init__(self, path: Path, fieldnames: List[str], row_group_rows: int = ROW_GROUP_ROWS):
+        require_pyarrow()
+        self.path = Path(path)
+        self.fieldnames = list(fieldnames)
+        self.row_group_rows = row_group_rows
+        self.schema = make_schema(self.fieldnames)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._writer = pq.ParquetWriter(
+            self._tmp, self.schema,
+            use_dictionary=[c for c in DICTIONARY_COLUMNS if c in self.fieldnames],
+            compression="zstd",
+        )
+        self._columns = {name: [] for name in self.fieldnames}
+        self._buffered = 0
+        self.rows = 0
+
+    def writerow(self, row: Dict[str, Any]) -> None:
+        self.write_values([row.get(name) for name in self.fieldnames])
+
+    def write_values(self, values: List[Any]) -> None:
+        """Like ``writerow`` but with the values already in ``fieldnames`` order."""
+        for name, value in zip(self.fieldnames, values):
+            self._columns[name].append(_coerce(name, value))
+        self._buffered += 1
+        self.rows += 1
+        if self._buffered >= self.row_group_rows:
+            self.flush()
+
+    def writerows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self) -> None:
+        if not self._buffered:
+            return
+        batch = pa.record_batch([pa.array(self._columns[n], type=self.schema.field(n).type)
+                                 for n in self.fieldnames], schema=self.schema)
+        self._writer.write_batch(batch, row_group_size=self.row_group_rows)
+        self._columns = {name: [] for name in self.fieldnames}
+        self._buffered = 0
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        self._writer.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_records(path: Path, columns: Optional[List[str]] = None,
+                 batch_size: int = ROW_GROUP_ROWS) -> Iterator[Dict[str, Any]]:
+    """Stream rows as dicts, reading only ``columns`` from disk."""
+    require_pyarrow()
+    pf = pq.ParquetFile(path)
+    if columns is not None:
+        columns = [c for c in columns if c in pf.schema_arrow.names]
+    for batch in pf.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
+
+
+def read_column_values(path: Path, column: str) -> set:
+    require_pyarrow()
+    return set(v for v in pq.read_table(path, columns=[column]).column(column).to_pylist()
+               if v is not None)
+
+
+def schema_names(path: Path) -> List[str]:
+    require_pyarrow()
+    return list(pq.ParquetFile(path).schema_arrow.names)
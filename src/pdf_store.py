@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed store for the downloaded PDFs.
+
+Each distinct PDF is kept once, as ``store/blobs/ab/abcdef….pdf`` named by
+its SHA-256, however many DOIs or rows it was downloaded for.  An SQLite
+index maps every DOI to its blob, so "do we already have this paper?" is a
+DOI lookup and no longer depends on the ``row{idx}`` file names (which
+change whenever ``all_records.csv`` is re-ordered).
+
+The familiar ``pdfs/`` and ``elsevier_pdfs/`` folders become views: hard
+links to the blobs (symlinks where hard links are not possible), so an
+Elsevier PDF that is also a full article takes no extra disk space.
+
+Existing PDFs can be imported once (from the git root's ``src/``):
+
+    python pdf_store.py import ../fulltexts/pdfs ../fulltexts/elsevier_pdfs
+    python pdf_store.py stats
+"""
+from __future__ import annotations
+import argparse
+import csv
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_ROOT = Path("../fulltexts/store")
+RECORDS = "../abstracts/all_records.csv"
+TAG_RE = re.compile(r"^row(\d+)__")
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class PdfStore:
+    """Blob directory plus a thread-safe DOI → SHA-256 index."""
+
+    def __init__(self, root: Path = DEFAULT_ROOT):
+        self.root = Path(root)
+        self.blobs = self.root / "blobs"
+        self.tmp = self.root / "tmp"
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.tmp.mkdir(exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.root / "index.sqlite"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS dois (
+                    doi TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    added TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS dois_by_blob ON dois (sha256);
+            """)
+
+    # ── blobs ────────────────────────────────────────────────────────────────
+    def blob_path(self, sha: str) -> Path:
+        return self.blobs / sha[:2] / f"{sha}.pdf"
+
+    def new_tmp(self) -> Path:
+        """A fresh path inside the store, on the same filesystem as the blobs."""
+        return self.tmp / f"{uuid.uuid4().hex}.pdf"
+
+    def put(self, tmp_path: Path, sha: str) -> Path:
+        """Move a finished download into the store (or drop it if the blob exists)."""
+        blob = self.blob_path(sha)
+        if blob.exists():
+            Path(tmp_path).unlink(missing_ok=True)
+        else:
+            blob.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, blob)
+        return blob
+
+    def view(self, sha: str, view_path: Path) -> None:
+        """Make ``view_path`` show the blob: a hard link, or a symlink as fallback."""
+        blob = self.blob_path(sha)
+        view_path = Path(view_path)
+        try:
+            if os.path.samefile(blob, view_path):
+                return
+        except FileNotFoundError:
+            pass
+        view_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = view_path.with_name(view_path.name + ".link")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(blob, tmp)
+        except OSError:   # other filesystem, or no hard links (e.g. some network mounts)
+            os.symlink(os.path.relpath(blob.resolve(), view_path.parent.resolve()), tmp)
+        os.replace(tmp, view_path)
+
+    def relink(self, sha: str, view_path: Path) -> None:
+        """
+        ``view`` under a new row name, removing the views of the same blob
+        left under older ``row{idx}__`` names of the same title (the row moved
+        when ``all_records.csv`` was re-ordered).
+        """
+        self.view(sha, view_path)
+        for old in self.stale_views(sha, view_path):
+            old.unlink(missing_ok=True)
+
+    def stale_views(self, sha: str, view_path: Path) -> List[Path]:
+        view_path = Path(view_path)
+        title = TAG_RE.sub("", view_path.name)
+        if title == view_path.name:
+            return []
+        stale = []
+        for path in view_path.parent.glob(f"row*__{glob.escape(title)}"):
+            if path.name == view_path.name or TAG_RE.sub("", path.name) != title:
+                continue
+            try:
+                if os.path.samefile(path, self.blob_path(sha)):
+                    stale.append(path)
+            except FileNotFoundError:   # dangling symlink
+                pass
+        return stale
+
+    # ── DOI index ────────────────────────────────────────────────────────────
+    def link(self, doi: str, sha: str, source: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO dois VALUES (?, ?, ?, ?)",
+                              (doi.lower(), sha, source, time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+    def lookup(self, doi: str) -> Optional[Tuple[str, str]]:
+        """``(sha256, source)`` of the PDF stored for ``doi``, if its blob is still there."""
+        with self._lock:
+            row = self.conn.execute("SELECT sha256, source FROM dois WHERE doi = ?",
+                                    (doi.lower(),)).fetchone()
+        if row and self.blob_path(row[0]).exists():
+            return row[0], row[1]
+        return None
+
+    def links(self) -> Dict[str, Tuple[str, str]]:
+        """The whole DOI index: ``doi → (sha256, source)``."""
+        with self._lock:
+            return {d: (sha, src) for d, sha, src in self.conn.execute("SELECT doi, sha256, source FROM dois")}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            dois, distinct = self.conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sha256) FROM dois").fetchone()
+        blobs = list(self.blobs.glob("*/*.pdf"))
+        return {"dois": dois, "indexed_blobs": distinct, "blobs": len(blobs),
+                "bytes": sum(p.stat().st_size for p in blobs)}
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+    # ── migration ────────────────────────────────────────────────────────────
+    def adopt(self, path: Path, sha: str) -> Path:
+        """Store the file at ``path`` (whose SHA-256 is ``sha``) without moving it."""
+        blob = self.blob_path(sha)
+        if not blob.exists():
+            blob.parent.mkdir(exist_ok=True)
+            if _same_device(path, self.blobs):
+                os.link(path, blob)
+            else:
+                _copy(path, blob)
+        return blob
+
+    def import_file(self, path: Path, doi: Optional[str], source: str) -> str:
+        """Adopt an existing PDF: store its content and turn ``path`` into a view."""
+        sha = sha256_file(path)
+        self.adopt(path, sha)
+        self.view(sha, path)
+        if doi:
+            self.link(doi, sha, source)
+        return sha
+
+
+def _same_device(a: Path, b: Path) -> bool:
+    return os.stat(a).st_dev == os.stat(b).st_dev
+
+
+def _copy(src: Path, dst: Path) -> None:
+    tmp = dst.with_name(dst.name + ".tmp")
+    with open(src, "rb") as fin, open(tmp, "wb") as fout:
+        for block in iter(lambda: fin.read(1 << 20), b""):
+            fout.write(block)
+    os.replace(tmp, dst)
+
+
+def row_dois(records_path: str) -> Dict[int, str]:
+    """``row index → doi`` from all_records.csv, for files named ``row{idx}__…``."""
+    if not os.path.exists(records_path):
+        return {}
+    with open(records_path, newline="", encoding="utf-8") as fh:
+        return {i: r.get("doi") or "" for i, r in enumerate(csv.DictReader(fh))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed PDF store.")
+    parser.add_argument("command", choices=["import", "stats"])
+    parser.add_argument("dirs", nargs="*", help="import: folders of row{idx}__*.pdf files")
+    parser.add_argument("--root", default=str(DEFAULT_ROOT))
+    parser.add_argument("--records", default=RECORDS,
+                        help="all_records.csv the row tags of the imported files refer to")
+    args = parser.parse_args()
+
+    store = PdfStore(args.root)
+    if args.command == "import":
+        import D_download_fulltexts as D   # for sanitize_doi
+        dois = row_dois(args.records)
+        n = 0
+        for d in args.dirs:
+            # elsevier_pdfs/ also holds abstract-only PDFs; D keeps those out of pdfs/
+            source = "elsevier_partial" if Path(d).name == "elsevier_pdfs" else "imported"
+            for path in sorted(Path(d).glob("*.pdf")):
+                m = TAG_RE.match(path.name)
+                doi = D.sanitize_doi(dois.get(int(m.group(1)), "")) if m else None
+                known = store.lookup(doi) if doi else None
+                if known and known[1] != "elsevier_partial":
+                    doi = None   # already indexed from pdfs/, just adopt the file
+                store.import_file(path, doi, source)
+                n += 1
+        print(f"Imported {n:,} PDFs")
+    print(store.stats())
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
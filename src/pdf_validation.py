@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+PDF validation stage for D_download_fulltexts.
+
+Checks run cheapest first and stop at the first failure:
+
+1. structure  – a ``%%EOF`` trailer near the end and a cross-reference
+                (``startxref``) section; catches truncated or HTML bodies
+                without parsing anything.  Files are mmapped, not read.
+2. pages      – the document opens in PyMuPDF and has at least ``MIN_PAGES``.
+3. text       – the first ``TEXT_SAMPLE_PAGES`` pages carry on average at
+                least ``MIN_CHARS_PER_PAGE`` characters; publisher "first
+                page" PDFs of just the title and abstract fall below it.
+                Scanned PDFs without a text layer fail here as well.
+
+The page count is filled in even after a failed structure check.  D only
+records ``check`` and keeps every download; whether an Elsevier PDF is a
+full article is decided by its page count alone (``is_full_article``).
+
+Parsing is CPU-bound, so ``Validator`` runs ``validate`` in worker processes
+and hands each result to a callback while the downloads carry on.
+"""
+from __future__ import annotations
+import mmap
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Union
+
+import fitz  # PyMuPDF
+
+import metrics
+
+MIN_PAGES = 2
+MIN_CHARS_PER_PAGE = 500
+TEXT_SAMPLE_PAGES = 5
+TAIL_BYTES = 2048          # %%EOF / startxref live in the last few hundred bytes
+
+Source = Union[bytes, str, Path]
+
+
+def _structure_error(buf) -> str | None:
+    tail = buf[-TAIL_BYTES:]
+    if b"%%EOF" not in tail:
+        return "no_eof"
+    if b"startxref" not in tail:
+        return "no_xref"
+    return None
+
+
+def _open(source: Source):
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(str(source))
+
+
+def _page_count(source: Source):
+    """Pages PyMuPDF finds (it repairs most damaged files), blank if it cannot open it."""
+    try:
+        with _open(source) as doc:
+            return len(doc)
+    except Exception:
+        return ""
+
+
+def validate(source: Source) -> Dict[str, Any]:
+    """
+    Validate a PDF given as bytes or a file path.  Returns ``{"check", "pages",
+    "chars_per_page"}`` where ``check`` is "ok" or the name of the failed check.
+    """
+    result = {"check": "ok", "pages": "", "chars_per_page": ""}
+    try:
+        if isinstance(source, (bytes, bytearray)):
+            error = _structure_error(source)
+        else:
+            with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                error = _structure_error(m)
+    except (OSError, ValueError):   # missing or empty file
+        error = "unreadable"
+    if error:
+        result["check"] = error
+        if error != "unreadable":
+            result["pages"] = _page_count(source)
+        return result
+
+    try:
+        with _open(source) as doc:
+            result["pages"] = len(doc)
+            if len(doc) < MIN_PAGES:
+                result["check"] = "too_few_pages"
+                return result
+            sample = min(len(doc), TEXT_SAMPLE_PAGES)
+            chars = sum(len(doc[i].get_text("text").strip()) for i in range(sample))
+    except Exception:   # PyMuPDF raises a variety of errors on broken files
+        result["check"] = "unreadable"
+        return result
+    result["chars_per_page"] = round(chars / sample)
+    if result["chars_per_page"] < MIN_CHARS_PER_PAGE:
+        result["check"] = "low_text"
+    return result
+
+
+def is_valid(result: Dict[str, Any]) -> bool:
+    return result["check"] == "ok"
+
+
+def is_full_article(result: Dict[str, Any]) -> bool:
+    """
+    D's rule for an Elsevier download: at least ``MIN_PAGES`` pages, as
+    before validation existed.  The other checks are only recorded, the same
+    as for PDFs from every other source.
+    """
+    return result["pages"] != "" and result["pages"] >= MIN_PAGES
+
+
+def timed_validate(source: Source) -> tuple[Dict[str, Any], float]:
+    """``validate`` plus the seconds it took, measured in the worker."""
+    t0 = time.perf_counter()
+    return validate(source), time.perf_counter() - t0
+
+
+class Validator:
+    """
+    Run ``validate`` in ``workers`` processes (0 = inline in the caller) and
+    call ``on_done(result)`` when each file is checked.  Callbacks run in a
+    thread of this process, so they may touch the caller's files and locks.
+    """
+
+    def __init__(self, workers: int = 2):
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+
+    def submit(self, source: Source, on_done: Callable[[Dict[str, Any]], None]) -> Future:
+        if self._pool is None:
+            fut = Future()
+            fut.set_result(timed_validate(source))
+        else:
+            fut = self._pool.submit(timed_validate, source)
+
+        def finish(f: Future) -> None:
+            try:
+                result, seconds = f.result()
+                metrics.METRICS.observe("stage_seconds", seconds, stage="pdf_validation")
+            except Exception as e:   # a crashed worker must not lose the row
+                result = {"check": f"error:{e.__class__.__name__}", "pages": "", "chars_per_page": ""}
+            metrics.METRICS.inc("pdf_checks_total", check=result["check"].split(":")[0])
+            try:
+                on_done(result)
+            except Exception as e:   # concurrent.futures would only log it
+                metrics.METRICS.inc("pdf_check_callback_errors_total", step="on_done")
+                name = source if isinstance(source, (str, Path)) else "in-memory PDF"
+                print(f"[warn] PDF check callback failed for {name}: {e!r}", flush=True)
+        fut.add_done_callback(finish)
+        return fut
+
+    def close(self) -> None:
+        """Wait for every pending validation (and its callback) to finish."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide rate limiting for the OpenAlex harvesters.
+
+OpenAlex allows roughly 200 requests/minute per client.  When several topics
+are harvested at once (``B_download_all_topics.py --workers N``) the old
+per-iterator ``SLEEP_EVERY``/``SLEEP_SECONDS`` pause no longer bounds the
+total request rate, so every worker draws from one shared ``TokenBucket``.
+
+The full-text downloader talks to many different hosts instead, so
+``HostLimiter`` caps the requests in flight per hostname and spaces out
+request starts to the same host.
+
+The metadata APIs each have a budget of their own.  ``AdaptiveLimiter`` is a
+token bucket that is told about every response: a 429/503 halves its rate
+and pauses it for ``Retry-After``; healthy responses raise the rate again,
+step by step, up to the configured budget.  ``PROVIDERS`` holds one per API
+for the whole process, so every script and worker draws from the same one.
+"""
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+OPENALEX_REQUESTS_PER_MINUTE = 200
+# default budgets in requests/minute; override with e.g. ``--rate core=30``
+PROVIDER_BUDGETS = {
+    "openalex": OPENALEX_REQUESTS_PER_MINUTE,
+    "unpaywall": 600,
+    "semantic": 60,
+    "core": 60,
+    "elsevier": 600,
+}
+PROVIDER_HOSTS = {
+    "api.openalex.org": "openalex",
+    "api.unpaywall.org": "unpaywall",
+    "api.semanticscholar.org": "semantic",
+    "api.core.ac.uk": "core",
+    "api.elsevier.com": "elsevier",
+}
+THROTTLE_STATUSES = {429, 503}
+MAX_PAUSE = 600.0      # longest Retry-After honoured in one go, seconds
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens/second, bursts up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float | None = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until ``tokens`` are available, then consume them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def parse_retry_after(value: Optional[str], now: Callable[[], float] = time.time) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter(TokenBucket):
+    """
+    Token bucket that adapts to the server: ``feedback()`` with a throttling
+    status halves the rate (not below ``min_rate``), empties the bucket and
+    pauses every caller for ``Retry-After`` (at most ``MAX_PAUSE``); every
+    other response adds ``max_rate / 50`` back, up to ``max_rate``.
+    """
+
+    def __init__(self, max_rate: float, min_rate: float | None = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        super().__init__(max_rate, clock=clock, sleep=sleep)
+        self.max_rate = max_rate
+        self.min_rate = min_rate if min_rate is not None else max_rate / 16
+        self._paused_until = 0.0
+        self.throttled = 0
+
+    def _refill(self) -> None:
+        # no tokens accrue during a pause, so it does not end in a burst
+        now = self._clock()
+        start = max(self._last, self._paused_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                wait = self._paused_until - self._clock()
+            if wait <= 0:
+                break
+            self._sleep(wait)
+        super().acquire(tokens)
+
+    def feedback(self, status: int, retry_after: Optional[str] = None) -> None:
+        """Adjust the rate after a response with ``status``."""
+        with self._lock:
+            self._refill()
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = 0.0
+                pause = min(MAX_PAUSE, parse_retry_after(retry_after) or 0.0)
+                self._paused_until = max(self._paused_until, self._clock() + pause)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+
+class ProviderLimits:
+    """One ``AdaptiveLimiter`` per API provider, found by provider name or URL."""
+
+    def __init__(self, per_minute: Dict[str, float] = PROVIDER_BUDGETS, **kw):
+        self._kw = kw
+        self._limiters = {name: AdaptiveLimiter(n / 60.0, **kw) for name, n in per_minute.items()}
+
+    def __getitem__(self, provider: str) -> AdaptiveLimiter:
+        return self._limiters[provider]
+
+    def configure(self, provider: str, per_minute: float) -> AdaptiveLimiter:
+        """Replace a provider's limiter with one for a new budget."""
+        self._limiters[provider] = AdaptiveLimiter(per_minute / 60.0, **self._kw)
+        return self._limiters[provider]
+
+    def for_url(self, url: str) -> Optional[AdaptiveLimiter]:
+        provider = PROVIDER_HOSTS.get((urlparse(url).hostname or "").lower())
+        return self._limiters.get(provider) if provider else None
+
+    def report(self) -> Dict[str, str]:
+        """Current rate (requests/minute) and throttle count of every provider."""
+        return {name: f"{60 * lim.rate:.0f}/min of {60 * lim.max_rate:.0f}, "
+                      f"{lim.throttled} throttled"
+                for name, lim in self._limiters.items()}
+
+
+def parse_budgets(specs: Iterable[str]) -> Dict[str, float]:
+    """``["core=30", "semantic=100"]`` → ``{"core": 30.0, "semantic": 100.0}``."""
+    out = {}
+    for spec in specs:
+        name, _, value = spec.partition("=")
+        if name not in PROVIDER_BUDGETS or not value:
+            raise ValueError(f"expected PROVIDER=PER_MINUTE with PROVIDER in "
+                             f"{sorted(PROVIDER_BUDGETS)}, got {spec!r}")
+        out[name] = float(value)
+    return out
+
+
+PROVIDERS = ProviderLimits()   # shared by every script in this process
+
+
+def openalex_bucket(per_minute: float = OPENALEX_REQUESTS_PER_MINUTE) -> AdaptiveLimiter:
+    """One bucket for the whole process, sized to the OpenAlex budget."""
+    return PROVIDERS.configure("openalex", per_minute)
+
+
+class HostLimiter:
+    """
+    Per-hostname politeness: at most ``max_per_host`` requests in flight to
+    one host, and consecutive request starts to that host at least ``delay``
+    seconds apart.  Different hosts never wait for each other.
+    """
+
+    def __init__(self, max_per_host: int = 2, delay: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if max_per_host < 1:
+            raise ValueError("max_per_host must be at least 1")
+        self.max_per_host = max_per_host
+        self.delay = delay
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._next_start: Dict[str, float] = {}
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """Hold one of the URL's host slots for the duration of a request."""
+        host = (urlparse(url).hostname or "").lower()
+        with self._lock:
+            sem = self._slots.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        with sem:
+            with self._lock:
+                now = self._clock()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.delay
+            if start > now:
+                self._sleep(start - now)
+            yield
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Harvest the per-topic CSVs from a local OpenAlex works snapshot.
+
+The OpenAlex snapshot (``aws s3 sync s3://openalex/data/works ...``) is a
+directory of ``updated_date=YYYY-MM-DD/part_NNN.gz`` partitions, each a
+gzipped JSON Lines file with one full work per line.  Walking it needs no
+API calls at all: partitions are spread over ``workers`` processes, each of
+which applies the same rules as the API harvest
+
+* ``make_filter``: primary topic (or any topic) in the wanted set,
+  publication year in ``PUBLICATION_YEARS``, has an abstract, has a DOI;
+* ``REVIEW_FILTER``: open access with full text, and a title containing
+  "review" but not "peer review".  OpenAlex's ``title.search`` is stemmed;
+  ``REVIEW_RE`` accepts the usual inflections (reviews, reviewed, ...);
+
+and returns the matching works already converted by ``extract_row``.  The
+parent appends them to ``T{id}_primary_works.csv`` in partition date order,
+whichever worker finishes first; a work that is already there (from an
+older partition) is appended again and the older row compacted away, as in a
+``--delta`` API harvest, so each topic keeps the newest version of a work.
+
+Finished partitions are recorded in ``abstracts/checkpoints/snapshot_*.json``
+with their size and mtime, so an interrupted run carries on where it
+stopped and a re-run only reads partitions that are new or changed.  Once all
+are done, each topic's high-water mark becomes the newest partition date,
+so later ``--delta`` runs through the API start from there.
+"""
+from __future__ import annotations
+import csv
+import gzip
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import download_openalex_matching as dom
+import metrics
+from json_util import save_json_atomic
+
+SNAPSHOT_DIR = Path("../openalex-snapshot/data/works")
+REVIEW_RE = re.compile(r"\breview(s|ed|ing|er|ers)?\b", re.IGNORECASE)
+PEER_REVIEW_RE = re.compile(r"\bpeer[\s-]*review", re.IGNORECASE)
+LINE_HINT = re.compile(rb"review", re.IGNORECASE)   # lines without it cannot match
+DATE_RE = re.compile(r"updated_date=(\d{4}-\d{2}-\d{2})")
+
+
+# ─────────────────────────── rules ───────────────────────────────────────────
+def is_review_title(title: Optional[str]) -> bool:
+    return bool(title) and bool(REVIEW_RE.search(title)) and not PEER_REVIEW_RE.search(title)
+
+
+def matches(work: Dict[str, Any]) -> bool:
+    """The topic-independent part of ``make_filter`` plus ``REVIEW_FILTER``."""
+    year = work.get("publication_year")
+    first, last = dom.PUBLICATION_YEARS
+    return (isinstance(year, int) and first <= year <= last
+            and bool(work.get("abstract_inverted_index"))
+            and bool(work.get("doi"))
+            and bool((work.get("open_access") or {}).get("is_oa"))
+            and bool(work.get("has_fulltext"))
+            and is_review_title(work.get("display_name") or work.get("title")))
+
+
+# ─────────────────────────── worker ──────────────────────────────────────────
+def scan_partition(path: str, wanted: Dict[str, int], primary_only: bool
+                   ) -> Tuple[int, List[Tuple[int, Dict[str, Any]]], float]:
+    """
+    Worker: ``(lines read, [(topic_id, extract_row(work)), ...], seconds in
+    extract_row)`` for one partition; the parent records the timing, since
+    a worker process's metrics are never exported.
+    """
+    lines, hits, extract_s = 0, [], 0.0
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            lines += 1
+            if not LINE_HINT.search(line):
+                continue
+            work = json.loads(line)
+            if not matches(work):
+                continue
+            tids = dom.route_topic_ids(work, wanted, primary_only)
+            if tids:
+                t0 = time.perf_counter()
+                row = dom.extract_row(work)
+                extract_s += time.perf_counter() - t0
+                hits.extend((tid, row) for tid in tids)
+    return lines, hits, extract_s
+
+
+# ─────────────────────────── inputs / manifest ───────────────────────────────
+def partitions(root: Path) -> List[Path]:
+    return sorted(Path(root).glob("updated_date=*/*.gz"))
+
+
+def snapshot_date(paths: Iterable[Path]) -> Optional[str]:
+    """Newest ``updated_date=`` of the partitions, i.e. how fresh the snapshot is."""
+    dates = [m.group(1) for m in (DATE_RE.search(str(p)) for p in paths) if m]
+    return max(dates, default=None)
+
+
+def manifest_path(primary_only: bool) -> Path:
+    return dom.checkpoint_path(f"snapshot_{'primary' if primary_only else 'any'}")
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open(encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"partitions": {}}
+
+
+def fingerprint(path: Path) -> List[int]:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+# ─────────────────────────── outputs ─────────────────────────────────────────
+class TopicWriters:
+    """Per-topic CSVs opened for append on first use, with their existing IDs."""
+
+    def __init__(self, primary_only: bool):
+        self.primary_only = primary_only
+        self._files, self._writers, self._seen = {}, {}, {}
+
+    def write(self, tid: int, row: Dict[str, Any]) -> bool:
+        """
+        Append ``row``; False if it is a newer version of a work the topic
+        already has, whose older row ``compact_csv`` then has to drop.
+        """
+        if tid not in self._writers:
+            self._open(tid)
+        new = row["openalex_id"] not in self._seen[tid]
+        self._seen[tid].add(row["openalex_id"])
+        self._writers[tid].writerow(row)
+        return new
+
+    def _open(self, tid: int) -> None:
+        out_path = dom.topic_out_path(tid, self.primary_only)
+        exists = out_path.is_file()
+        self._seen[tid] = dom.load_existing_ids(out_path) if exists else set()
+        f = out_path.open("a" if exists else "w", newline="", encoding="utf-8")
+        self._files[tid] = f
+        self._writers[tid] = csv.DictWriter(f, fieldnames=dom.FIELDNAMES)
+        if not exists:
+            self._writers[tid].writeheader()
+
+    def flush(self) -> None:
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+
+# ─────────────────────────── run ─────────────────────────────────────────────
+def harvest(topic_ids: Iterable[int], root: Path = SNAPSHOT_DIR, primary_only: bool = True,
+            workers: int = os.cpu_count() or 1, restart: bool = False) -> Dict[str, Any]:
+    """
+    Scan every new or changed partition under ``root`` and append the
+    matching works to the topic CSVs.  Returns run statistics, with the
+    new works written per topic under ``"topics"`` and the works replaced
+    by a newer version under ``"updated"``.
+    """
+    dom.ABSTRACTS_DIR.mkdir(exist_ok=True)
+    topic_ids = list(topic_ids)
+    wanted = {f"T{t}": t for t in topic_ids}
+    parts = partitions(root)
+    mpath = manifest_path(primary_only)
+    manifest = {"partitions": {}} if restart else load_manifest(mpath)
+    to_compact = set(manifest.get("compact", []))   # left over from an interrupted run
+    todo = [p for p in parts if manifest["partitions"].get(str(p)) != fingerprint(p)]
+    stats = {"partitions": len(parts), "skipped": len(parts) - len(todo), "scanned": 0,
+             "lines": 0, "matched": 0, "written": 0, "updated": 0,
+             "topics": {t: 0 for t in topic_ids}}
+    out = TopicWriters(primary_only)
+    t0 = time.perf_counter()
+
+    def handle(path: Path, result) -> None:
+        lines, hits, extract_s = result
+        stats["scanned"] += 1
+        stats["lines"] += lines
+        stats["matched"] += len(hits)
+        for tid, row in hits:
+            if out.write(tid, row):
+                stats["written"] += 1
+                stats["topics"][tid] += 1
+            else:
+                stats["updated"] += 1
+                to_compact.add(tid)
+        out.flush()   # rows are durable before the partition is marked done
+        manifest["partitions"][str(path)] = fingerprint(path)
+        manifest["compact"] = sorted(to_compact)
+        save_json_atomic(mpath, manifest)
+        metrics.METRICS.inc("snapshot_partitions_total")
+        metrics.METRICS.inc("works_total", lines)
+        if hits:
+            metrics.METRICS.observe("stage_seconds", extract_s, stage="extract_row")
+        metrics.event("partition", path=str(path), works=lines, matches=len(hits))
+        done = stats["skipped"] + stats["scanned"]
+        metrics.log(f"[{done}/{stats['partitions']}] {path.parent.name}/{path.name}: "
+                    f"{lines:,} works, {len(hits)} matches "
+                    f"({stats['lines'] / (time.perf_counter() - t0):,.0f} works/s)")
+
+    try:
+        if workers <= 1:
+            for path in todo:
+                handle(path, scan_partition(str(path), wanted, primary_only))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # results are handled in ``todo`` (partition date) order, so
+                # the newest version of a work is always the last one written
+                running = deque()
+                for path in todo:
+                    running.append((path, pool.submit(scan_partition, str(path), wanted, primary_only)))
+                    while running and (running[0][1].done() or len(running) >= 2 * workers):
+                        path, fut = running.popleft()
+                        handle(path, fut.result())
+                while running:
+                    path, fut = running.popleft()
+                    handle(path, fut.result())
+    finally:
+        out.close()
+
+    for tid in sorted(to_compact):
+        out_path = dom.topic_out_path(tid, primary_only)
+        if out_path.is_file():
+            dom.compact_csv(out_path)
+    if "compact" in manifest:
+        manifest["compact"] = []
+        save_json_atomic(mpath, manifest)
+
+    for tid in topic_ids:   # topics without matches still get their (empty) CSV
+        out_path = dom.topic_out_path(tid, primary_only)
+        if not out_path.is_file():
+            with out_path.open("w", newline="", encoding="utf-8") as f:
+                csv.DictWriter(f, fieldnames=dom.FIELDNAMES).writeheader()
+    day = snapshot_date(parts)
+    if day:
+        for tid in topic_ids:
+            dom.record_high_water_mark(dom.topic_out_path(tid, primary_only), day)
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
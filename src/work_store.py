@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Embedded SQLite store for harvested works.
+
+Instead of one CSV per topic (re-read with pandas on every run to find the
+works already saved), all topics share one database:
+
+* ``works``        one row per ``openalex_id`` with the ``extract_row`` columns
+* ``work_topics``  which topic(s) each work was harvested under
+* ``cursors``      resumable ``next_cursor`` per harvest, committed in the same
+                   transaction as the page's rows
+* ``high_water_marks``  day of the last complete harvest, for delta runs
+* ``works_by_topic``    view joining the two, i.e. the old per-topic CSVs
+
+Existence checks are primary-key lookups, so a work that belongs to several
+topics is downloaded and stored once and only linked to the other topics.
+
+CSV export (from the git root's ``src/``):
+
+    python work_store.py export ../abstracts/all_records.csv
+    python work_store.py export-topics ../abstracts
+"""
+from __future__ import annotations
+import argparse
+import csv
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_PATH = Path("../abstracts/works.sqlite")
+
+
+class WorkStore:
+    """Thread-safe wrapper around one SQLite connection."""
+
+    def __init__(self, path: Path = DEFAULT_PATH, fieldnames: Optional[List[str]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.fieldnames = self._init_schema(fieldnames)
+
+    def _init_schema(self, fieldnames: Optional[List[str]]) -> List[str]:
+        with self._lock, self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS works (openalex_id TEXT PRIMARY KEY)")
+            have = [r[1] for r in self.conn.execute("PRAGMA table_info(works)")]
+            for name in fieldnames or []:
+                if name not in have:
+                    self.conn.execute(f'ALTER TABLE works ADD COLUMN "{name}"')
+                    have.append(name)
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS work_topics (
+                    openalex_id TEXT NOT NULL,
+                    topic_id INTEGER NOT NULL,
+                    mode TEXT NOT NULL,
+                    PRIMARY KEY (topic_id, mode, openalex_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS work_topics_by_work ON work_topics (openalex_id);
+                CREATE TABLE IF NOT EXISTS cursors (
+                    name TEXT PRIMARY KEY, cursor TEXT NOT NULL, rows INTEGER NOT NULL,
+                    started TEXT
+                );
+                CREATE TABLE IF NOT EXISTS high_water_marks (
+                    name TEXT PRIMARY KEY, day TEXT NOT NULL
+                );
+                DROP VIEW IF EXISTS works_by_topic;
+                CREATE VIEW works_by_topic AS
+                    SELECT t.topic_id, t.mode, w.*
+                    FROM work_topics t JOIN works w USING (openalex_id);
+            """)
+            if "started" not in [r[1] for r in self.conn.execute("PRAGMA table_info(cursors)")]:
+                self.conn.execute("ALTER TABLE cursors ADD COLUMN started TEXT")
+        return have
+
+    # ── reads ────────────────────────────────────────────────────────────────
+    def has(self, openalex_id: str) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM works WHERE openalex_id = ?",
+                                     (openalex_id,)).fetchone() is not None
+
+    def count(self, topic_id: Optional[int] = None) -> int:
+        with self._lock:
+            if topic_id is None:
+                return self.conn.execute("SELECT COUNT(*) FROM works").fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM work_topics WHERE topic_id = ?",
+                                     (topic_id,)).fetchone()[0]
+
+    def rows(self, topic_id: Optional[int] = None, mode: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """All works (``topic_id=None``) or the works of one topic, as dicts."""
+        cols = ",".join(f'"{c}"' for c in self.fieldnames)
+        if topic_id is None:
+            sql, args = f"SELECT {cols} FROM works ORDER BY rowid", ()
+        else:
+            sql = f"SELECT {cols} FROM works_by_topic WHERE topic_id = ?"
+            args = (topic_id,)
+            if mode:
+                sql += " AND mode = ?"
+                args += (mode,)
+        cur = self.conn.cursor()
+        with self._lock:
+            cur.execute(sql, args)
+        while True:
+            with self._lock:
+                chunk = cur.fetchmany(1000)
+            if not chunk:
+                return
+            for values in chunk:
+                yield dict(zip(self.fieldnames, values))
+
+    def topics(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT DISTINCT topic_id, mode FROM work_topics ORDER BY topic_id").fetchall()
+
+    # ── writes (committed by commit_page) ────────────────────────────────────
+    def add(self, row: Dict[str, Any], topic_id: int, mode: str, replace: bool = False) -> None:
+        cols = [c for c in self.fieldnames if c in row]
+        col_sql = ",".join(f'"{c}"' for c in cols)
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._lock:
+            self.conn.execute(
+                f"{verb} INTO works ({col_sql}) VALUES ({','.join('?' * len(cols))})",
+                [row[c] for c in cols])
+            self.link(row["openalex_id"], topic_id, mode)
+
+    def link(self, openalex_id: str, topic_id: int, mode: str) -> None:
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO work_topics VALUES (?, ?, ?)",
+                              (openalex_id, topic_id, mode))
+
+    def commit_page(self, name: str, next_cursor: Optional[str], rows: int,
+                    started: Optional[str] = None) -> None:
+        """
+        Commit everything added so far together with the resume cursor and
+        the day the walk started (its future high-water mark).  The
+        connection is shared between threads, so a commit may also include
+        another harvest's uncommitted rows; inserts are idempotent, so that
+        harvest simply skips them when it re-fetches the page after a crash.
+        """
+        with self._lock, self.conn:
+            if next_cursor:
+                self.conn.execute("INSERT OR REPLACE INTO cursors (name, cursor, rows, started) "
+                                  "VALUES (?, ?, ?, ?)", (name, next_cursor, rows, started))
+            else:
+                self.conn.execute("DELETE FROM cursors WHERE name = ?", (name,))
+
+    def resume(self, name: str) -> Tuple[str, int, Optional[str]]:
+        """``(cursor, rows, started)``; ``("*", 0, None)`` when there is nothing to resume."""
+        with self._lock:
+            row = self.conn.execute("SELECT cursor, rows, started FROM cursors WHERE name = ?",
+                                    (name,)).fetchone()
+        if row is None:
+            return "*", 0, None
+        print(f"[info] Resuming {name} after {row[1]:,} rows")
+        return row[0], row[1], row[2]
+
+    def high_water_mark(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT day FROM high_water_marks WHERE name = ?",
+                                    (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_high_water_mark(self, name: str, day: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO high_water_marks VALUES (?, ?)", (name, day))
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+    # ── CSV export ───────────────────────────────────────────────────────────
+    def export_csv(self, out_path: Path, topic_id: Optional[int] = None,
+                   mode: Optional[str] = None) -> int:
+        n = 0
+        with Path(out_path).open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writeheader()
+            for row in self.rows(topic_id, mode):
+                writer.writerow(row)
+                n += 1
+        return n
+
+    def export_topic_csvs(self, out_dir: Path) -> int:
+        """Recreate the ``T{id}_{mode}_works.csv`` files C_combine_csvs expects."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for topic_id, mode in self.topics():
+            self.export_csv(out_dir / f"T{topic_id}_{mode}_works.csv", topic_id, mode)
+        return len(self.topics())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export works from the SQLite work store.")
+    parser.add_argument("command", choices=["export", "export-topics", "count"])
+    parser.add_argument("out", nargs="?", help="CSV file (export) or directory (export-topics)")
+    parser.add_argument("--db", default=str(DEFAULT_PATH))
+    parser.add_argument("--topic", type=int, help="Only export this topic")
+    args = parser.parse_args()
+
+    store = WorkStore(args.db)
+    if args.command == "count":
+        print(f"{store.count(args.topic):,} works")
+    elif args.command == "export":
+        n = store.export_csv(args.out, args.topic)
+        print(f"Wrote {n:,} works → {args.out}")
+    else:
+        n = store.export_topic_csvs(args.out)
+        print(f"Wrote {n} topic files → {args.out}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Tests for the page checkpoints of the OpenAlex harvest: resuming an
+interrupted cursor walk and the high-water mark it records.
+"""
+import unittest
+import sys
+import os
+import csv
+import tempfile
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import download_openalex_matching as dom
+import metrics
+
+
+def work(n, topic=1):
+    return {
+        "id": f"https://openalex.org/W{n}", "display_name": f"Review {n}",
+        "doi": f"https://doi.org/10.1/{n}", "publication_year": 2020,
+        "primary_topic": {"id": f"https://openalex.org/T{topic}"},
+        "topics": [{"id": f"https://openalex.org/T{topic}", "score": 0.9}],
+        "abstract_inverted_index": {"Sea": [0], "ice": [1]},
+    }
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+        self.content = b"{}"
+
+    def json(self):
+        return self.data
+
+
+class FakeOpenAlex:
+    """Serves ``pages`` by cursor: "*" is page 0, "c<i>" is page i."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.cursors = []
+
+    def get(self, url, limiter=None, **kw):
+        cursor = parse_qs(urlparse(url).query)["cursor"][0]
+        self.cursors.append(cursor)
+        i = 0 if cursor == "*" else int(cursor[1:])
+        nxt = f"c{i + 1}" if i + 1 < len(self.pages) else None
+        return FakeResponse({"results": self.pages[i], "meta": {"next_cursor": nxt}})
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_after(n):
+    """An ``extract_row`` that fails on its ``n + 1``-th call."""
+    real, calls = dom.extract_row, []
+
+    def extract(work):
+        calls.append(work["id"])
+        if len(calls) > n:
+            raise Crash(work["id"])
+        return real(work)
+    return extract
+
+
+class TestCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        patcher = mock.patch.object(dom, "ABSTRACTS_DIR", self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def ids(self, path):
+        with path.open(newline="", encoding="utf-8") as f:
+            return [row["openalex_id"] for row in csv.DictReader(f)]
+
+    def test_killed_walk_resumes_without_duplicates(self):
+        api = FakeOpenAlex([[work(1), work(2), work(3)], [work(4), work(5), work(6)], [work(7)]])
+        out_path = dom.topic_out_path(1, True)
+        with mock.patch.object(dom, "openalex_get", api.get):
+            with mock.patch.object(dom, "extract_row", crash_after(4)):
+                with self.assertRaises(Crash):
+                    dom.download_topic(1, primary_only=True)
+            # W4 of the interrupted second page reached the file
+            self.assertEqual(self.ids(out_path)[-1], "https://openalex.org/W4")
+            api.cursors.clear()
+            self.assertEqual(dom.download_topic(1, primary_only=True), 4)
+        self.assertEqual(api.cursors, ["c1", "c2"])
+        self.assertEqual(self.ids(out_path), [f"https://openalex.org/W{n}" for n in range(1, 8)])
+        self.assertFalse(dom.checkpoint_path(out_path.stem).exists())
+
+    def test_killed_batch_resumes_without_duplicates(self):
+        api = FakeOpenAlex([[work(1, 1), work(2, 2)], [work(3, 2), work(4, 1), work(5, 2)],
+                            [work(6, 1)]])
+        with mock.patch.object(dom, "openalex_get", api.get):
+            with mock.patch.object(dom, "extract_row", crash_after(4)):
+                with self.assertRaises(Crash):
+                    dom.download_topic_batch([1, 2], primary_only=True)
+            self.assertEqual(dom.download_topic_batch([1, 2], primary_only=True), {1: 2, 2: 2})
+        self.assertEqual(self.ids(dom.topic_out_path(1, True)),
+                         [f"https://openalex.org/W{n}" for n in (1, 4, 6)])
+        self.assertEqual(self.ids(dom.topic_out_path(2, True)),
+                         [f"https://openalex.org/W{n}" for n in (2, 3, 5)])
+
+    def test_progress_counts_works_only(self):
+        bar = mock.MagicMock()
+        bar.__enter__.return_value = bar
+        items = [1, 2, dom.PageEnd("c1"), 3, dom.PageEnd(None)]
+        with mock.patch.object(dom, "tqdm", return_value=bar):
+            self.assertEqual(list(dom.progress(iter(items), "x")), items)
+        self.assertEqual(bar.update.call_count, 3)
+
+    def test_full_run_ignores_an_interrupted_delta_checkpoint(self):
+        api = FakeOpenAlex([[work(1), work(2)], [work(3), work(4)], [work(5)]])
+        out_path = dom.topic_out_path(1, True)
+        with mock.patch.object(dom, "openalex_get", api.get):
+            with mock.patch.object(dom, "extract_row", crash_after(3)):
+                with self.assertRaises(Crash):
+                    dom.download_topic(1, primary_only=True, since="2024-01-01")
+            api.cursors.clear()
+            self.assertEqual(dom.download_topic(1, primary_only=True), 3)
+        self.assertEqual(api.cursors, ["*", "c1", "c2"])
+        self.assertEqual(self.ids(out_path), [f"https://openalex.org/W{n}" for n in range(1, 6)])
+
+    def test_batch_checkpoint_is_keyed_by_date_field(self):
+        api = FakeOpenAlex([[work(1, 1), work(2, 2)], [work(3, 2)]])
+        with mock.patch.object(dom, "openalex_get", api.get):
+            with mock.patch.object(dom, "extract_row", crash_after(2)):
+                with self.assertRaises(Crash):
+                    dom.download_topic_batch([1, 2], primary_only=True, since="2024-01-01")
+            api.cursors.clear()
+            dom.download_topic_batch([1, 2], primary_only=True, since="2024-01-01",
+                                     date_field="updated")
+        self.assertEqual(api.cursors, ["*", "c1"])
+
+    def test_extract_row_is_timed_per_page(self):
+        registry = metrics.Metrics()
+        items = [work(1), work(2), dom.PageEnd("c1"), dom.PageEnd("c2"), work(3), dom.PageEnd(None)]
+        with mock.patch.object(metrics, "METRICS", registry):
+            out = list(dom.extract_rows(iter(items)))
+        rows = [o[1]["openalex_id"] for o in out if isinstance(o, tuple)]
+        self.assertEqual(rows, [f"https://openalex.org/W{n}" for n in (1, 2, 3)])
+        (h,) = registry.snapshot()["histograms"]
+        self.assertEqual((h["labels"], h["count"]), ({"stage": "extract_row"}, 2))
+
+    def test_resumed_walk_keeps_its_start_day(self):
+        api = FakeOpenAlex([[work(1), work(2)], [work(3), work(4)]])
+        out_path = dom.topic_out_path(1, True)
+        with mock.patch.object(dom, "openalex_get", api.get):
+            with mock.patch.object(dom, "today", return_value="2024-01-01"), \
+                    mock.patch.object(dom, "extract_row", crash_after(3)):
+                with self.assertRaises(Crash):
+                    dom.download_topic(1, primary_only=True)
+            self.assertIsNone(dom.high_water_mark(out_path))
+            with mock.patch.object(dom, "today", return_value="2024-01-05"):
+                dom.download_topic(1, primary_only=True)
+        # works created between the start and the resume are found by the next delta
+        self.assertEqual(dom.high_water_mark(out_path), "2024-01-01")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for the deduplicating topic-file merge in C_combine_csvs.
+"""
+import unittest
+import sys
+import os
+import csv
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import C_combine_csvs as combine
+
+
+def write_csv(path, fields, rows):
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class TestCombineCsvs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        d = Path(self.tmp.name)
+        self.a = d / "T1_any_works.csv"
+        self.b = d / "T2_any_works.csv"
+        write_csv(self.a, ["openalex_id", "title"], [
+            {"openalex_id": "https://openalex.org/W1", "title": "one"},
+            {"openalex_id": "https://openalex.org/W2", "title": "two"},
+        ])
+        write_csv(self.b, ["openalex_id", "title", "doi"], [
+            {"openalex_id": "https://openalex.org/W2", "title": "two again", "doi": "10.1/x"},
+            {"openalex_id": "https://openalex.org/W3", "title": "three", "doi": ""},
+            {"openalex_id": "", "title": "no id", "doi": ""},
+        ])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_work_key_is_the_numeric_id(self):
+        self.assertEqual(combine.work_key("https://openalex.org/W2741809807"), 2741809807)
+        self.assertEqual(combine.work_key("W7"), 7)
+        self.assertEqual(combine.work_key("odd-id"), "odd-id")
+        self.assertEqual(combine.work_key(""), "")
+
+    def test_merge_keeps_first_copy_of_each_work(self):
+        fields = combine.merge_fields([self.a, self.b])
+        self.assertEqual(fields, ["openalex_id", "title", "doi"])
+        for workers in (1, 2):
+            out = []
+            stats = combine.merge([self.a, self.b], out.append, fields, workers)
+            self.assertEqual([v[1] for v in out], ["one", "two", "three", "no id"])
+            self.assertEqual(out[0], ["https://openalex.org/W1", "one", ""])
+            self.assertEqual(stats, {"files": 2, "rows_read": 5,
+                                     "duplicates": 1, "rows_written": 4})
+
+    def test_incremental_merge_matches_full_rebuild(self):
+        out = Path(self.tmp.name) / "all_records.csv"
+        fields = combine.merge_fields([self.a, self.b])
+        write_csv(self.b, fields, [
+            {"openalex_id": "https://openalex.org/W2", "title": "two again", "doi": "10.1/x"},
+            {"openalex_id": "https://openalex.org/W3", "title": "three", "doi": ""},
+        ])
+        combine.full_merge([self.a, self.b], out, fields, "csv", 1)
+        # T1 loses W2 (still listed in T2) and gains W4; T3 is new
+        write_csv(self.a, ["openalex_id", "title"], [
+            {"openalex_id": "https://openalex.org/W1", "title": "one v2"},
+            {"openalex_id": "https://openalex.org/W4", "title": "four"},
+        ])
+        c = Path(self.tmp.name) / "T3_any_works.csv"
+        write_csv(c, ["openalex_id", "title"], [{"openalex_id": "W5", "title": "five"}])
+        inputs = [self.a, self.b, c]
+
+        stats = combine.incremental_merge(inputs, out, "csv", 1, combine.load_manifest(out))
+        self.assertEqual((stats["files"], stats["unchanged"], stats["rows_dropped"]), (2, 1, 2))
+        titles = sorted(v[1] for _, v in combine.read_output(out, fields))
+        self.assertEqual(titles, ["five", "four", "one v2", "three", "two again"])
+
+        stats = combine.incremental_merge(inputs, out, "csv", 1, combine.load_manifest(out))
+        self.assertEqual((stats["files"], stats["unchanged"]), (0, 3))
+
+    def test_rescan_does_not_repeat_rows_without_id(self):
+        out = Path(self.tmp.name) / "all_records.csv"
+        fields = combine.merge_fields([self.a, self.b])
+        combine.full_merge([self.a, self.b], out, fields, "csv", 1)
+        # W2 came from T1; dropping T1's copy re-reads it from the unchanged T2
+        write_csv(self.a, ["openalex_id", "title"], [
+            {"openalex_id": "https://openalex.org/W1", "title": "one"},
+        ])
+        combine.incremental_merge([self.a, self.b], out, "csv", 1, combine.load_manifest(out))
+        titles = sorted(v[1] for _, v in combine.read_output(out, fields))
+        self.assertEqual(titles, ["no id", "one", "three", "two again"])
+
+    def test_header_change_needs_full_rebuild(self):
+        out = Path(self.tmp.name) / "all_records.csv"
+        combine.full_merge([self.a], out, combine.merge_fields([self.a]), "csv", 1)
+        self.assertIsNone(combine.incremental_merge([self.a, self.b], out, "csv", 1,
+                                                    combine.load_manifest(out)))
+
+
+if __name__ == '__main__':
+    unittest.main()
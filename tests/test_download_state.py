@@ -0,0 +1,73 @@
+"""
+Tests for the per-DOI download state and its retry backoff.
+"""
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import download_state
+from download_state import DAY, DownloadState, backoff
+
+
+class TestDownloadState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.now = 1_000_000.0
+        self.state = DownloadState(Path(self.tmp.name) / "state.sqlite", clock=lambda: self.now)
+
+    def tearDown(self):
+        self.state.close()
+        self.tmp.cleanup()
+
+    def test_backoff_doubles_up_to_cap(self):
+        self.assertEqual([backoff(n) / DAY for n in (1, 2, 3)], [1, 2, 4])
+        self.assertEqual(backoff(20), download_state.BACKOFF_MAX)
+
+    def test_failed_doi_is_due_after_backoff(self):
+        self.assertTrue(self.state.due("10.1/a"))
+        status = self.state.record("10.1/A", {"unpaywall": "404"}, success=False)
+        self.assertEqual(status, "failed")
+        self.assertFalse(self.state.due("10.1/a"))
+        self.now += DAY
+        self.assertTrue(self.state.due("10.1/a"))
+        self.state.record("10.1/a", {"unpaywall": "200"}, success=True)
+        self.assertFalse(self.state.due("10.1/a"))
+        self.assertIsNone(self.state.next_retry("10.1/a"))
+
+    def test_gives_up_after_max_attempts(self):
+        for _ in range(download_state.MAX_ATTEMPTS):
+            status = self.state.record("10.1/a", {}, success=False)
+        self.assertEqual(status, "gave_up")
+        self.now += download_state.BACKOFF_MAX
+        self.assertFalse(self.state.due("10.1/a"))
+        self.assertEqual(self.state.reset(status="gave_up"), 1)
+        self.assertTrue(self.state.due("10.1/a"))
+
+    def test_summary_counts_pending(self):
+        self.state.record("10.1/a", {}, success=True)
+        self.state.record("10.1/b", {}, success=False)
+        self.state.record("10.1/c", {}, success=False)
+        self.now += DAY
+        self.state.record("10.1/c", {}, success=False)   # now waits two days
+        summary = self.state.summary(["10.1/a", "10.1/b", "10.1/c", "10.1/new", ""])
+        self.assertEqual(summary["done"], 1)
+        self.assertEqual(summary["failed"], 2)
+        self.assertEqual(summary["due_now"], 1)
+        self.assertEqual(summary["new"], 1)
+        self.assertEqual(summary["pending"], 2)
+
+    def test_provider_outcomes_keep_latest(self):
+        self.state.record("10.1/a", {"elsevier": "404", "core": "no_pdf"}, success=False)
+        self.state.record("10.1/a", {"elsevier": "200"}, success=True)
+        self.state.record("10.1/b", {"elsevier": "404"}, success=False)
+        self.assertEqual(self.state.provider_summary(),
+                         {"elsevier": {"200": 1, "404": 1}, "core": {"no_pdf": 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
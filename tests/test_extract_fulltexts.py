@@ -0,0 +1,99 @@
+"""
+Tests for the incremental PDF text extraction stage.
+"""
+import unittest
+import sys
+import os
+import csv
+import gzip
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import E_extract_fulltexts as E
+
+
+def write_pdf(path, texts):
+    doc = fitz.open()
+    for text in texts:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class TestExtractFulltexts(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.pdfs, self.out = root / "pdfs", root / "text"
+        self.pdfs.mkdir()
+        first = write_pdf(self.pdfs / "row000__First.pdf", ["page one", "page two"])
+        second = write_pdf(self.pdfs / "row001__Second.pdf", ["other paper"])
+        (self.pdfs / "row002__Broken.pdf").write_bytes(b"%PDF-1.4 truncated")
+        self.ids = {"10.1/a": "https://openalex.org/W1", "10.1/b": "https://openalex.org/W2"}
+        self.checks = {first: ("10.1/A", True), second: ("10.1/b", True)}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_extracts_pages_keyed_by_ids_and_logs_failures(self):
+        stats = E.run([self.pdfs], self.out, self.ids, self.checks, workers=1)
+        self.assertEqual((stats["extracted"], stats["failed"], stats["pages"]), (2, 1, 3))
+        docs = {d["file"]: d for d in E.iter_documents(self.out)}
+        first = docs["row000__First.pdf"]
+        self.assertEqual((first["openalex_id"], first["doi"]), ("https://openalex.org/W1", "10.1/A"))
+        self.assertEqual([p.strip() for p in first["pages"]], ["page one", "page two"])
+        failures = (self.out / "failures.jsonl").read_text().splitlines()
+        self.assertEqual(json.loads(failures[0])["file"], str(self.pdfs / "row002__Broken.pdf"))
+
+    def test_second_run_only_extracts_changed_pdfs(self):
+        E.run([self.pdfs], self.out, self.ids, self.checks, workers=1)
+        write_pdf(self.pdfs / "row001__Second.pdf", ["other paper, revised", "appendix"])
+        stats = E.run([self.pdfs], self.out, self.ids, self.checks, workers=2)
+        self.assertEqual((stats["extracted"], stats["skipped"], stats["failed"]), (1, 2, 0))
+        docs = {d["file"]: d for d in E.iter_documents(self.out)}
+        self.assertEqual(len(docs), 2)
+        self.assertEqual(len(docs["row001__Second.pdf"]["pages"]), 2)
+
+    def test_shards_are_size_bounded(self):
+        E.run([self.pdfs], self.out, self.ids, self.checks, workers=1, shard_bytes=1)
+        shards = sorted(p.name for p in self.out.glob("text-*.jsonl.gz"))
+        self.assertEqual(shards, ["text-00000.jsonl.gz", "text-00001.jsonl.gz"])
+        with gzip.open(self.out / shards[0], "rt") as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_pdfs_are_keyed_by_recorded_doi_and_partials_skipped(self):
+        renamed = write_pdf(self.pdfs / "row999__Renamed.pdf", ["moved to another row"])
+        abstract = write_pdf(self.pdfs / "row003__Abstract.pdf", ["abstract only"])
+        stats_csv = Path(self.tmp.name) / "scraping_stats.csv"
+        with stats_csv.open("w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=["tag", "doi", "pdf_sha256", "pdf_pages", "pdf_check"])
+            writer.writeheader()
+            writer.writerow({"tag": "row000", "doi": "10.1/a", "pdf_sha256": renamed,
+                             "pdf_pages": "3", "pdf_check": "ok"})
+            writer.writerow({"tag": "row003", "doi": "10.1/c", "pdf_sha256": abstract,
+                             "pdf_pages": "1", "pdf_check": "ok"})
+        checks = E.load_pdf_checks(stats_csv)
+        self.assertEqual(checks[abstract], ("10.1/c", False))
+        stats = E.run([self.pdfs], self.out, self.ids, checks, workers=2)
+        self.assertEqual(stats["partial"], 1)
+        docs = {d["file"]: d for d in E.iter_documents(self.out)}
+        self.assertNotIn("row003__Abstract.pdf", docs)
+        self.assertEqual(docs["row999__Renamed.pdf"]["openalex_id"], "https://openalex.org/W1")
+        # not re-read until it changes
+        self.assertEqual(E.run([self.pdfs], self.out, self.ids, checks, workers=1)["partial"], 0)
+
+    def test_load_ids_matches_doi_urls(self):
+        records = Path(self.tmp.name) / "all_records.csv"
+        records.write_text("openalex_id,doi\nhttps://openalex.org/W5,https://doi.org/10.1/ABC\n")
+        self.assertEqual(E.load_ids(str(records)), {"10.1/abc": "https://openalex.org/W5"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for sharding the full-text run and merging the shards back.
+"""
+import unittest
+import sys
+import os
+import csv
+import hashlib
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import D_download_fulltexts as D
+import merge_fulltext_shards as M
+from download_state import DownloadState
+from pdf_store import PdfStore
+
+
+class TestFulltextShards(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_shard(self, i, n, doi, tag, body, clock):
+        shard = self.root / f"shard-{i}-of-{n}"
+        (shard / "pdfs").mkdir(parents=True)
+        with (shard / "scraping_stats.csv").open("w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=D.FIELDNAMES)
+            writer.writeheader()
+            writer.writerow({"tag": tag, "doi": doi, "success": "True"})
+        store = PdfStore(shard / "store")
+        sha = hashlib.sha256(body).hexdigest()
+        tmp = store.new_tmp()
+        tmp.write_bytes(body)
+        store.put(tmp, sha)
+        store.link(doi, sha, "unpaywall")
+        store.view(sha, shard / "pdfs" / f"{tag}.pdf")
+        store.close()
+        state = DownloadState(shard / "download_state.sqlite", clock=lambda: clock)
+        state.record(doi, {"unpaywall": "pdf"}, success=True)
+        state.close()
+        return shard, sha
+
+    def test_shard_is_stable_and_covers_every_doi(self):
+        dois = [f"10.1000/x{i}" for i in range(200)]
+        owners = [[s for s in range(4) if D.shard_of(d, 4) == s] for d in dois]
+        self.assertTrue(all(len(o) == 1 for o in owners))
+        self.assertEqual(len({o[0] for o in owners}), 4)
+        # same shard whatever the DOI's spelling
+        self.assertEqual(D.shard_of("https://doi.org/10.1000/X7", 4), D.shard_of("10.1000/x7", 4))
+
+    def test_parse_shard(self):
+        self.assertEqual(D.parse_shard("2/8"), (2, 8))
+        for bad in ("8/8", "2", "a/4", "-1/4", "1/0"):
+            with self.assertRaises(ValueError):
+                D.parse_shard(bad)
+
+    def test_merge_is_idempotent(self):
+        a, sha_a = self.make_shard(0, 2, "10.1/a", "row3__10.1_a", b"%PDF-1.7 a", 1000.0)
+        b, sha_b = self.make_shard(1, 2, "10.1/b", "row1__10.1_b", b"%PDF-1.7 b", 2000.0)
+        out = self.root / "merged"
+        out.mkdir()
+        self.assertEqual(M.shard_dirs(self.root), [a, b])
+        for added in (2, 0):
+            self.assertEqual(M.merge_stats([a, b], out / "scraping_stats.csv"), added)
+            store = PdfStore(out / "store")
+            state = DownloadState(out / "download_state.sqlite")
+            for shard in (a, b):
+                self.assertEqual(M.merge_pdfs(shard, store, out), 1)
+                state.merge(shard / "download_state.sqlite")
+            self.assertEqual(store.links(), {"10.1/a": (sha_a, "unpaywall"),
+                                             "10.1/b": (sha_b, "unpaywall")})
+            self.assertEqual(store.stats()["blobs"], 2)
+            self.assertEqual(state.summary()["done"], 2)
+            store.close()
+            state.close()
+            rows = M.read_stats(out / "scraping_stats.csv")
+            self.assertEqual([r["tag"] for r in rows], ["row1__10.1_b", "row3__10.1_a"])
+        self.assertEqual((out / "pdfs" / "row3__10.1_a.pdf").read_bytes(), b"%PDF-1.7 a")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests for the per-host circuit breaker and adaptive timeouts.
+"""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from host_health import HostHealth, percentile
+
+URL = "https://slow.example.org/paper.pdf"
+
+
+class TestHostHealth(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.health = HostHealth(failures=3, cooldown=60, max_cooldown=200,
+                                 min_samples=3, factor=4, min_timeout=2,
+                                 clock=lambda: self.now)
+
+    def test_percentile(self):
+        self.assertEqual(percentile(range(1, 101), 0.95), 95)
+        self.assertEqual(percentile([7.0], 0.95), 7.0)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.assertTrue(self.health.allow(URL))
+            self.health.failure(URL)
+        self.health.success(URL, 0.5)          # resets the count
+        for _ in range(3):
+            self.assertTrue(self.health.allow(URL))
+            self.health.failure(URL)
+        self.assertFalse(self.health.allow("http://SLOW.example.org/other"))
+        self.assertTrue(self.health.allow("https://fine.example.org/"))
+        self.assertEqual(self.health.retry_in(URL), 60)
+
+    def test_probe_after_cooldown(self):
+        for _ in range(3):
+            self.health.allow(URL)
+            self.health.failure(URL)
+        self.now = 60
+        self.assertTrue(self.health.allow(URL))     # the probe
+        self.assertFalse(self.health.allow(URL))    # only one at a time
+        self.health.failure(URL)
+        self.assertEqual(self.health.retry_in(URL), 120)   # cooldown doubled
+        self.now = 180
+        self.assertTrue(self.health.allow(URL))
+        self.health.success(URL, 1.0)
+        self.assertTrue(self.health.allow(URL))
+        report = self.health.report()[0]
+        self.assertEqual((report["trips"], report["skipped"], report["open"]), (2, 1, False))
+
+    def test_timeout_follows_latency(self):
+        self.assertEqual(self.health.timeout(URL, 40), 40)   # too few samples
+        for latency in (0.2, 0.3, 1.5):
+            self.health.success(URL, latency)
+        self.assertEqual(self.health.timeout(URL, 40), 6.0)
+        self.health.success(URL, 0.1)
+        self.assertEqual(self.health.timeout(URL, 40), 6.0)
+        for _ in range(3):
+            self.health.failure(URL, latency=20)             # timeouts raise it again
+        self.assertEqual(self.health.timeout(URL, 40), 40)
+        fast = "https://fast.example.org/"
+        for _ in range(3):
+            self.health.success(fast, 0.01)
+        self.assertEqual(self.health.timeout(fast, 40), 2)   # min_timeout
+
+
+if __name__ == '__main__':
+    unittest.main()
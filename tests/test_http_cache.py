@@ -0,0 +1,95 @@
+"""
+Tests for the SQLite HTTP response cache used by D_download_fulltexts.
+"""
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import D_download_fulltexts as D
+from http_cache import TOUCH_INTERVAL, HttpCache, normalize_url
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.cache = HttpCache(Path(self.tmp.name) / "cache.sqlite", ttl=100,
+                               negative_ttl=10, max_bytes=1000, clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_normalize_url_drops_contact_params_and_sorts_query(self):
+        a = normalize_url("HTTPS://API.Unpaywall.org/v2/10.1/x?email=me@x.org&b=2&a=1#frag")
+        b = normalize_url("https://api.unpaywall.org/v2/10.1/x?a=1&b=2&email=you@y.org")
+        self.assertEqual(a, b)
+        self.assertEqual(a, "https://api.unpaywall.org/v2/10.1/x?a=1&b=2")
+
+    def test_fresh_then_stale_with_validators(self):
+        self.cache.put("https://a.org/x", 200, b'{"k": 1}', etag='"v1"')
+        entry = self.cache.get("https://a.org/x")
+        self.assertTrue(entry.fresh)
+        self.assertEqual(entry.body, b'{"k": 1}')
+        self.clock.now += 101
+        entry = self.cache.get("https://a.org/x")
+        self.assertFalse(entry.fresh)
+        self.assertEqual(entry.validators(), {"If-None-Match": '"v1"'})
+        self.cache.revalidated("https://a.org/x")
+        self.assertTrue(self.cache.get("https://a.org/x").fresh)
+
+    def test_negative_results_expire_sooner_and_errors_are_not_cached(self):
+        self.assertTrue(self.cache.put("https://a.org/missing", 404, b"not found"))
+        self.assertFalse(self.cache.put("https://a.org/busy", 503, b"later"))
+        entry = self.cache.get("https://a.org/missing")
+        self.assertEqual((entry.status, entry.body, entry.fresh), (404, b"", True))
+        self.assertIsNone(self.cache.get("https://a.org/busy"))
+        self.clock.now += 11
+        self.assertFalse(self.cache.get("https://a.org/missing").fresh)
+
+    def test_lru_eviction_keeps_recently_used(self):
+        for i in range(3):
+            self.clock.now += 1
+            self.cache.put(f"https://a.org/{i}", 200, b"x" * 300)
+        self.clock.now += 1
+        self.cache.get("https://a.org/1")          # too soon to count as a new use
+        self.clock.now += TOUCH_INTERVAL
+        self.cache.get("https://a.org/0")          # 0 is now the most recently used
+        self.clock.now += 1
+        self.cache.put("https://a.org/3", 200, b"x" * 300)   # 1200 bytes > 1000
+        kept = [i for i in range(4) if self.cache.get(f"https://a.org/{i}") is not None]
+        self.assertEqual(kept, [0, 2, 3])
+        self.assertEqual(self.cache.stats["evicted"], 1)
+
+    def test_fetch_json_serves_stale_entry_when_revalidation_fails(self):
+        url = "https://api.openalex.org/works/doi:10.1/x"
+        self.cache.put(url, 200, b'{"id": "W1"}', etag='"v1"')
+        self.clock.now += 101
+        with mock.patch.object(D, "CACHE", self.cache), \
+                mock.patch.object(D, "request", side_effect=requests.ConnectionError("down")):
+            self.assertEqual(D.fetch_json(url), {"id": "W1"})
+            self.assertIsNone(D.fetch_json(url + "/uncached"))
+        gone = requests.Response()
+        gone.status_code, gone._content = 404, b""
+        with mock.patch.object(D, "CACHE", self.cache), \
+                mock.patch.object(D, "request", return_value=gone):
+            self.assertIsNone(D.fetch_json(url))
+
+if __name__ == '__main__':
+    unittest.main()
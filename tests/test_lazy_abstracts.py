@@ -0,0 +1,84 @@
+"""
+Tests for field projection and the lazy abstract lookups of the OpenAlex
+harvest, against a mocked ``openalex_get``.
+"""
+import unittest
+import sys
+import os
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import download_openalex_matching as dom
+
+
+def wid(n):
+    return f"https://openalex.org/W{n}"
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class AbstractLookups:
+    """Answers ``ids.openalex:`` lookups; works in ``missing`` are not returned."""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.batches, self.selects = [], set()
+
+    def get(self, url, limiter=None, **kw):
+        query = parse_qs(urlparse(url).query)
+        self.selects.add(query["select"][0])
+        ids = query["filter"][0].split(":", 1)[1].split("|")
+        self.batches.append(ids)
+        return FakeResponse({"results": [
+            {"id": f"https://openalex.org/{i}", "abstract_inverted_index": {i: [0]}}
+            for i in ids if i not in self.missing]})
+
+
+class TestLazyAbstracts(unittest.TestCase):
+
+    def test_harvest_select(self):
+        self.assertIsNone(dom.harvest_select())
+        self.assertEqual(dom.harvest_select(projected=True), dom.SELECT_FIELDS)
+        for projected in (False, True):
+            select = dom.harvest_select(projected, lazy_abstracts=True)
+            self.assertEqual(select + ["abstract_inverted_index"], dom.SELECT_FIELDS)
+        self.assertIn("select=id,display_name,", dom.works_url("x", select=dom.SELECT_FIELDS))
+
+    def test_fetch_abstracts_splits_into_batches(self):
+        api = AbstractLookups(missing={"W150"})
+        ids = [wid(n) for n in range(1, 251)]
+        with mock.patch.object(dom, "openalex_get", api.get):
+            abstracts = dom.fetch_abstracts(ids)
+        self.assertEqual([len(b) for b in api.batches], [dom.MAX_OR_VALUES, dom.MAX_OR_VALUES, 50])
+        self.assertEqual(api.batches[1][0], "W101")
+        self.assertEqual(api.selects, {"id,abstract_inverted_index"})
+        self.assertEqual(len(abstracts), 249)
+        self.assertEqual(abstracts[wid(7)], {"W7": [0]})
+        self.assertNotIn(wid(150), abstracts)
+
+    def test_attach_abstracts_fills_each_page_before_its_marker(self):
+        api = AbstractLookups(missing={"W3"})
+        works = [{"id": wid(1)}, {"id": wid(2)}, dom.PageEnd("c1"), {"id": wid(3)}, {"id": wid(4)},
+                 {"id": wid(5)}, dom.PageEnd(None)]
+        with mock.patch.object(dom, "openalex_get", api.get):
+            out = list(dom.attach_abstracts(iter(works), batch_size=2))
+        self.assertEqual(api.batches, [["W1", "W2"], ["W3", "W4"], ["W5"]])
+        self.assertEqual([w.next_cursor if isinstance(w, dom.PageEnd) else w["id"] for w in out],
+                         [wid(1), wid(2), "c1", wid(3), wid(4), wid(5), None])
+        self.assertEqual(out[0]["abstract_inverted_index"], {"W1": [0]})
+        # a work OpenAlex does not return is kept, without an abstract
+        self.assertIsNone(out[3]["abstract_inverted_index"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests for the hedged PDF-locator race in D_download_fulltexts.
+"""
+import unittest
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import D_download_fulltexts as D
+from D_download_fulltexts import first_hit
+
+
+def task(delay, result):
+    def call():
+        time.sleep(delay)
+        return result
+    return call
+
+
+class TestHedgedLocators(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ThreadPoolExecutor(max_workers=5)
+
+    def tearDown(self):
+        self.pool.shutdown(wait=True)
+
+    def test_waits_for_higher_priority_before_taking_a_hit(self):
+        """A fast low-priority hit only wins once the slower ones ahead of it miss"""
+        tasks = [task(0.10, None), task(0.01, "b"), task(0.01, "c")]
+        winner, results, abandoned = first_hit(tasks, bool, self.pool, stagger=0)
+        self.assertEqual(winner, 1)
+        self.assertEqual(results[1], "b")
+        self.assertIsNone(results[0])
+
+    def test_slow_lower_priority_locators_are_abandoned(self):
+        tasks = [task(0.01, "a"), task(0.5, "b")]
+        t0 = time.monotonic()
+        winner, results, abandoned = first_hit(tasks, bool, self.pool, stagger=0)
+        self.assertLess(time.monotonic() - t0, 0.4)
+        self.assertEqual((winner, abandoned), (0, [1]))
+
+    def test_stagger_skips_later_locators_after_an_early_hit(self):
+        calls = []
+        def fast():
+            calls.append("a")
+            return "a"
+        def never():
+            calls.append("b")
+            return "b"
+        winner, _, abandoned = first_hit([fast, never], bool, self.pool, stagger=0.5)
+        self.assertEqual((winner, abandoned, calls), (0, [], ["a"]))
+
+    def test_all_miss(self):
+        winner, results, abandoned = first_hit([task(0, None)] * 3, bool, self.pool, stagger=0.01)
+        self.assertIsNone(winner)
+        self.assertEqual(len(results), 3)
+
+    def test_abandoned_locator_sends_no_request(self):
+        gate = threading.Event()
+
+        def url_fast(doi):
+            return "https://fast.example.org/a.pdf"
+
+        def url_slow(doi):
+            gate.wait()   # e.g. still waiting for its rate limiter
+            D.request("GET", "https://slow.example.org/")
+
+        stats_row = {"fast": "", "slow": ""}
+        with mock.patch.object(D, "LOCATORS", [("fast", url_fast), ("slow", url_slow)]), \
+                mock.patch.object(D, "LOCATOR_MODE", "hedged"), \
+                mock.patch.object(D, "LOCATOR_POOL", self.pool), mock.patch.object(D, "STAGGER", 0), \
+                mock.patch.object(D.SESSION, "request") as request:
+            self.assertEqual(D.locate_pdf("10.1/x", stats_row), "https://fast.example.org/a.pdf")
+            gate.set()
+            self.pool.shutdown(wait=True)
+        request.assert_not_called()
+        self.assertEqual(stats_row, {"fast": "SUCCESS", "slow": "cancelled"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for the metrics registry, its exporters and the event log.
+"""
+import unittest
+import sys
+import os
+import io
+import json
+import tempfile
+import urllib.request
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import metrics
+from metrics import EventLog, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.m = Metrics(buckets=(0.1, 1.0, float("inf")), clock=lambda: 123.0)
+
+    def tearDown(self):
+        metrics.VERBOSITY = metrics.NORMAL
+        metrics.EVENTS = None
+
+    def test_counters_and_histograms(self):
+        self.m.inc("requests_total", host="a", status=200)
+        self.m.inc("requests_total", 2, status="200", host="a")
+        for v in (0.05, 0.5, 5.0):
+            self.m.observe("latency", v, host="a")
+        snap = self.m.snapshot()
+        self.assertEqual(snap["counters"], [{"name": "requests_total",
+                                              "labels": {"host": "a", "status": "200"}, "value": 3}])
+        h = snap["histograms"][0]
+        self.assertEqual((h["count"], h["sum"]), (3, 5.55))
+        self.assertEqual(h["buckets"], {"0.1": 1, "1.0": 2, "+Inf": 3})
+
+    def test_timer_records_on_error(self):
+        with self.assertRaises(KeyError):
+            with self.m.timer("stage_seconds", stage="x"):
+                raise KeyError
+        self.assertEqual(self.m.snapshot()["histograms"][0]["count"], 1)
+
+    def test_prometheus_format(self):
+        self.m.inc("rows_total", outcome='a"b')
+        self.m.observe("stage_seconds", 0.5, stage="download")
+        text = self.m.prometheus()
+        self.assertIn("# TYPE climsight_rows_total counter\n", text)
+        self.assertIn('climsight_rows_total{outcome="a\\"b"} 1\n', text)
+        self.assertIn('climsight_stage_seconds_bucket{stage="download",le="0.1"} 0\n', text)
+        self.assertIn('climsight_stage_seconds_bucket{stage="download",le="+Inf"} 1\n', text)
+        self.assertIn('climsight_stage_seconds_count{stage="download"} 1\n', text)
+
+    def test_endpoint_and_json_snapshot(self):
+        self.m.inc("pages_total")
+        server = metrics.serve(0, self.m)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(url + "/metrics") as r:
+                self.assertIn("climsight_pages_total 1", r.read().decode())
+            with urllib.request.urlopen(url + "/metrics.json") as r:
+                self.assertEqual(json.load(r)["counters"][0]["value"], 1)
+        finally:
+            server.shutdown()
+        with tempfile.TemporaryDirectory() as tmp:
+            snap = metrics.Snapshotter(Path(tmp) / "m.json", interval=3600, registry=self.m)
+            snap.stop()
+            self.assertEqual(json.loads((Path(tmp) / "m.json").read_text())["time"], 123.0)
+
+    def test_events_and_quiet(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "events.jsonl"
+            metrics.EVENTS = EventLog(str(path))
+            metrics.event("row", tag="row001", success=1)
+            metrics.EVENTS.close()
+            (line,) = path.read_text().splitlines()
+            self.assertEqual({k: v for k, v in json.loads(line).items() if k != "ts"},
+                             {"event": "row", "tag": "row001", "success": 1})
+        out = io.StringIO()
+        with redirect_stdout(out):
+            metrics.log("shown")
+            metrics.log("hidden", metrics.DEBUG)
+            metrics.VERBOSITY = metrics.QUIET
+            metrics.log("quiet")
+        self.assertEqual(out.getvalue(), "shown\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for the incremental OpenAlex page parser.
+"""
+import json
+import unittest
+import sys
+import os
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import page_stream
+from page_stream import iter_results, new_stats
+
+
+def chunked(blob, size):
+    return [blob[i:i + size] for i in range(0, len(blob), size)]
+
+
+class TestPageStream(unittest.TestCase):
+
+    def setUp(self):
+        self.page = {
+            "meta": {"count": 3, "next_cursor": "IlsxNjA5", "per_page": 200},
+            "results": [
+                {"id": "https://openalex.org/W1", "display_name": "Klimawandel – Überblick",
+                 "abstract_inverted_index": {"Ökosysteme": [0, 2], "und": [1]}},
+                {"id": "https://openalex.org/W2", "cited_by_count": 12345, "topics": []},
+                {"id": "https://openalex.org/W3", "doi": None, "is_oa": True},
+            ],
+            "group_by": [],
+        }
+        self.blob = json.dumps(self.page, ensure_ascii=False, indent=1).encode("utf-8")
+
+    def test_matches_json_loads_for_any_chunk_size(self):
+        """Works and meta are identical to json.loads, even when chunks split characters"""
+        for size in (1, 3, 7, 64, len(self.blob)):
+            other, stats = {}, new_stats()
+            results = list(iter_results(chunked(self.blob, size), other, stats))
+            self.assertEqual(results, self.page["results"])
+            self.assertEqual(other["meta"], self.page["meta"])
+            self.assertEqual(stats["results"], 3)
+            self.assertEqual(stats["bytes"], len(self.blob))
+
+    def test_results_before_meta(self):
+        blob = b'{"results": [{"id": 1}], "meta": {"next_cursor": null}}'
+        other = {}
+        self.assertEqual(list(iter_results(chunked(blob, 5), other)), [{"id": 1}])
+        self.assertIsNone(other["meta"]["next_cursor"])
+
+    def test_empty_results(self):
+        other = {}
+        self.assertEqual(list(iter_results([b'{"meta": {}, "results": []}'], other)), [])
+        self.assertEqual(other, {"meta": {}})
+
+    def test_large_work_is_not_decoded_once_per_chunk(self):
+        work = {"id": "https://openalex.org/W9",
+                "abstract_inverted_index": {f"word{i}": [i] for i in range(5000)}}
+        blob = json.dumps({"results": [work, {"id": 2}], "meta": {}}).encode()
+        decoder = mock.Mock(wraps=page_stream._DECODER)
+        with mock.patch.object(page_stream, "_DECODER", decoder):
+            results = list(iter_results(chunked(blob, 64), {}))
+        self.assertEqual(results, [work, {"id": 2}])
+        self.assertGreater(len(blob) // 64, 1000)
+        self.assertLess(decoder.raw_decode.call_count, 40)
+
+    def test_truncated_body_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_results([self.blob[:-20]], {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
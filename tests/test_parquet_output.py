@@ -0,0 +1,57 @@
+"""
+Tests for the optional Parquet writer.
+"""
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import parquet_output
+from parquet_output import ParquetRowWriter, read_records, read_column_values
+
+
+@unittest.skipIf(parquet_output.pa is None, "pyarrow not installed")
+class TestParquetOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "T10004_primary_works.parquet"
+        self.fields = ["openalex_id", "publication_year", "is_oa", "citation_norm_pct", "oa_status"]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip_coerces_csv_strings(self):
+        """CSV-style string values come back with their column types, across row groups"""
+        with ParquetRowWriter(self.path, self.fields, row_group_rows=2) as writer:
+            writer.writerow({"openalex_id": "W1", "publication_year": "2021", "is_oa": "True",
+                             "citation_norm_pct": "0.95", "oa_status": "gold"})
+            writer.writerow({"openalex_id": "W2", "publication_year": 2020, "is_oa": False,
+                             "citation_norm_pct": "", "oa_status": None})
+            writer.writerow({"openalex_id": "W3"})
+        rows = list(read_records(self.path))
+        self.assertEqual(rows[0], {"openalex_id": "W1", "publication_year": 2021, "is_oa": True,
+                                   "citation_norm_pct": 0.95, "oa_status": "gold"})
+        self.assertIsNone(rows[1]["citation_norm_pct"])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(read_column_values(self.path, "openalex_id"), {"W1", "W2", "W3"})
+
+    def test_column_projection(self):
+        with ParquetRowWriter(self.path, self.fields) as writer:
+            writer.writerow({"openalex_id": "W1", "oa_status": "green"})
+        rows = list(read_records(self.path, columns=["oa_status", "not_a_column"]))
+        self.assertEqual(rows, [{"oa_status": "green"}])
+
+    def test_failed_write_leaves_no_file(self):
+        with self.assertRaises(RuntimeError):
+            with ParquetRowWriter(self.path, self.fields) as writer:
+                writer.writerow({"openalex_id": "W1"})
+                raise RuntimeError("boom")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
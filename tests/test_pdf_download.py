@@ -0,0 +1,143 @@
+"""
+Tests for the streaming PDF writer in D_download_fulltexts.
+"""
+import unittest
+import sys
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import D_download_fulltexts as D
+from host_health import HostHealth
+from rate_limit import HostLimiter
+
+
+class FakeResponse:
+    def __init__(self, body, headers=None, chunk=100):
+        self.body = body
+        self.headers = headers or {}
+        self.chunk = chunk
+        self.served = 0
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), self.chunk):
+            self.served += self.chunk
+            yield self.body[i:i + self.chunk]
+
+
+class TestSavePdfStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = Path(self.tmp.name) / "paper.pdf"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pdf_is_written_and_hashed(self):
+        body = b"%PDF-1.7\n" + b"x" * 5000
+        sha = D.save_pdf_stream(FakeResponse(body), self.dest)
+        self.assertEqual(sha, hashlib.sha256(body).hexdigest())
+        self.assertEqual(self.dest.read_bytes(), body)
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [self.dest])
+
+    def test_html_is_abandoned_after_the_first_kilobyte(self):
+        resp = FakeResponse(b"<html>" + b"x" * 100_000)
+        with self.assertRaises(D.NotAPdf):
+            D.save_pdf_stream(resp, self.dest)
+        self.assertLessEqual(resp.served, D.PDF_MAGIC_WINDOW + resp.chunk)
+        self.assertFalse(self.dest.exists())
+
+    def test_pdf_marker_within_first_kilobyte_and_min_bytes(self):
+        # what looks_like_pdf checked on a fully downloaded body
+        body = b"\r\n" * 100 + b"%PDF-1.4" + b"x" * 10_000
+        self.assertEqual(D.save_pdf_stream(FakeResponse(body), self.dest, min_bytes=10_001),
+                         hashlib.sha256(body).hexdigest())
+        with self.assertRaises(D.NotAPdf):
+            D.save_pdf_stream(FakeResponse(b" " * D.PDF_MAGIC_WINDOW + b"%PDF" + b"x" * 100),
+                              self.dest)
+        with self.assertRaises(D.NotAPdf):
+            D.save_pdf_stream(FakeResponse(b"%PDF-1.4" + b"x" * 100), self.dest, min_bytes=10_001)
+
+    def test_size_limits_leave_no_partial_file(self):
+        with mock.patch.object(D, "MAX_PDF_BYTES", 2000):
+            with self.assertRaises(D.NotAPdf):
+                D.save_pdf_stream(FakeResponse(b"%PDF" + b"x" * 3000), self.dest)
+            with self.assertRaises(D.NotAPdf):
+                D.save_pdf_stream(FakeResponse(b"%PDF", {"Content-Length": "5000"}), self.dest)
+        with self.assertRaises(D.NotAPdf):
+            D.save_pdf_stream(FakeResponse(b"%PDF" + b"x" * 100), self.dest, min_bytes=10_001)
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+
+
+    def test_tls_error_is_a_host_failure(self):
+        request = mock.Mock(side_effect=D.requests.exceptions.SSLError("bad cert"))
+        with mock.patch.object(D, "HEALTH", HostHealth(failures=1)), \
+                mock.patch.object(D, "HOSTS", HostLimiter(1, 0)), \
+                mock.patch.object(D.SESSION, "request", request):
+            self.assertIsNone(D.download("https://mitm.example.org/a.pdf", self.dest))
+            self.assertFalse(D.HEALTH.allow("https://mitm.example.org/b.pdf"))
+            D.download("https://mausamjournal.imd.gov.in/a.pdf", self.dest)
+        # tried once, with the certificate checked; never retried without it
+        self.assertEqual([c.kwargs["verify"] for c in request.call_args_list], [True, False])
+
+
+    def test_host_slot_is_held_while_the_body_streams(self):
+        limiter = HostLimiter(1, 0)
+        held = []
+
+        class Streamed(FakeResponse):
+            status_code, reason, closed = 200, "OK", False
+
+            def iter_content(self, chunk_size):
+                for chunk in super().iter_content(chunk_size):
+                    held.append(limiter._slots["pub.example.org"]._value == 0)
+                    yield chunk
+
+            def raise_for_status(self):
+                pass
+
+            def close(self):
+                self.closed = True
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.close()
+
+        resp = Streamed(b"%PDF-1.7\n" + b"x" * 5000)
+        with mock.patch.object(D, "HEALTH", HostHealth()), \
+                mock.patch.object(D, "HOSTS", limiter), mock.patch.object(D, "STORE", None), \
+                mock.patch.object(D.SESSION, "request", return_value=resp):
+            self.assertIsNotNone(D.download("https://pub.example.org/a.pdf", self.dest))
+        self.assertTrue(held and all(held))
+        self.assertTrue(resp.closed)
+        self.assertEqual(limiter._slots["pub.example.org"]._value, 1)   # released on close
+
+    def test_host_skipped_by_the_circuit_is_not_an_attempt(self):
+        health = HostHealth(failures=1)
+        health.failure("https://api.semanticscholar.org/")
+        state = mock.Mock()
+        with mock.patch.object(D, "HEALTH", health), mock.patch.object(D, "CACHE", None), \
+                mock.patch.object(D, "STATE", state), \
+                mock.patch.object(D, "STATS_CSV", str(Path(self.tmp.name) / "stats.csv")), \
+                mock.patch.object(D.SESSION, "request") as request:
+            status, url = D.run_locator(D.url_semantic, "10.1/x")
+            self.assertEqual((status, url), (D.HOST_DOWN, None))
+            request.assert_not_called()
+            row = dict.fromkeys(D.FIELDNAMES, "")
+            row.update(doi="10.1/x", success=0, semantic_status=status)
+            D.finish_row(row)
+            state.record.assert_not_called()
+            row["semantic_status"] = "none"
+            D.finish_row(row)
+            state.record.assert_called_once_with("10.1/x", {"semantic": "none"}, False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for the content-addressed PDF store.
+"""
+import unittest
+import sys
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pdf_store import PdfStore
+
+
+class TestPdfStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.store = PdfStore(self.root / "store")
+        self.body = b"%PDF-1.7 same paper"
+        self.sha = hashlib.sha256(self.body).hexdigest()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def put(self):
+        tmp = self.store.new_tmp()
+        tmp.write_bytes(self.body)
+        return self.store.put(tmp, self.sha)
+
+    def test_same_content_is_stored_once(self):
+        blob = self.put()
+        self.put()
+        self.assertEqual(blob, self.store.blob_path(self.sha))
+        self.assertEqual(list(self.store.tmp.iterdir()), [])
+        self.assertEqual(self.store.stats()["blobs"], 1)
+
+    def test_views_share_the_blob(self):
+        self.put()
+        a = self.root / "pdfs" / "row001__A.pdf"
+        b = self.root / "elsevier_pdfs" / "row001__A.pdf"
+        self.store.view(self.sha, a)
+        self.store.view(self.sha, b)
+        self.store.view(self.sha, a)   # idempotent
+        self.assertTrue(os.path.samefile(a, b))
+        self.assertEqual(a.read_bytes(), self.body)
+
+    def test_relink_removes_the_view_under_the_old_row(self):
+        self.put()
+        pdfs = self.root / "pdfs"
+        self.store.view(self.sha, pdfs / "row003__A.pdf")
+        (pdfs / "row004__A.pdf").write_bytes(b"%PDF-1.7 other paper, same title")
+        self.store.relink(self.sha, pdfs / "row009__A.pdf")
+        self.assertEqual(sorted(p.name for p in pdfs.iterdir()), ["row004__A.pdf", "row009__A.pdf"])
+
+    def test_doi_index_is_case_insensitive_and_needs_the_blob(self):
+        self.store.link("10.1/ABC", self.sha, "openalex")
+        self.assertIsNone(self.store.lookup("10.1/abc"))   # blob not stored yet
+        self.put()
+        self.assertEqual(self.store.lookup("10.1/abc"), (self.sha, "openalex"))
+
+    def test_import_turns_existing_file_into_view(self):
+        legacy = self.root / "pdfs" / "row007__Old.pdf"
+        legacy.parent.mkdir()
+        legacy.write_bytes(self.body)
+        sha = self.store.import_file(legacy, "10.1/old", "imported")
+        self.assertEqual(sha, self.sha)
+        self.assertTrue(os.path.samefile(legacy, self.store.blob_path(sha)))
+        self.assertEqual(self.store.lookup("10.1/old"), (sha, "imported"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Tests for the PDF validation stage used by D_download_fulltexts.
+"""
+import unittest
+import sys
+import os
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import metrics
+from pdf_validation import Validator, is_full_article, is_valid, validate
+
+
+def make_pdf(pages, text="Climate adaptation in agriculture. " * 40):
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        if text:
+            page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=8)
+    return doc.tobytes()
+
+
+class TestPdfValidation(unittest.TestCase):
+
+    def test_full_article_passes(self):
+        result = validate(make_pdf(3))
+        self.assertTrue(is_valid(result))
+        self.assertEqual(result["pages"], 3)
+
+    def test_checks_fail_in_order(self):
+        self.assertEqual(validate(b"<html>not a pdf</html>")["check"], "no_eof")
+        self.assertEqual(validate(make_pdf(3)[:-200])["check"], "no_eof")
+        self.assertEqual(validate(make_pdf(1))["check"], "too_few_pages")
+        result = validate(make_pdf(3, text=""))
+        self.assertEqual((result["check"], result["chars_per_page"]), ("low_text", 0))
+
+    def test_full_article_rule_counts_pages_only(self):
+        self.assertTrue(is_full_article(validate(make_pdf(3, text=""))))
+        truncated = validate(make_pdf(3)[:-200])
+        self.assertEqual((truncated["check"], truncated["pages"]), ("no_eof", 3))
+        self.assertTrue(is_full_article(truncated))
+        self.assertFalse(is_full_article(validate(make_pdf(1))))
+        self.assertFalse(is_full_article(validate(b"")))
+
+    def test_validator_reports_files_through_callback(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            good = Path(tmp) / "good.pdf"
+            good.write_bytes(make_pdf(2))
+            results = {}
+            done = threading.Event()
+
+            def on_done(name):
+                def record(result):
+                    results[name] = result["check"]
+                    if len(results) == 3:
+                        done.set()
+                return record
+
+            validator = Validator(workers=1)
+            validator.submit(good, on_done("good"))
+            validator.submit(Path(tmp) / "missing.pdf", on_done("missing"))
+            validator.submit(make_pdf(1), on_done("short"))
+            validator.close()
+            self.assertTrue(done.is_set())
+            self.assertEqual(results, {"good": "ok", "missing": "unreadable",
+                                       "short": "too_few_pages"})
+
+    def test_failing_callback_is_counted_and_reported(self):
+        registry = metrics.Metrics()
+        seen = []
+
+        def fail(result):
+            raise OSError("disk full")
+
+        with mock.patch.object(metrics, "METRICS", registry), \
+                mock.patch("builtins.print") as out:
+            validator = Validator(workers=0)
+            validator.submit(make_pdf(3), fail)
+            validator.submit(make_pdf(3), lambda result: seen.append(result["check"]))
+            validator.close()
+        self.assertEqual(seen, ["ok"])
+        counters = {(c["name"], tuple(c["labels"].items())): c["value"]
+                    for c in registry.snapshot()["counters"]}
+        self.assertEqual(counters[("pdf_check_callback_errors_total", (("step", "on_done"),))], 1)
+        self.assertIn("disk full", out.call_args[0][0])
+
+if __name__ == '__main__':
+    unittest.main()
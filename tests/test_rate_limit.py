@@ -0,0 +1,128 @@
+"""
+Tests for the shared rate limiter used by the concurrent harvesters.
+"""
+import unittest
+import sys
+import os
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import download_openalex_matching
+from rate_limit import (TokenBucket, HostLimiter, AdaptiveLimiter, ProviderLimits,
+                        openalex_bucket, parse_retry_after, parse_budgets)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_blocks_until_refill(self):
+        """A full bucket serves `capacity` requests at once, then waits 1/rate per token"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(clock.now, 0.0)
+        bucket.acquire()
+        self.assertAlmostEqual(clock.now, 0.5)
+
+    def test_try_acquire_does_not_block(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1.0, capacity=1, clock=clock, sleep=clock.sleep)
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        clock.now += 1.0
+        self.assertTrue(bucket.try_acquire())
+
+    def test_openalex_bucket_matches_budget(self):
+        bucket = openalex_bucket(per_minute=120)
+        self.assertAlmostEqual(bucket.rate, 2.0)
+
+    def test_rejects_non_positive_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestHostLimiter(unittest.TestCase):
+
+    def test_same_host_requests_are_spaced(self):
+        clock = FakeClock()
+        hosts = HostLimiter(max_per_host=2, delay=1.5, clock=clock, sleep=clock.sleep)
+        starts = []
+        for url in ["https://a.org/1", "https://a.org/2", "https://b.org/1", "https://A.org/3"]:
+            with hosts.slot(url):
+                starts.append(clock.now)
+        self.assertEqual(starts, [0.0, 1.5, 1.5, 3.0])
+
+    def test_concurrency_cap_per_host(self):
+        hosts = HostLimiter(max_per_host=1, delay=0)
+        with hosts.slot("https://a.org/x"):
+            sem = hosts._slots["a.org"]
+            self.assertFalse(sem.acquire(blocking=False))
+            with hosts.slot("https://b.org/x"):
+                pass
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = AdaptiveLimiter(max_rate=4.0, min_rate=1.0,
+                                       clock=self.clock, sleep=self.clock.sleep)
+
+    def test_throttle_halves_rate_and_honours_retry_after(self):
+        self.limiter.feedback(429, "10")
+        self.assertEqual(self.limiter.rate, 2.0)
+        self.limiter.acquire()
+        self.assertAlmostEqual(self.clock.now, 10.5)   # pause, then one token at the new rate
+        for _ in range(3):
+            self.limiter.feedback(503)
+        self.assertEqual(self.limiter.rate, 1.0)       # min_rate
+        self.assertEqual(self.limiter.throttled, 4)
+
+    def test_healthy_responses_restore_the_budget(self):
+        self.limiter.feedback(429)
+        for _ in range(100):
+            self.limiter.feedback(200)
+        self.assertEqual(self.limiter.rate, 4.0)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        date = "Wed, 21 Oct 2015 07:28:30 GMT"   # 1445412510
+        self.assertEqual(parse_retry_after(date, now=lambda: 1445412500), 10.0)
+
+    def test_providers_by_url(self):
+        limits = ProviderLimits({"unpaywall": 60, "core": 30})
+        self.assertIs(limits.for_url("https://api.unpaywall.org/v2/10.1/x"), limits["unpaywall"])
+        self.assertIsNone(limits.for_url("https://www.mdpi.com/x.pdf"))
+        self.assertEqual(limits["core"].rate, 0.5)
+        self.assertEqual(parse_budgets(["core=30"]), {"core": 30.0})
+        with self.assertRaises(ValueError):
+            parse_budgets(["nope=1"])
+
+    def test_openalex_get_retries_throttled_requests(self):
+        answers = [mock.Mock(status_code=429, headers={"Retry-After": "3"}),
+                   mock.Mock(status_code=200, headers={})]
+        with mock.patch.object(download_openalex_matching.requests, "get",
+                               side_effect=answers) as get:
+            resp = download_openalex_matching.openalex_get("https://api.openalex.org/works",
+                                                           self.limiter)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(get.call_count, 2)
+        self.assertGreaterEqual(self.clock.now, 3.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
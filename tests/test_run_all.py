@@ -13,6 +13,26 @@ sys.path.insert(0, os.path.dirname(__file__))
 # Import test modules
 from test_utilities import TestDataProcessingFunctions
 from test_string_processing import TestStringProcessingFunctions
+from test_rate_limit import TestTokenBucket, TestHostLimiter, TestAdaptiveLimiter
+from test_page_stream import TestPageStream
+from test_synthetic_works import TestSyntheticWorks
+from test_parquet_output import TestParquetOutput
+from test_work_store import TestWorkStore
+from test_combine_csvs import TestCombineCsvs
+from test_locators import TestHedgedLocators
+from test_http_cache import TestHttpCache
+from test_pdf_download import TestSavePdfStream
+from test_pdf_validation import TestPdfValidation
+from test_extract_fulltexts import TestExtractFulltexts
+from test_pdf_store import TestPdfStore
+from test_download_state import TestDownloadState
+from test_host_health import TestHostHealth
+from test_unpaywall_index import TestUnpaywallIndex
+from test_snapshot_harvest import TestSnapshotHarvest
+from test_fulltext_shards import TestFulltextShards
+from test_metrics import TestMetrics
+from test_checkpoints import TestCheckpoints
+from test_lazy_abstracts import TestLazyAbstracts
 
 
 def run_all_tests():
@@ -23,6 +43,28 @@ def run_all_tests():
     # Add test suites
     suite.addTests(loader.loadTestsFromTestCase(TestDataProcessingFunctions))
     suite.addTests(loader.loadTestsFromTestCase(TestStringProcessingFunctions))
+    suite.addTests(loader.loadTestsFromTestCase(TestTokenBucket))
+    suite.addTests(loader.loadTestsFromTestCase(TestHostLimiter))
+    suite.addTests(loader.loadTestsFromTestCase(TestAdaptiveLimiter))
+    suite.addTests(loader.loadTestsFromTestCase(TestPageStream))
+    suite.addTests(loader.loadTestsFromTestCase(TestSyntheticWorks))
+    suite.addTests(loader.loadTestsFromTestCase(TestParquetOutput))
+    suite.addTests(loader.loadTestsFromTestCase(TestWorkStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestCombineCsvs))
+    suite.addTests(loader.loadTestsFromTestCase(TestHedgedLocators))
+    suite.addTests(loader.loadTestsFromTestCase(TestHttpCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestSavePdfStream))
+    suite.addTests(loader.loadTestsFromTestCase(TestPdfValidation))
+    suite.addTests(loader.loadTestsFromTestCase(TestExtractFulltexts))
+    suite.addTests(loader.loadTestsFromTestCase(TestPdfStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestDownloadState))
+    suite.addTests(loader.loadTestsFromTestCase(TestHostHealth))
+    suite.addTests(loader.loadTestsFromTestCase(TestUnpaywallIndex))
+    suite.addTests(loader.loadTestsFromTestCase(TestSnapshotHarvest))
+    suite.addTests(loader.loadTestsFromTestCase(TestFulltextShards))
+    suite.addTests(loader.loadTestsFromTestCase(TestMetrics))
+    suite.addTests(loader.loadTestsFromTestCase(TestCheckpoints))
+    suite.addTests(loader.loadTestsFromTestCase(TestLazyAbstracts))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
@@ -0,0 +1,110 @@
+"""
+Tests for harvesting topic CSVs from a local OpenAlex works snapshot.
+"""
+import unittest
+import sys
+import os
+import csv
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import download_openalex_matching as dom
+import snapshot_harvest
+from snapshot_harvest import harvest, is_review_title
+
+
+def work(n, topic="T1", title="A review of sea ice", year=2020, oa=True, fulltext=True):
+    return {
+        "id": f"https://openalex.org/W{n}", "display_name": title, "doi": f"https://doi.org/10.1/{n}",
+        "publication_year": year, "open_access": {"is_oa": oa}, "has_fulltext": fulltext,
+        "primary_topic": {"id": f"https://openalex.org/{topic}"},
+        "topics": [{"id": f"https://openalex.org/{topic}", "score": 0.9}],
+        "abstract_inverted_index": {"Sea": [0], "ice": [1]},
+    }
+
+
+class TestSnapshotHarvest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.works = self.root / "works"
+        patcher = mock.patch.object(dom, "ABSTRACTS_DIR", self.root / "abstracts")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def partition(self, day, works, name="part_000.gz"):
+        path = self.works / f"updated_date={day}" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for w in works:
+                f.write(json.dumps(w) + "\n")
+        return path
+
+    def rows(self, tid):
+        with dom.topic_out_path(tid, True).open(newline="", encoding="utf-8") as f:
+            return [r["openalex_id"].split("/")[-1] for r in csv.DictReader(f)]
+
+    def test_review_title_rule(self):
+        self.assertTrue(is_review_title("Reviews of ocean heat uptake"))
+        self.assertTrue(is_review_title("Glaciers: a REVIEW"))
+        self.assertFalse(is_review_title("A peer-reviewed dataset of glaciers"))
+        self.assertFalse(is_review_title("An overview of sea ice"))
+        self.assertFalse(is_review_title(None))
+
+    def test_filters_route_and_resume(self):
+        self.partition("2024-01-01", [
+            work(1), work(2, topic="T2", title="Soil carbon: reviewed"),
+            work(3, title="Open peer review of a climate model"), work(4, year=2005),
+            work(5, oa=False), work(6, fulltext=False), work(7, topic="T9"),
+            dict(work(8), abstract_inverted_index=None), dict(work(9), doi=None),
+        ])
+        stats = harvest([1, 2, 3], self.works, workers=1)
+        self.assertEqual((stats["lines"], stats["matched"], stats["written"]), (9, 2, 2))
+        self.assertEqual(self.rows(1), ["W1"])
+        self.assertEqual(self.rows(2), ["W2"])
+        self.assertEqual(self.rows(3), [])                  # header only
+        self.assertEqual(dom.high_water_mark(dom.topic_out_path(1, True)), "2024-01-01")
+
+        self.partition("2024-02-01", [work(1), work(10)])   # W1 changed since
+        stats = harvest([1, 2, 3], self.works, workers=2)
+        self.assertEqual((stats["skipped"], stats["scanned"], stats["written"], stats["updated"]),
+                         (1, 1, 1, 1))
+        self.assertEqual(self.rows(1), ["W1", "W10"])
+        self.assertEqual(dom.high_water_mark(dom.topic_out_path(1, True)), "2024-02-01")
+
+    def test_newest_partition_wins(self):
+        old = dict(work(1), title="A review of sea ice (preprint)")
+        new = dict(work(1), title="A review of sea ice")
+        self.partition("2024-03-01", [new])
+        for i in range(4):   # older partitions that a parallel scan finishes later
+            self.partition("2024-01-01", [old] + [work(1000 * (i + 1) + j) for j in range(500)],
+                           name=f"part_{i:03d}.gz")
+        stats = harvest([1], self.works, workers=2)
+        with dom.topic_out_path(1, True).open(newline="", encoding="utf-8") as f:
+            titles = [r["title"] for r in csv.DictReader(f) if r["openalex_id"].endswith("/W1")]
+        self.assertEqual(titles, ["A review of sea ice"])
+        self.assertEqual(stats["updated"], 4)
+        self.assertEqual(snapshot_harvest.load_manifest(snapshot_harvest.manifest_path(True))["compact"],
+                         [])
+
+    def test_rows_match_the_api_harvest(self):
+        w = work(1)
+        self.partition("2024-01-01", [w])
+        harvest([1], self.works, workers=1)
+        with dom.topic_out_path(1, True).open(newline="", encoding="utf-8") as f:
+            row = next(csv.DictReader(f))
+        expected = {k: "" if v is None else str(v) for k, v in dom.extract_row(w).items()}
+        self.assertEqual(row, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,7 +8,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from D_download_fulltexts import (
-    sanitize_doi, safe_filename, looks_like_pdf
+    sanitize_doi, safe_filename
 )
 
 class TestStringProcessingFunctions(unittest.TestCase):
@@ -27,16 +27,6 @@ class TestStringProcessingFunctions(unittest.TestCase):
         result = safe_filename(long_text, limit=50)
         self.assertEqual(len(result), 50)
 
-    def test_looks_like_pdf_identifies_pdf_content(self):
-        pdf_content = b"%PDF-1.4" + b"x" * 10_000
-        self.assertTrue(looks_like_pdf(pdf_content))
-
-        small_pdf = b"%PDF-1.4" + b"x" * 100
-        self.assertFalse(looks_like_pdf(small_pdf))
-
-        not_pdf = b"<html>" + b"x" * 10_000
-        self.assertFalse(looks_like_pdf(not_pdf))
-
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,34 @@
+"""
+Tests for the synthetic work generator used by the benchmarks.
+"""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from synthetic_works import make_corpus, SIZES
+from download_openalex_matching import extract_row
+
+
+class TestSyntheticWorks(unittest.TestCase):
+
+    def test_corpus_is_deterministic(self):
+        self.assertEqual(make_corpus(5, "small", seed=1), make_corpus(5, "small", seed=1))
+        self.assertNotEqual(make_corpus(5, "small", seed=1), make_corpus(5, "small", seed=2))
+
+    def test_works_have_configured_sizes(self):
+        """Abstract length, authorships and topics follow the size preset"""
+        n_words, n_authors, n_inst, n_topics, n_sdgs = SIZES["large"]
+        work = make_corpus(1, "large")[0]
+        self.assertEqual(len(work["authorships"]), n_authors)
+        self.assertEqual(len(work["topics"]), n_topics)
+        self.assertEqual(len(work["sustainable_development_goals"]), n_sdgs)
+        row = extract_row(work)
+        self.assertEqual(len(row["abstract"].split()), n_words)
+        self.assertEqual(row["topic_id_1"], work["primary_topic"]["id"].split("/")[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
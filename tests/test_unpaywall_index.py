@@ -0,0 +1,77 @@
+"""
+Tests for the offline Unpaywall snapshot index.
+"""
+import unittest
+import sys
+import os
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import D_download_fulltexts as D
+from build_unpaywall_index import UnpaywallIndex, build
+
+
+def work(doi, pdf=None):
+    loc = {"url": f"https://landing/{doi}", "url_for_pdf": pdf} if pdf is not None else None
+    return {"doi": doi, "is_oa": loc is not None, "best_oa_location": loc,
+            "oa_locations": [loc] if loc else [], "title": "A review"}
+
+
+class TestUnpaywallIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.dump = self.root / "snapshot.jsonl.gz"
+        works = [work("10.1/a", "https://x.org/a.pdf"), work("10.1/B"),
+                 work("10.1/c", ""), work("10.1/d", "https://x.org/d.pdf")]
+        with gzip.open(self.dump, "wt", encoding="utf-8") as f:
+            for w in works:
+                f.write(json.dumps(w) + "\n")
+            f.write("not json\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_full_index_keeps_only_pdf_urls(self):
+        out = self.root / "index.sqlite"
+        stats = build([self.dump], out)
+        self.assertEqual(stats, {"works": 4, "with_pdf": 2, "kept": 2})
+        index = UnpaywallIndex(out)
+        self.assertEqual(index.lookup("10.1/A"), (True, "https://x.org/a.pdf"))
+        self.assertEqual(index.lookup("https://doi.org/10.1/b"), (False, None))
+        self.assertEqual(index.meta["negatives"], "0")
+        index.close()
+        self.assertFalse(out.with_name(out.name + ".tmp").exists())
+
+    def test_records_filter_keeps_negatives(self):
+        out = self.root / "index.sqlite"
+        stats = build([self.dump], out, wanted={"10.1/a", "10.1/b", "10.1/zzz"})
+        self.assertEqual((stats["works"], stats["kept"]), (2, 2))
+        index = UnpaywallIndex(out)
+        self.assertEqual(index.lookup("10.1/b"), (True, None))
+        self.assertEqual(index.lookup("10.1/d"), (False, None))
+        index.close()
+
+    def test_locator_answers_from_index_before_the_api(self):
+        out = self.root / "index.sqlite"
+        build([self.dump], out, wanted={"10.1/a", "10.1/b"})
+        index = UnpaywallIndex(out)
+        with mock.patch.object(D, "UNPAYWALL", index), \
+                mock.patch.object(D, "fetch_json", return_value=None) as fetch, \
+                mock.patch.object(D, "load_email", return_value="a@b.c"):
+            self.assertEqual(D.url_unpaywall("10.1/A"), "https://x.org/a.pdf")
+            self.assertIsNone(D.url_unpaywall("10.1/b"))
+            fetch.assert_not_called()
+            D.url_unpaywall("10.1/new")      # not in the snapshot: ask the API
+            fetch.assert_called_once()
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
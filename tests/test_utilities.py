@@ -5,6 +5,7 @@ Focus on data processing and string manipulation functions.
 import unittest
 import sys
 import os
+import tempfile
 from pathlib import Path
 
 # Add src directory to path for imports
@@ -13,7 +14,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 # Import functions to test
 from download_openalex_matching import (
     decode_abstract, top_topic_ids, country_code_string, 
-    sdg_pairs, extract_row, make_filter
+    sdg_pairs, extract_row, make_filter, make_batch_filter,
+    plan_batches, route_topic_ids, compact_csv
 )
 
 
@@ -138,5 +140,55 @@ class TestDataProcessingFunctions(unittest.TestCase):
         self.assertEqual(result["abstract"], "Climate change")
 
 
+    def test_make_batch_filter_joins_topics(self):
+        """Test 11: make_batch_filter ORs topic IDs with pipes"""
+        result = make_batch_filter([10004, 10889], primary=True)
+        self.assertTrue(result.startswith("primary_topic.id:T10004|T10889,"))
+        self.assertEqual(make_batch_filter([10004], primary=True), make_filter(10004, primary=True))
+
+    def test_plan_batches_packs_small_topics(self):
+        """Test 12: plan_batches packs small topics and isolates large ones"""
+        counts = {1: 10, 2: 20, 3: 5000, 4: 30, 5: 0}
+        result = plan_batches(counts, max_works=100)
+        self.assertEqual(result, [[5, 1, 2, 4], [3]])
+        self.assertEqual(plan_batches(counts, max_works=100, max_topics=2), [[5, 1], [2, 4], [3]])
+
+    def test_route_topic_ids_by_primary_topic(self):
+        """Test 13: route_topic_ids sends works to their primary topic only"""
+        work = {
+            "primary_topic": {"id": "https://openalex.org/T10002"},
+            "topics": [
+                {"id": "https://openalex.org/T10002"},
+                {"id": "https://openalex.org/T10001"}
+            ]
+        }
+        wanted = {"T10001": 10001, "T10002": 10002}
+        self.assertEqual(route_topic_ids(work, wanted, primary_only=True), [10002])
+        self.assertEqual(route_topic_ids(work, wanted, primary_only=False), [10002, 10001])
+        self.assertEqual(route_topic_ids({}, wanted, primary_only=True), [])
+
+    def test_make_filter_delta_adds_date_filter(self):
+        """Test 14: make_filter appends from_created_date/from_updated_date for delta runs"""
+        result = make_filter(10004, primary=True, since="2025-06-01")
+        self.assertTrue(result.endswith(",from_created_date:2025-06-01"))
+        result = make_filter(10004, primary=True, since="2025-06-01", date_field="updated")
+        self.assertTrue(result.endswith(",from_updated_date:2025-06-01"))
+
+    def test_compact_csv_keeps_last_row_per_work(self):
+        """Test 15: compact_csv keeps the most recently appended row of each work"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "T1_primary_works.csv"
+            path.write_text(
+                "openalex_id,title\n"
+                "W1,old\n"
+                "W2,two\n"
+                "W1,new\n",
+                encoding="utf-8",
+            )
+            self.assertEqual(compact_csv(path), 1)
+            self.assertEqual(path.read_text(encoding="utf-8").splitlines(),
+                             ["openalex_id,title", "W2,two", "W1,new"])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Tests for the SQLite work store.
+"""
+import unittest
+import sys
+import os
+import csv
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from work_store import WorkStore
+
+FIELDS = ["openalex_id", "title", "publication_year"]
+
+
+class TestWorkStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = WorkStore(Path(self.tmp.name) / "works.sqlite", FIELDS)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_work_stored_once_and_linked_to_each_topic(self):
+        row = {"openalex_id": "W1", "title": "Soil review", "publication_year": 2020}
+        self.store.add(row, 10004, "any")
+        self.store.add(row, 10889, "any")
+        self.store.link("W1", 11275, "any")
+        self.assertTrue(self.store.has("W1"))
+        self.assertFalse(self.store.has("W2"))
+        self.assertEqual(self.store.count(), 1)
+        self.assertEqual(self.store.count(11275), 1)
+        self.assertEqual([r["title"] for r in self.store.rows(10889)], ["Soil review"])
+
+    def test_replace_upserts_existing_row(self):
+        self.store.add({"openalex_id": "W1", "title": "old"}, 1, "primary")
+        self.store.add({"openalex_id": "W1", "title": "new"}, 1, "primary", replace=True)
+        self.assertEqual([r["title"] for r in self.store.rows()], ["new"])
+
+    def test_cursor_checkpoint_roundtrip(self):
+        """The resume cursor survives reopening; a finished walk clears it"""
+        self.assertEqual(self.store.resume("T1_primary"), ("*", 0, None))
+        self.store.add({"openalex_id": "W1"}, 1, "primary")
+        self.store.commit_page("T1_primary", "abc", 1, "2024-03-01")
+        self.store.close()
+        self.store = WorkStore(Path(self.tmp.name) / "works.sqlite")
+        self.assertEqual(self.store.resume("T1_primary"), ("abc", 1, "2024-03-01"))
+        self.assertTrue(self.store.has("W1"))
+        self.store.commit_page("T1_primary", None, 1)
+        self.assertEqual(self.store.resume("T1_primary"), ("*", 0, None))
+
+    def test_export_topic_csvs(self):
+        self.store.add({"openalex_id": "W1", "title": "a"}, 10004, "primary")
+        self.store.add({"openalex_id": "W2", "title": "b"}, 10889, "primary")
+        self.store.export_topic_csvs(self.tmp.name)
+        with open(Path(self.tmp.name) / "T10889_primary_works.csv", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r["openalex_id"] for r in rows], ["W2"])
+        self.assertEqual(list(rows[0]), FIELDS)
+
+
+if __name__ == '__main__':
+    unittest.main()